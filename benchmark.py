@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Database benchmark on a synthetic collection, run from source tree:
+    ./benchmark.py --tracks 10000,100000,500000 --output bench.json
+    Each size runs in its own process with an empty data directory,
+    in memory settings and no network.
+
+    Tag readers benchmark on a real collection, per file format:
+    ./benchmark.py --tags ~/Music --output tags.json
+
+    Query plans check, fails on a full scan of tracks:
+    ./benchmark.py --plans --tracks 10000
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from statistics import mean, median
+from time import perf_counter, time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class Generator:
+    """
+        Generate a reproducible collection
+    """
+    TRACKS_PER_ALBUM = 10
+    TRACKS_PER_ARTIST = 40
+    TRACKS_PER_GENRE = 2000
+    # One album out of COMPILATIONS has an artist per track
+    COMPILATIONS = 20
+
+    def __init__(self, tracks, seed):
+        """
+            Init generator
+            @param tracks as int
+            @param seed as int
+        """
+        self.__tracks = tracks
+        self.__random = random.Random(seed)
+        self.__genres = ["Genre %d" % i for i in
+                         range(max(20, tracks // self.TRACKS_PER_GENRE))]
+        self.__artists = ["Artist %d" % i for i in
+                          range(max(10, tracks // self.TRACKS_PER_ARTIST))]
+
+    def get_albums(self):
+        """
+            Generate albums
+            @return albums as [[track as dict]]
+        """
+        albums = []
+        count = max(1, self.__tracks // self.TRACKS_PER_ALBUM)
+        track_count = 0
+        for i in range(count):
+            compilation = i % self.COMPILATIONS == 0
+            album_artist = "" if compilation else\
+                self.__random.choice(self.__artists)
+            genres = "; ".join(self.__random.sample(
+                                   self.__genres,
+                                   self.__random.randint(1, 2)))
+            year = self.__random.randint(1950, 2017)
+            tracks = []
+            for number in range(1, self.TRACKS_PER_ALBUM + 1):
+                if track_count == self.__tracks:
+                    break
+                track_count += 1
+                artist = self.__random.choice(self.__artists)\
+                    if compilation else album_artist
+                path = "/music/%s/Album %d/%02d - Track %d.ogg" % (
+                    album_artist or "Various", i, number, track_count)
+                tracks.append({
+                    "title": "Track %d" % track_count,
+                    "uri": "file://" + quote(path),
+                    "artists": artist,
+                    "album_artists": album_artist,
+                    "album": "Album %d" % i,
+                    "genres": genres,
+                    "number": number,
+                    "year": year,
+                    "duration": self.__random.randint(60, 600)})
+            albums.append(tracks)
+        return albums
+
+    def get_search_items(self):
+        """
+            Search strings matching artists, albums and tracks
+            @return [str]
+        """
+        return ["Artist 1", "Album 12", "Track 42", "Genre", "1984"]
+
+
+class PlanConnection:
+    """
+        Proxy to a sqlite3 connection, keep queries for EXPLAIN QUERY PLAN
+    """
+
+    def __init__(self, connection):
+        """
+            Init proxy
+            @param connection as sqlite3.Connection
+        """
+        object.__setattr__(self, "_connection", connection)
+        # [(statement as str, args as tuple)]
+        object.__setattr__(self, "queries", [])
+
+    def execute(self, statement, *args):
+        """
+            Keep statement and execute it
+            @param statement as str
+            @param args as sqlite3.Connection.execute() args
+            @return sqlite3.Cursor
+        """
+        self.queries.append((statement, args))
+        return self._connection.execute(statement, *args)
+
+    def __getattr__(self, attr):
+        return getattr(self._connection, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._connection, attr, value)
+
+
+# Methods reading whole collection by design, full scan is expected
+FULL_SCANS = ["tracks.count", "tracks.is_empty", "tracks.get_ids",
+              "tracks.get_uris", "tracks.get_mtimes",
+              "tracks.get_avg_popularity", "tracks.get_populars",
+              "tracks.get_rated", "tracks.get_randoms",
+              "tracks.get_never_listened_to",
+              "tracks.get_recently_listened_to"]
+# Methods not starting with one of these write to database
+READ_PREFIXES = ("get", "count", "exists", "is_", "has_", "search")
+
+
+def check_plans(app):
+    """
+        Run EXPLAIN QUERY PLAN for each statement of *Database read methods
+        @param app as Application, with a populated collection
+        Methods failing are reported, they may predate current schema
+        @return methods doing a full scan of tracks as int
+    """
+    connection = app.db.get_cursor()
+    (track_id, track_name, track_uri, album_id, disc) = connection.execute(
+                             "SELECT rowid, name, uri, album_id, discnumber\
+                              FROM tracks LIMIT 1").fetchone()
+    (album_name, album_uri, year) = connection.execute(
+                             "SELECT name, uri, year FROM albums\
+                              WHERE rowid=?", (album_id,)).fetchone()
+    (artist_id, artist_name) = connection.execute(
+                             "SELECT artists.rowid, artists.name\
+                              FROM artists, track_artists\
+                              WHERE track_artists.artist_id=artists.rowid\
+                              AND track_artists.track_id=?",
+                             (track_id,)).fetchone()
+    (genre_id, genre_name) = connection.execute(
+                             "SELECT genres.rowid, genres.name\
+                              FROM genres, track_genres\
+                              WHERE track_genres.genre_id=genres.rowid\
+                              AND track_genres.track_id=?",
+                             (track_id,)).fetchone()
+    # Arguments by parameter name
+    values = {"track_id": track_id, "track_ids": [track_id],
+              "album_id": album_id, "album_ids": [album_id],
+              "artist_id": artist_id, "artist_ids": [artist_id],
+              "genre_id": genre_id, "genre_ids": [genre_id],
+              "uri": track_uri, "name": track_name,
+              "album_name": album_name, "artist": artist_name,
+              "title": track_name, "searched": track_name,
+              "string": track_name, "year": year, "disc": disc}
+    overrides = {"albums": {"uri": album_uri},
+                 "artists": {"name": artist_name},
+                 "genres": {"name": genre_name}}
+    # Pooled connection for main thread is replaced by proxy
+    proxy = PlanConnection(connection)
+    app.cursors.close(app.db)
+    app.db.get_cursor = lambda: proxy
+    failed = 0
+    for (namespace, db) in [("tracks", app.tracks), ("albums", app.albums),
+                            ("artists", app.artists),
+                            ("genres", app.genres)]:
+        for (name, method) in inspect.getmembers(db, inspect.ismethod):
+            if not name.startswith(READ_PREFIXES):
+                continue
+            label = "%s.%s" % (namespace, name)
+            namespace_values = dict(values, **overrides.get(namespace, {}))
+            parameters = inspect.signature(method).parameters.values()
+            # Call with all values, then with defaults if any
+            # Cached getters only take positional arguments
+            calls = [[], []]
+            missing = None
+            for parameter in parameters:
+                if parameter.name in namespace_values:
+                    value = namespace_values[parameter.name]
+                elif parameter.default is not parameter.empty:
+                    value = parameter.default
+                else:
+                    missing = parameter.name
+                    break
+                calls[0].append(value)
+                if parameter.default is parameter.empty:
+                    calls[1].append(value)
+            if missing is not None:
+                print("%-40s skipped, no value for %s" % (label, missing))
+                continue
+            if calls[0] == calls[1]:
+                calls.pop()
+            del proxy.queries[:]
+            try:
+                for args in calls:
+                    # Cached getters do not query database
+                    app.cache.clear()
+                    method(*args)
+                scans = []
+                for (statement, args) in proxy.queries:
+                    if not statement.lstrip().upper().startswith("SELECT"):
+                        continue
+                    for row in connection.execute(
+                            "EXPLAIN QUERY PLAN " + statement, *args):
+                        if re.match(r"SCAN (TABLE )?tracks\b", row[-1]):
+                            scans.append(" ".join(statement.split()))
+                            break
+            except Exception as e:
+                print("%-40s error: %s" % (label, e))
+                continue
+            if not scans:
+                print("%-40s ok" % label)
+            elif label in FULL_SCANS:
+                print("%-40s ok, full scan expected" % label)
+            else:
+                print("%-40s full scan of tracks" % label)
+                for statement in scans:
+                    print("    %s" % statement)
+                failed += 1
+    del app.db.get_cursor
+    app.cursors.close(app.db)
+    return failed
+
+
+def run_size(tracks, seed, repeat, output, plans=False):
+    """
+        Run benchmark for one collection size in current process
+        @param tracks as int
+        @param seed as int
+        @param repeat as int
+        @param output as str
+        @param plans as bool, only check query plans, exit status is
+               methods doing a full scan of tracks
+    """
+    datadir = tempfile.mkdtemp(prefix="lollypop-benchmark-")
+    os.environ["HOME"] = datadir
+    os.environ["XDG_DATA_HOME"] = datadir
+    os.environ["XDG_CACHE_HOME"] = datadir
+    os.environ["GSETTINGS_BACKEND"] = "memory"
+    os.environ["GSETTINGS_SCHEMA_DIR"] = datadir
+    subprocess.check_call(["glib-compile-schemas", "--targetdir", datadir,
+                           os.path.join(ROOT, "data")])
+    sys.path.insert(0, ROOT)
+
+    import gi
+    gi.require_version("Gst", "1.0")
+    gi.require_version("GstPbutils", "1.0")
+    from gi.repository import Gio, GLib, Gst
+    Gst.init(None)
+
+    from lollypop.database import Database
+    from lollypop.database_albums import AlbumsDatabase
+    from lollypop.database_artists import ArtistsDatabase
+    from lollypop.database_genres import GenresDatabase
+    from lollypop.database_tracks import TracksDatabase
+    from lollypop.database_cache import DatabaseCache
+    from lollypop.database_history import History
+    from lollypop.collectionscanner import CollectionScanner
+    from lollypop.playlists import Playlists
+    from lollypop.search import Search
+    from lollypop.settings import Settings
+    from lollypop.sqlcursor import SqlCursor, SqlPool
+    from lollypop.objects import Track
+    from lollypop.define import Lp, OrderBy, Type
+
+    class Info:
+        """
+            Discoverer info replacement built from generated tags
+        """
+        def __init__(self, track):
+            """
+                Init info
+                @param track as dict
+            """
+            self.__duration = track["duration"] * Gst.SECOND
+            values = ['title=(string)"%s"' % track["title"],
+                      'album=(string)"%s"' % track["album"],
+                      'track-number=(uint)%d' % track["number"],
+                      'datetime=(datetime)%d' % track["year"]]
+            for artist in track["artists"].split(";"):
+                values.append('artist=(string)"%s"' % artist.strip())
+            if track["album_artists"]:
+                values.append('album-artist=(string)"%s"' %
+                              track["album_artists"])
+            for genre in track["genres"].split(";"):
+                values.append('genre=(string)"%s"' % genre.strip())
+            self.__tags = Gst.TagList.new_from_string(
+                                        "taglist, " + ", ".join(values))
+
+        def get_tags(self):
+            return self.__tags
+
+        def get_duration(self):
+            return self.__duration
+
+    class Scanner(CollectionScanner):
+        """
+            Collection scanner reading generated tags
+        """
+        def __init__(self):
+            CollectionScanner.__init__(self)
+            self.generated = {}
+
+        def get_info(self, uri):
+            return Info(self.generated[uri])
+
+    class Application(Gio.Application):
+        """
+            Minimal application, Lp() needs a default Gio.Application
+        """
+        def __init__(self):
+            Gio.Application.__init__(
+                            self,
+                            application_id="org.gnome.Lollypop.Benchmark",
+                            flags=Gio.ApplicationFlags.NON_UNIQUE)
+            self.cursors = SqlPool()
+            self.cache = DatabaseCache()
+            self.settings = Settings.new()
+            self.settings.set_value("auto-update", GLib.Variant("b", False))
+            self.window = None
+            self.notify = None
+            self.lastfm = None
+            self.debug = False
+            self.db = Database()
+            self.playlists = Playlists()
+            SqlCursor.add(self.db)
+            SqlCursor.add(self.playlists)
+            self.albums = AlbumsDatabase()
+            self.artists = ArtistsDatabase()
+            self.genres = GenresDatabase()
+            self.tracks = TracksDatabase()
+            self.scanner = Scanner()
+            self.cache.watch(self.scanner)
+
+    def flush():
+        """
+            Run pending idle callbacks (scanner signals)
+        """
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+
+    def measure(name, function, *args):
+        """
+            Time function
+            @param name as str
+            @param function as function
+            @param args as function args
+        """
+        durations = []
+        for i in range(repeat):
+            start = perf_counter()
+            function(*args)
+            durations.append((perf_counter() - start) * 1000)
+            flush()
+        results[name] = {"runs": repeat,
+                         "min_ms": round(min(durations), 3),
+                         "median_ms": round(median(durations), 3),
+                         "mean_ms": round(mean(durations), 3)}
+        print("%-40s %10.2f ms" % (name, median(durations)))
+
+    app = Application()
+    # Scanner internals, it only has a public API for full scans
+    add2db = getattr(app.scanner, "_CollectionScanner__add2db")
+    del_from_db = getattr(app.scanner, "_CollectionScanner__del_from_db")
+    results = {}
+    generator = Generator(tracks, seed)
+    albums = generator.get_albums()
+    # Keep some tracks for scanner add path
+    scan_count = min(1000, max(1, tracks // 10))
+    scan_tracks = []
+    while len(scan_tracks) < scan_count and albums:
+        scan_tracks += albums.pop()
+    mtime = int(time())
+
+    # Populate collection through scanner add path
+    start = perf_counter()
+    setattr(app.scanner, "_CollectionScanner__history", History())
+    app.scanner.start_batch()
+    with SqlCursor(app.db) as sql:
+        for album in albums:
+            for track in album:
+                app.scanner.generated[track["uri"]] = track
+                add2db(track["uri"], mtime)
+            app.scanner.flush_batch()
+            sql.commit()
+            flush()
+    app.scanner.stop_batch()
+    generate = perf_counter() - start
+    print("%-40s %10.2f s" % ("generate", generate))
+
+    with SqlCursor(app.db) as sql:
+        sql.execute("ANALYZE")
+        sql.commit()
+    if plans:
+        sys.exit(min(check_plans(app), 1))
+    genre_ids = [genre_id for (genre_id, name) in app.genres.get()][:3]
+
+    # Albums
+    for (name, orderby) in [("artist", OrderBy.ARTIST),
+                            ("name", OrderBy.NAME),
+                            ("year", OrderBy.YEAR),
+                            ("popularity", OrderBy.POPULARITY)]:
+        app.settings.set_enum("orderby", orderby)
+        measure("albums.get_ids[%s]" % name, app.albums.get_ids, [], [])
+        measure("albums.get_ids[%s, genre]" % name,
+                app.albums.get_ids, [], genre_ids[:1])
+    app.settings.reset("orderby")
+    measure("albums.get_party_ids", app.albums.get_party_ids, genre_ids)
+    measure("albums.get_party_ids[populars]",
+            app.albums.get_party_ids, [Type.POPULARS])
+
+    # Artists
+    measure("artists.get", app.artists.get, [])
+    measure("artists.get[genre]", app.artists.get, genre_ids[:1])
+
+    # Search
+    search = Search()
+    get = getattr(search, "_Search__get")
+    cancellable = Gio.Cancellable()
+    for item in generator.get_search_items():
+        measure("search[%s]" % item, get, [item], cancellable)
+
+    # Playlists
+    rand = random.Random(seed)
+    track_ids = app.tracks.get_ids()
+    for size in [100, 1000]:
+        name = "Benchmark %d" % size
+        app.playlists.add(name)
+        playlist_id = app.playlists.get_id(name)
+        app.playlists.add_tracks(playlist_id,
+                                 [Track(track_id) for track_id in rand.sample(
+                                      track_ids, min(size, len(track_ids)))],
+                                 False)
+        measure("playlists.get_track_ids[%d]" % size,
+                app.playlists.get_track_ids, playlist_id)
+
+    # Scanner add/remove paths
+    def scan_add():
+        app.scanner.start_batch()
+        with SqlCursor(app.db) as sql:
+            for track in scan_tracks:
+                app.scanner.generated[track["uri"]] = track
+                add2db(track["uri"], mtime)
+            app.scanner.flush_batch()
+            sql.commit()
+        app.scanner.stop_batch()
+
+    def scan_remove():
+        with SqlCursor(app.db) as sql:
+            del_from_db([track["uri"] for track in scan_tracks])
+            sql.commit()
+
+    for (name, function) in [("scanner.add", scan_add),
+                             ("scanner.remove", scan_remove)]:
+        start = perf_counter()
+        function()
+        flush()
+        duration = (perf_counter() - start) * 1000
+        results[name] = {"runs": 1,
+                         "tracks": len(scan_tracks),
+                         "total_ms": round(duration, 3),
+                         "per_track_ms": round(duration / len(scan_tracks),
+                                               3)}
+        print("%-40s %10.2f ms" % (name, duration))
+
+    report = {"tracks": tracks,
+              "albums": len(app.albums.get_ids()),
+              "artists": len(app.artists.get([])),
+              "genres": len(app.genres.get()),
+              "seed": seed,
+              "generate_s": round(generate, 3),
+              "cache_hit_rate": round(Lp().cache.hit_rate, 3),
+              "results": results}
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def run_tags(directory, output):
+    """
+        Compare GStreamer discoverer and header tag reader on files
+        Header reader runs first for each file, so it pays for cold cache
+        @param directory as str
+        @param output as str
+    """
+    sys.path.insert(0, ROOT)
+    import gi
+    gi.require_version("Gst", "1.0")
+    gi.require_version("GstPbutils", "1.0")
+    from gi.repository import GLib, Gst
+    Gst.init(None)
+    from lollypop.tagreader import TagReader, HeaderDiscoverer
+    from lollypop.tagreader_header import HeaderReader
+
+    def get_fields(info, path):
+        """
+            Get fields scanner stores
+            @param info as GstPbutils.DiscovererInfo/HeaderInfo
+            @param path as str
+            @return tuple
+        """
+        tags = info.get_tags()
+        name = os.path.basename(path)
+        return (reader.get_title(tags, name), reader.get_artists(tags),
+                reader.get_album_artist(tags), reader.get_album_name(tags),
+                reader.get_genres(tags), reader.get_tracknumber(tags, name),
+                reader.get_discnumber(tags), reader.get_year(tags),
+                int(info.get_duration() / Gst.SECOND))
+
+    formats = {}
+    for (root, dirs, files) in os.walk(directory):
+        for name in files:
+            extension = os.path.splitext(name)[1].lower().lstrip(".")
+            if extension:
+                formats.setdefault(extension, []).append(
+                                                   os.path.join(root, name))
+    reader = TagReader()
+    header = HeaderDiscoverer()
+    header_reader = HeaderReader()
+    results = {}
+    print("%-8s %8s %10s %10s %8s %9s %10s" % ("format", "files",
+                                               "gst ms", "header ms",
+                                               "speedup", "supported",
+                                               "mismatches"))
+    for (extension, paths) in sorted(formats.items()):
+        gst_time = header_time = 0
+        files = supported = mismatches = 0
+        for path in paths:
+            uri = GLib.filename_to_uri(path)
+            try:
+                start = perf_counter()
+                header_info = header.get_info(uri)
+                header_time += perf_counter() - start
+                start = perf_counter()
+                gst_info = reader.get_info(uri)
+                gst_time += perf_counter() - start
+            except Exception:
+                # Not a media file
+                continue
+            files += 1
+            if header_reader.read(path) is not None:
+                supported += 1
+                if get_fields(header_info, path) !=\
+                        get_fields(gst_info, path):
+                    mismatches += 1
+                    print("Mismatch:", path)
+        if not files:
+            continue
+        results[extension] = {
+            "files": files,
+            "supported": supported,
+            "mismatches": mismatches,
+            "gst_ms_per_file": round(gst_time * 1000 / files, 3),
+            "header_ms_per_file": round(header_time * 1000 / files, 3)}
+        print("%-8s %8d %10.2f %10.2f %7.1fx %9d %10d" % (
+              extension, files, gst_time * 1000 / files,
+              header_time * 1000 / files,
+              gst_time / max(header_time, 1e-9), supported, mismatches))
+    with open(output, "w") as f:
+        json.dump({"commit": get_commit(),
+                   "python": platform.python_version(),
+                   "directory": directory,
+                   "formats": results}, f, indent=2)
+    print("Results written to %s" % output)
+
+
+def get_commit():
+    """
+        Get current git commit
+        @return str/None
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       cwd=ROOT,
+                                       stderr=subprocess.DEVNULL
+                                       ).decode("utf-8").strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                           description="Lollypop database benchmark")
+    parser.add_argument("--tracks", default="10000",
+                        help="collection sizes, comma separated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--tags", metavar="DIRECTORY",
+                        help="compare tag readers on files in directory")
+    parser.add_argument("--plans", action="store_true",
+                        help="check query plans, fail on full scan of tracks")
+    parser.add_argument("--single", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tags:
+        run_tags(args.tags, args.output)
+        sys.exit(0)
+
+    if args.plans:
+        run_size(int(args.tracks.split(",")[0]), args.seed, args.repeat,
+                 args.output, True)
+
+    if args.single:
+        run_size(int(args.tracks), args.seed, args.repeat, args.output)
+        sys.exit(0)
+
+    runs = []
+    for tracks in [int(size) for size in args.tracks.split(",")]:
+        (fd, path) = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        subprocess.check_call([sys.executable, os.path.abspath(__file__),
+                               "--single", "--tracks", str(tracks),
+                               "--seed", str(args.seed),
+                               "--repeat", str(args.repeat),
+                               "--output", path])
+        with open(path) as f:
+            runs.append(json.load(f))
+        os.remove(path)
+    with open(args.output, "w") as f:
+        json.dump({"commit": get_commit(),
+                   "python": platform.python_version(),
+                   "sqlite": sqlite3.sqlite_version,
+                   "runs": runs}, f, indent=2)
+    print("Results written to %s" % args.output)
@@ -40,7 +40,8 @@ from lollypop.database import Database
 from lollypop.player import Player
 from lollypop.inhibitor import Inhibitor
 from lollypop.art import Art
-from lollypop.sqlcursor import SqlCursor
+from lollypop.sqlcursor import SqlCursor, SqlPool
+from lollypop.database_cache import DatabaseCache
 from lollypop.settings import Settings, SettingsDialog
 from lollypop.database_albums import AlbumsDatabase
 from lollypop.database_artists import ArtistsDatabase
@@ -87,7 +88,8 @@ class Application(Gtk.Application):
                     GLib.setenv("SSL_CERT_FILE", path, True)
                     break
 
-        self.cursors = {}
+        self.cursors = SqlPool()
+        self.cache = DatabaseCache()
         self.window = None
         self.notify = None
         self.lastfm = None
@@ -169,11 +171,13 @@ class Application(Gtk.Application):
         self.player = Player()
         self.inhibitor = Inhibitor()
         self.scanner = CollectionScanner()
+        self.cache.watch(self.scanner)
         self.art = Art()
         self.notify = NotificationManager()
         self.art.update_art_size()
         if self.settings.get_value("artist-artwork"):
             GLib.timeout_add(5000, self.art.cache_artists_info)
+        GLib.timeout_add(60000, self.art.clean_cache)
         if LastFM is not None:
             self.lastfm = LastFM("lastfm")
             self.librefm = LastFM("librefm")
@@ -193,6 +197,7 @@ class Application(Gtk.Application):
         self.add_action(self.settings.create_action("shuffle"))
 
         self.db.upgrade()
+        self.db.update_sort_keys()
 
     def do_startup(self):
         """
@@ -227,6 +232,15 @@ class Application(Gtk.Application):
         """
         # First save state
         self.__save_state()
+        self.art.art_db.save()
+        if self.debug:
+            print("Application::quit(): cache hit rate %.2f (%s/%s)" %
+                  (self.cache.hit_rate, self.cache.hits,
+                   self.cache.hits + self.cache.misses))
+            print("Application::quit(): artwork cache hit rate %.2f, %s "
+                  "artworks, %.1f MB" % (self.art.surfaces.hit_rate,
+                                         self.art.surfaces.count,
+                                         self.art.surfaces.memory / 1048576))
         # Then vacuum db
         if vacuum:
             self.__vacuum()
@@ -386,6 +400,7 @@ class Application(Gtk.Application):
         options = app_cmd_line.get_options_dict()
         if options.contains("debug"):
             self.debug = True
+            self.cursors.set_tracing(True)
         if options.contains("set-rating"):
             value = options.lookup_value("set-rating").get_string()
             try:
@@ -10,17 +10,28 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+from gi.repository import Gio
+
+from lollypop.define import Lp
 from lollypop.art_album import AlbumArt
 from lollypop.art_radio import RadioArt
 from lollypop.downloader import Downloader
+from lollypop.helper_task import TaskHelper
+from lollypop.objects import Album
+from lollypop.cache import InfoCache
+from lollypop.utils import escape
 
 from shutil import rmtree
+from time import time
 
 
 class Art(AlbumArt, RadioArt, Downloader):
     """
         Global artwork manager
     """
+    # Exported files older than this are removed, they are exported again
+    # on demand
+    __EXPORT_AGE = 86400  # Seconds
 
     def __init__(self):
         """
@@ -31,13 +42,103 @@ class Art(AlbumArt, RadioArt, Downloader):
         Downloader.__init__(self)
         self._create_cache()
         self._create_store()
+        self.__clean_cache_running = False
 
     def clean_all_cache(self):
         """
             Remove all covers from cache
         """
         try:
-            rmtree(self._CACHE_PATH)
-            self._create_cache()
+            # Keep artwork database, other threads may be using it
+            d = Gio.File.new_for_path(self._CACHE_PATH)
+            infos = d.enumerate_children(
+                "standard::name,standard::type",
+                Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+                None)
+            for info in infos:
+                if info.get_name().startswith("art.db"):
+                    continue
+                f = infos.get_child(info)
+                if info.get_file_type() == Gio.FileType.DIRECTORY:
+                    rmtree(f.get_path())
+                else:
+                    f.delete(None)
+            self.art_db.clear()
+            self.surfaces.clear()
         except Exception as e:
             print("Art::clean_all_cache(): ", e)
+
+    def clean_cache(self):
+        """
+            Shrink cache in background:
+            remove artworks for albums and artists not in collection anymore
+            and least recently used artworks when over cache-size
+        """
+        if self.__clean_cache_running:
+            return
+        self.__clean_cache_running = True
+        helper = TaskHelper()
+        helper.run(self.__clean_cache)
+
+#######################
+# PRIVATE             #
+#######################
+    def __clean_cache(self):
+        """
+            Shrink cache
+            @thread safe
+        """
+        try:
+            removed = 0
+            self.art_db.save()
+            # Scanner may be removing and adding back albums
+            if not Lp().scanner.is_locked():
+                album_ids = Lp().albums.get_ids() +\
+                    Lp().albums.get_compilation_ids()
+                names = set()
+                # One query for many albums, below SQLite variables limit
+                for i in range(0, len(album_ids), 500):
+                    rows = Lp().albums.get_rows(album_ids[i:i + 500])
+                    for (album_id, fields) in rows.items():
+                        album = Album(album_id)
+                        album.set_fields(fields)
+                        names.add(self.get_album_cache_name(album))
+                prefixes = set([escape(name) for (artist_id, name, sortname)
+                                in Lp().artists.get_names()])
+                # Do not clean an empty or not yet populated collection
+                if names:
+                    removed += self.art_db.remove_orphans(names, prefixes)
+                    InfoCache.remove_orphans(prefixes)
+            budget = Lp().settings.get_value("cache-size").get_int32()
+            if budget > 0:
+                removed += self.art_db.evict(budget * 1024 * 1024)
+            # VACUUM locks database while rewriting it, readers would wait
+            if removed:
+                self.art_db.vacuum()
+            self.__remove_exported_files(self._CACHE_PATH)
+            self.__remove_exported_files(InfoCache._CACHE_PATH)
+        except Exception as e:
+            print("Art::__clean_cache():", e)
+        self.__clean_cache_running = False
+
+    def __remove_exported_files(self, path):
+        """
+            Remove old jpeg files exported for MPRIS and notifications
+            Old per size artworks are removed too
+            @param path as str
+        """
+        try:
+            d = Gio.File.new_for_path(path)
+            infos = d.enumerate_children(
+                "standard::name,time::modified",
+                Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+                None)
+            for info in infos:
+                if not info.get_name().endswith(".jpg"):
+                    continue
+                mtime = info.get_attribute_uint64("time::modified")
+                if time() - mtime > self.__EXPORT_AGE:
+                    f = infos.get_child(info)
+                    f.delete(None)
+        except Exception as e:
+            print("Art::__remove_exported_files():", e)
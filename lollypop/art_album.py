@@ -13,10 +13,14 @@
 from gi.repository import GLib, Gdk, GdkPixbuf, Gio, Gst
 
 import re
+from threading import Thread
+from queue import Queue
 
 from lollypop.art_base import BaseArt
-from lollypop.tagreader import TagReader
-from lollypop.define import Lp, ArtSize
+from lollypop.art_cache import SurfaceCache
+from lollypop.tagreader import TagReader, Discoverer
+from lollypop.database_art import ArtDatabase
+from lollypop.define import Lp, ArtSize, ArtSource
 from lollypop.objects import Album
 from lollypop.utils import escape, is_readonly
 from lollypop.helper_dbus import DBusHelper
@@ -29,6 +33,8 @@ class AlbumArt(BaseArt, TagReader):
     """
 
     _MIMES = ("jpeg", "jpg", "png", "gif")
+    # Threads loading artworks for get_album_artwork_async()
+    __WORKERS = 2
 
     def __init__(self):
         """
@@ -38,10 +44,19 @@ class AlbumArt(BaseArt, TagReader):
         TagReader.__init__(self)
         self.__favorite = Lp().settings.get_value(
                                                 "favorite-cover").get_string()
+        self.__surfaces = SurfaceCache()
+        self._create_cache()
+        self.__art_db = ArtDatabase()
+        # Created on first async request
+        self.__requests = None
+        # Bumped when cached artworks are invalidated, so pending
+        # requests know their result may be outdated
+        self.__generation = 0
 
     def get_album_cache_path(self, album, size):
         """
             get artwork cache path for album_id
+            Artworks are not stored as files, so it is exported from cache
             @param album as Album
             @param size as int
             @return cover path as string or None if no cover
@@ -55,14 +70,20 @@ class AlbumArt(BaseArt, TagReader):
             f = Gio.File.new_for_path(cache_path_jpg)
             if f.query_exists():
                 return cache_path_jpg
-            else:
-                self.get_album_artwork(album, size, 1)
-                if f.query_exists():
-                    return cache_path_jpg
-                else:
-                    return self._get_default_icon_path(
+            data = self.__art_db.get_data(filename, size)
+            # Not get_album_artwork(), surface may still be in memory
+            # while thumbnail has been evicted
+            if data is None and\
+                    self.__get_album_pixbuf(album, filename,
+                                            size, self) is not None:
+                data = self.__art_db.get_data(filename, size)
+            if data is None:
+                return self._get_default_icon_path(
                                            size,
                                            "folder-music-symbolic")
+            f.replace_contents(data, None, False,
+                               Gio.FileCreateFlags.REPLACE_DESTINATION, None)
+            return cache_path_jpg
         except Exception as e:
             print("Art::get_album_cache_path(): %s" % e, ascii(filename))
             return None
@@ -149,79 +170,63 @@ class AlbumArt(BaseArt, TagReader):
             @param scale factor as int
             @return cairo surface
         """
-        size *= scale
         filename = self.get_album_cache_name(album)
-        cache_path_jpg = "%s/%s_%s.jpg" % (self._CACHE_PATH, filename, size)
-        pixbuf = None
-
-        try:
-            # Look in cache
-            f = Gio.File.new_for_path(cache_path_jpg)
-            if f.query_exists():
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(cache_path_jpg,
-                                                                size,
-                                                                size)
-            else:
-                # Use favorite folder artwork
-                if pixbuf is None:
-                    uri = self.get_album_artwork_uri(album)
-                    data = None
-                    if uri is not None:
-                        f = Gio.File.new_for_uri(uri)
-                        (status, data, tag) = f.load_contents(None)
-                        ratio = self._respect_ratio(uri)
-                        bytes = GLib.Bytes(data)
-                        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
-                        bytes.unref()
-                        pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(
-                                                                       stream,
-                                                                       size,
-                                                                       size,
-                                                                       ratio,
-                                                                       None)
-                        stream.close()
-                # Use tags artwork
-                if pixbuf is None and album.tracks:
-                    try:
-                        pixbuf = self.pixbuf_from_tags(
-                                    album.tracks[0].uri, size)
-                    except Exception as e:
-                        print("AlbumArt::get_album_artwork()", e)
-
-                # Use folder artwork
-                if pixbuf is None and album.uri != "":
-                    uri = self.get_first_album_artwork(album)
-                    # Look in album folder
-                    if uri is not None:
-                        f = Gio.File.new_for_uri(uri)
-                        (status, data, tag) = f.load_contents(None)
-                        ratio = self._respect_ratio(uri)
-                        bytes = GLib.Bytes(data)
-                        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
-                        bytes.unref()
-                        pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(
-                                                                       stream,
-                                                                       size,
-                                                                       size,
-                                                                       ratio,
-                                                                       None)
-                        stream.close()
-                # Use default artwork
-                if pixbuf is None:
-                    self.cache_album_art(album.id)
-                    return self.get_default_icon("folder-music-symbolic",
-                                                 size,
-                                                 scale)
-                else:
-                    pixbuf.savev(cache_path_jpg, "jpeg", ["quality"],
-                                 [str(Lp().settings.get_value(
-                                                "cover-quality").get_int32())])
-            surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf, scale, None)
+        key = (filename, size, scale)
+        surface = self.__surfaces.get(key)
+        if surface is not None:
             return surface
-
+        try:
+            pixbuf = self.__get_album_pixbuf(album, filename,
+                                             size * scale, self)
+            return self.__get_album_surface(album, key, pixbuf)
         except Exception as e:
             print("AlbumArt::get_album_artwork()", e)
-            return self.get_default_icon("folder-music-symbolic", size, scale)
+            return self.get_default_icon("folder-music-symbolic",
+                                         size * scale, scale)
+
+    def get_album_artwork_async(self, album, size, scale,
+                                cancellable, callback, *args):
+        """
+            Get a cairo surface for album_id without blocking main thread
+            Artwork is loaded by a pool of threads, callback is run in
+            main thread, at once if artwork is in memory
+            @param album as Album
+            @param pixbuf size as int
+            @param scale factor as int
+            @param cancellable as Gio.Cancellable
+            @param callback as function(surface as cairo.Surface, *args),
+                   not run if cancelled
+        """
+        filename = self.get_album_cache_name(album)
+        key = (filename, size, scale)
+        surface = self.__surfaces.get(key)
+        if surface is not None:
+            callback(surface, *args)
+            return
+        if self.__requests is None:
+            self.__requests = Queue()
+            for n in range(self.__WORKERS):
+                thread = Thread(target=self.__load_artworks,
+                                name="AlbumArt-%s" % n)
+                thread.daemon = True
+                thread.start()
+        self.__requests.put((album, key, self.__generation,
+                             cancellable, callback, args))
+
+    def get_album_placeholder(self, size, scale):
+        """
+            Get surface shown while album artwork is loading
+            @param size as int
+            @param scale factor as int
+            @return cairo surface
+        """
+        key = ("folder-music-symbolic", size, scale)
+        surface = self.__surfaces.get(key)
+        if surface is None:
+            surface = self.get_default_icon("folder-music-symbolic",
+                                            size * scale, scale)
+            self.__surfaces.add(key, surface)
+        return surface
 
     def get_album_artwork2(self, uri, size, scale):
         """
@@ -320,6 +325,11 @@ class AlbumArt(BaseArt, TagReader):
             @param album as Album
         """
         cache_name = self.get_album_cache_name(album)
+        self.__generation += 1
+        self.__surfaces.remove(cache_name)
+        self.__art_db.remove_source(cache_name)
+        self.__art_db.remove_pixbufs(cache_name)
+        # Exported by get_album_cache_path()
         try:
             d = Gio.File.new_for_path(self._CACHE_PATH)
             infos = d.enumerate_children(
@@ -335,17 +345,20 @@ class AlbumArt(BaseArt, TagReader):
         except Exception as e:
             print("Art::clean_album_cache(): ", e, cache_name)
 
-    def pixbuf_from_tags(self, uri, size):
+    def pixbuf_from_tags(self, uri, size, discoverer=None):
         """
             Return cover from tags
             @param uri as str
             @param size as int
+            @param discoverer as Discoverer, self if None
         """
         pixbuf = None
         if uri.startswith("http:") or uri.startswith("https:"):
             return
+        if discoverer is None:
+            discoverer = self
         try:
-            info = self.get_info(uri)
+            info = discoverer.get_info(uri)
             exist = False
             if info is not None:
                 (exist, sample) = info.get_tags().get_sample_index("image", 0)
@@ -378,9 +391,225 @@ class AlbumArt(BaseArt, TagReader):
             "_" + album.name[:100] + "_" + album.year
         return escape(name)
 
+    def do_album_artwork_changed(self, album_id):
+        """
+            Drop decoded artworks for album, before widgets reload them
+            @param album id as int
+        """
+        self.__generation += 1
+        self.__surfaces.remove(self.get_album_cache_name(Album(album_id)))
+
+    @property
+    def art_db(self):
+        """
+            Artwork cache database
+            @return ArtDatabase
+        """
+        return self.__art_db
+
+    @property
+    def surfaces(self):
+        """
+            Decoded album artworks
+            @return SurfaceCache
+        """
+        return self.__surfaces
+
 #######################
 # PRIVATE             #
 #######################
+    def __get_album_pixbuf(self, album, filename, size, discoverer):
+        """
+            Load album artwork, from cache first, can be run in a thread
+            Source found by last lookup is used while album dir is unchanged
+            @param album as Album
+            @param filename as str, album cache name
+            @param size as int, scale included
+            @param discoverer as Discoverer, used for tags artwork
+            @return GdkPixbuf.Pixbuf/None
+        """
+        # Look in cache
+        pixbuf = self.__art_db.get_pixbuf(filename, size)
+        if pixbuf is not None:
+            return pixbuf
+        album_mtime = self.__get_mtime(album.uri)
+        found = False
+        entry = self.__art_db.get_source(filename)
+        if entry is not None:
+            (album_uri, mtime, source, uri, uri_mtime) = entry
+            if album_uri == album.uri and mtime == album_mtime and\
+                    uri_mtime == self.__get_mtime(uri):
+                if source != ArtSource.NONE:
+                    pixbuf = self.__pixbuf_from_source(source, uri, size,
+                                                       discoverer)
+                found = pixbuf is not None or source == ArtSource.NONE
+        if not found:
+            (source, uri, pixbuf) = self.__find_album_pixbuf(album, size,
+                                                             discoverer)
+            self.__art_db.set_source(filename, album.uri, album_mtime,
+                                     source, uri, self.__get_mtime(uri))
+        if pixbuf is not None:
+            self.__art_db.set_pixbuf(filename, size, pixbuf)
+        return pixbuf
+
+    def __find_album_pixbuf(self, album, size, discoverer):
+        """
+            Look for album artwork in all sources
+            @param album as Album
+            @param size as int, scale included
+            @param discoverer as Discoverer, used for tags artwork
+            @return (source as ArtSource, uri as str/None,
+                     pixbuf as GdkPixbuf.Pixbuf/None)
+        """
+        # Use favorite folder artwork
+        uri = self.get_album_artwork_uri(album)
+        if uri is not None:
+            store_uri = GLib.filename_to_uri(self._STORE_PATH)
+            if uri.startswith(store_uri):
+                source = ArtSource.STORE
+            else:
+                source = ArtSource.FAVORITE
+            return (source, uri, self.__pixbuf_from_uri(uri, size))
+        # Use tags artwork
+        if album.tracks:
+            uri = album.tracks[0].uri
+            try:
+                pixbuf = self.pixbuf_from_tags(uri, size, discoverer)
+                if pixbuf is not None:
+                    return (ArtSource.TAGS, uri, pixbuf)
+            except Exception as e:
+                print("AlbumArt::__find_album_pixbuf()", e)
+        # Use folder artwork
+        if album.uri != "":
+            uri = self.get_first_album_artwork(album)
+            # Look in album folder
+            if uri is not None:
+                return (ArtSource.FOLDER, uri,
+                        self.__pixbuf_from_uri(uri, size))
+        return (ArtSource.NONE, None, None)
+
+    def __pixbuf_from_source(self, source, uri, size, discoverer):
+        """
+            Load artwork from a known source
+            @param source as ArtSource
+            @param uri as str
+            @param size as int, scale included
+            @param discoverer as Discoverer, used for tags artwork
+            @return GdkPixbuf.Pixbuf/None
+        """
+        try:
+            if source == ArtSource.TAGS:
+                return self.pixbuf_from_tags(uri, size, discoverer)
+            else:
+                return self.__pixbuf_from_uri(uri, size)
+        except Exception as e:
+            print("AlbumArt::__pixbuf_from_source()", e)
+        return None
+
+    def __get_mtime(self, uri):
+        """
+            Get modification time for uri
+            @param uri as str/None
+            @return int, 0 if uri is None, -1 if not found
+        """
+        if not uri:
+            return 0
+        try:
+            f = Gio.File.new_for_uri(uri)
+            info = f.query_info("time::modified",
+                                Gio.FileQueryInfoFlags.NONE,
+                                None)
+            return info.get_attribute_uint64("time::modified")
+        except:
+            return -1
+
+    def __pixbuf_from_uri(self, uri, size):
+        """
+            Load image at uri
+            @param uri as str
+            @param size as int
+            @return GdkPixbuf.Pixbuf
+        """
+        f = Gio.File.new_for_uri(uri)
+        (status, data, tag) = f.load_contents(None)
+        ratio = self._respect_ratio(uri)
+        bytes = GLib.Bytes(data)
+        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
+        bytes.unref()
+        pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(stream,
+                                                           size,
+                                                           size,
+                                                           ratio,
+                                                           None)
+        stream.close()
+        return pixbuf
+
+    def __get_album_surface(self, album, key, pixbuf):
+        """
+            Get surface for pixbuf and keep it in memory, main thread only
+            @param album as Album
+            @param key as (str, int, int)
+            @param pixbuf as GdkPixbuf.Pixbuf/None
+            @return cairo surface
+        """
+        (filename, size, scale) = key
+        if pixbuf is None:
+            self.cache_album_art(album.id)
+            # Dropped on album-artwork-changed
+            surface = self.get_default_icon("folder-music-symbolic",
+                                            size * scale,
+                                            scale)
+        else:
+            surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf,
+                                                           scale,
+                                                           None)
+        self.__surfaces.add(key, surface)
+        return surface
+
+    def __load_artworks(self):
+        """
+            Load requested artworks, run in a thread
+        """
+        # Discoverer is not thread safe, use one per thread
+        discoverer = Discoverer()
+        while True:
+            (album, key, generation,
+             cancellable, callback, args) = self.__requests.get()
+            if cancellable.is_cancelled():
+                continue
+            try:
+                pixbuf = self.__get_album_pixbuf(album, key[0],
+                                                 key[1] * key[2],
+                                                 discoverer)
+            except Exception as e:
+                print("AlbumArt::__load_artworks()", e)
+                pixbuf = None
+            GLib.idle_add(self.__on_album_pixbuf, album, key, pixbuf,
+                          generation, cancellable, callback, args)
+
+    def __on_album_pixbuf(self, album, key, pixbuf,
+                          generation, cancellable, callback, args):
+        """
+            Create surface and run callback
+            @param album as Album
+            @param key as (str, int, int)
+            @param pixbuf as GdkPixbuf.Pixbuf/None
+            @param generation as int
+            @param cancellable as Gio.Cancellable
+            @param callback as function
+            @param args as []
+        """
+        # Artworks changed while loading, pixbuf may be outdated
+        if generation != self.__generation:
+            if not cancellable.is_cancelled():
+                self.get_album_artwork_async(album, key[1], key[2],
+                                             cancellable, callback, *args)
+            return
+        # Keep it even if cancelled, loading was done
+        surface = self.__get_album_surface(album, key, pixbuf)
+        if not cancellable.is_cancelled():
+            callback(surface, *args)
+
     def __save_artwork_tags(self, data, album):
         """
             Save artwork in tags
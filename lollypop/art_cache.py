@@ -0,0 +1,126 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Lock
+from collections import OrderedDict
+
+
+class SurfaceCache:
+    """
+        Memory bounded LRU cache of decoded artworks
+        Key is (cache name, size, scale), surfaces must not be drawn on
+    """
+    __BUDGET = 64 * 1024 * 1024  # Bytes
+
+    def __init__(self):
+        """
+            Init cache
+        """
+        # {key: (surface, bytes as int)}
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+        self.__memory = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, key):
+        """
+            Get surface for key
+            @param key as (str, int, int)
+            @return cairo.Surface/None
+        """
+        with self.__lock:
+            if key in self.__items:
+                self.__items.move_to_end(key)
+                self.__hits += 1
+                return self.__items[key][0]
+            self.__misses += 1
+            return None
+
+    def add(self, key, surface):
+        """
+            Add surface for key, drop least recently used ones if needed
+            @param key as (str, int, int)
+            @param surface as cairo.Surface
+        """
+        try:
+            memory = surface.get_stride() * surface.get_height()
+        except:
+            (name, size, scale) = key
+            memory = size * size * scale * scale * 4
+        with self.__lock:
+            if key in self.__items:
+                self.__memory -= self.__items.pop(key)[1]
+            self.__items[key] = (surface, memory)
+            self.__memory += memory
+            while self.__memory > self.__BUDGET and len(self.__items) > 1:
+                self.__memory -= self.__items.popitem(last=False)[1][1]
+
+    def remove(self, name):
+        """
+            Remove surfaces for cache name, all sizes
+            @param name as str
+        """
+        with self.__lock:
+            for key in [key for key in self.__items if key[0] == name]:
+                self.__memory -= self.__items.pop(key)[1]
+
+    def clear(self):
+        """
+            Remove all surfaces
+        """
+        with self.__lock:
+            self.__items.clear()
+            self.__memory = 0
+
+    @property
+    def hits(self):
+        """
+            Surfaces read from cache
+            @return int
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+            Surfaces loaded from disk
+            @return int
+        """
+        return self.__misses
+
+    @property
+    def hit_rate(self):
+        """
+            Cache efficiency
+            @return float between 0 and 1
+        """
+        total = self.__hits + self.__misses
+        if total == 0:
+            return 0.0
+        return self.__hits / total
+
+    @property
+    def memory(self):
+        """
+            Memory used by surfaces
+            @return bytes as int
+        """
+        return self.__memory
+
+    @property
+    def count(self):
+        """
+            Surfaces in cache
+            @return int
+        """
+        return len(self.__items)
@@ -72,6 +72,7 @@ class InfoCache:
     def get_artwork(prefix, suffix, size):
         """
             Return path for artwork
+            Artworks are not stored as files, so it is exported from cache
             @param prefix as string
             @param suffix as string
             @param size as int
@@ -79,63 +80,84 @@ class InfoCache:
         """
         try:
             for (suffix, helper1, helper2) in InfoCache.WEBSERVICES:
-                extract = None
-                filepath = "%s/%s_%s.jpg" % (InfoCache._INFO_PATH,
-                                             escape(prefix),
-                                             suffix)
                 filepath_at_size = "%s/%s_%s_%s.jpg" % (InfoCache._CACHE_PATH,
                                                         escape(prefix),
                                                         suffix,
                                                         size)
-                if not path.exists(filepath) or path.getsize(filepath) == 0:
-                    filepath_at_size = None
+                if path.exists(filepath_at_size):
+                    return filepath_at_size
+                if InfoCache.get_artwork_pixbuf(prefix, suffix,
+                                                size) is None:
                     continue
-                # Make cache for this size
-                if not path.exists(filepath_at_size):
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(filepath,
-                                                                    size,
-                                                                    size)
-                    if pixbuf.get_height() > pixbuf.get_width():
-                        vertical = True
-                    elif pixbuf.get_height() < pixbuf.get_width():
-                        vertical = False
-                    else:
-                        extract = pixbuf
-                    if extract is None:
-                        extract = GdkPixbuf.Pixbuf.new(
-                                                    GdkPixbuf.Colorspace.RGB,
-                                                    True, 8,
-                                                    size, size)
-                        if vertical:
-                            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                                                                      filepath,
-                                                                      size,
-                                                                      -1,
-                                                                      True)
-                            diff = pixbuf.get_height() - size
-                            pixbuf.copy_area(0, diff/2,
-                                             pixbuf.get_width(),
-                                             size,
-                                             extract,
-                                             0, 0)
-                        else:
-                            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                                                                      filepath,
-                                                                      -1,
-                                                                      size,
-                                                                      True)
-                            diff = pixbuf.get_width() - size
-                            pixbuf.copy_area(diff/2, 0,
-                                             size,
-                                             pixbuf.get_height(),
-                                             extract,
-                                             0, 0)
-                    extract.savev(filepath_at_size, "jpeg",
-                                  ["quality"], [str(Lp().settings.get_value(
-                                                "cover-quality").get_int32())])
+                data = Lp().art.art_db.get_data(
+                              InfoCache.__get_name(prefix, suffix), size)
+                f = Gio.File.new_for_path(filepath_at_size)
+                f.replace_contents(data, None, False,
+                                   Gio.FileCreateFlags.REPLACE_DESTINATION,
+                                   None)
                 return filepath_at_size
         except Exception as e:
             print("InfoCache::get_artwork():", e)
+        return None
+
+    def get_artwork_pixbuf(prefix, suffix, size):
+        """
+            Return artwork at size
+            @param prefix as string
+            @param suffix as string
+            @param size as int
+            @return GdkPixbuf.Pixbuf/None
+        """
+        try:
+            name = InfoCache.__get_name(prefix, suffix)
+            extract = Lp().art.art_db.get_pixbuf(name, size)
+            if extract is not None:
+                return extract
+            filepath = "%s/%s_%s.jpg" % (InfoCache._INFO_PATH,
+                                         escape(prefix),
+                                         suffix)
+            if not path.exists(filepath) or path.getsize(filepath) == 0:
+                return None
+            # Make cache for this size
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(filepath,
+                                                            size,
+                                                            size)
+            if pixbuf.get_height() > pixbuf.get_width():
+                vertical = True
+            elif pixbuf.get_height() < pixbuf.get_width():
+                vertical = False
+            else:
+                extract = pixbuf
+            if extract is None:
+                extract = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB,
+                                               True, 8,
+                                               size, size)
+                if vertical:
+                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(filepath,
+                                                                     size,
+                                                                     -1,
+                                                                     True)
+                    diff = pixbuf.get_height() - size
+                    pixbuf.copy_area(0, diff/2,
+                                     pixbuf.get_width(),
+                                     size,
+                                     extract,
+                                     0, 0)
+                else:
+                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(filepath,
+                                                                     -1,
+                                                                     size,
+                                                                     True)
+                    diff = pixbuf.get_width() - size
+                    pixbuf.copy_area(diff/2, 0,
+                                     size,
+                                     pixbuf.get_height(),
+                                     extract,
+                                     0, 0)
+            Lp().art.art_db.set_pixbuf(name, size, extract)
+            return extract
+        except Exception as e:
+            print("InfoCache::get_artwork_pixbuf():", e)
             return None
 
     def get(prefix, suffix):
@@ -223,6 +245,34 @@ class InfoCache:
         except:
             pass
 
+    def remove_orphans(prefixes):
+        """
+            Remove infos not matching a prefix
+            @param prefixes as set(str), escaped prefixes
+            @return removed files as int
+        """
+        suffixes = [suffix for (suffix, helper1, helper2)
+                    in InfoCache.WEBSERVICES]
+        removed = 0
+        try:
+            d = Gio.File.new_for_path(InfoCache._INFO_PATH)
+            infos = d.enumerate_children(
+                "standard::name",
+                Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+                None)
+            for info in infos:
+                basename = info.get_name()
+                split = path.splitext(basename)[0].rsplit("_", 1)
+                if len(split) != 2 or split[1] not in suffixes or\
+                        split[0] in prefixes:
+                    continue
+                f = infos.get_child(info)
+                f.delete(None)
+                removed += 1
+        except Exception as e:
+            print("InfoCache::remove_orphans():", e)
+        return removed
+
     def uncache_artwork(prefix, suffix, scale):
         """
             Remove artwork from cache
@@ -230,13 +280,26 @@ class InfoCache:
             @param suffix as str
             @param scale factor as int
         """
-        for i in [1, 2]:
+        sizes = [ArtSize.ARTIST_SMALL*scale*i for i in [1, 2]]
+        Lp().art.art_db.remove_pixbufs(InfoCache.__get_name(prefix, suffix),
+                                       sizes)
+        # Exported by get_artwork()
+        for size in sizes:
             filepath = "%s/%s_%s_%s.jpg" % (InfoCache._CACHE_PATH,
                                             escape(prefix),
                                             suffix,
-                                            ArtSize.ARTIST_SMALL*scale*i)
+                                            size)
             f = Gio.File.new_for_path(filepath)
             try:
                 f.delete(None)
             except:
                 pass
+
+    def __get_name(prefix, suffix):
+        """
+            Get name in artwork cache
+            @param prefix as str
+            @param suffix as str
+            @return str
+        """
+        return "info/%s_%s" % (escape(prefix), suffix)
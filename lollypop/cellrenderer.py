@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk, Gdk, GObject, GdkPixbuf
+from gi.repository import Gtk, Gdk, GObject
 
 from math import pi
 
@@ -115,11 +115,9 @@ class CellRendererArtist(Gtk.CellRendererText):
             surface = self.__surfaces[self.rowid]
         if surface is None:
             for suffix in ["lastfm", "deezer", "spotify", "wikipedia"]:
-                uri = InfoCache.get_artwork(self.artist, suffix, size)
-                if uri is not None:
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(uri,
-                                                                    size,
-                                                                    size)
+                pixbuf = InfoCache.get_artwork_pixbuf(self.artist,
+                                                      suffix, size)
+                if pixbuf is not None:
                     surface = Gdk.cairo_surface_create_from_pixbuf(
                                                      pixbuf,
                                                      self.__scale_factor,
@@ -13,14 +13,18 @@
 from gi.repository import GLib, GObject, Gio
 
 from gettext import gettext as _
-from threading import Thread
+from threading import Thread, Event
+from queue import Queue, Empty, Full
+from collections import deque
+from os import cpu_count
 from time import time
 
 from lollypop.inotify import Inotify
 from lollypop.define import Lp
 from lollypop.sqlcursor import SqlCursor
-from lollypop.tagreader import TagReader
+from lollypop.tagreader import TagReader, Discoverer, HeaderDiscoverer
 from lollypop.database_history import History
+from lollypop.database_dirs import DirsDatabase
 from lollypop.utils import is_audio, is_pls, debug
 
 
@@ -32,8 +36,21 @@ class CollectionScanner(GObject.GObject, TagReader):
         "scan-finished": (GObject.SignalFlags.RUN_FIRST, None, ()),
         "artist-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool)),
         "genre-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool)),
-        "album-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool))
+        "album-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool)),
+        # Changes since last emission as {id as int: bool} for albums,
+        # artists and genres, bool as in album/artist/genre-updated
+        "collection-updated": (GObject.SignalFlags.RUN_FIRST, None,
+                               (GObject.TYPE_PYOBJECT, GObject.TYPE_PYOBJECT,
+                                GObject.TYPE_PYOBJECT))
     }
+    # Commit and checkpoint WAL every 5 seconds while scanning
+    __CHECKPOINT_INTERVAL = 5
+    # Notify collection changes at most every 2 seconds
+    __NOTIFY_INTERVAL = 2
+    # Update progress bar at most every 0.2 seconds
+    __PROGRESS_INTERVAL = 0.2
+    # Tag infos waiting for db writer, per tag reader thread
+    __QUEUE_SIZE = 8
 
     def __init__(self):
         """
@@ -44,6 +61,22 @@ class CollectionScanner(GObject.GObject, TagReader):
 
         self.__thread = None
         self.__history = None
+        self.__dirs = DirsDatabase()
+        self.__last_checkpoint = 0
+        # Tracks added since last checkpoint
+        self.__pending = 0
+        self.__batch_size = 0
+        self.__batching = False
+        # Changes committed or to be committed at next checkpoint
+        self.__albums = {}
+        self.__artists = {}
+        self.__genres = {}
+        self.__last_notify = 0
+        self.__last_progress = 0
+        # Uris handled since last checkpoint
+        self.__handled = []
+        # Uris that failed since last checkpoint
+        self.__failed = []
         if Lp().settings.get_value("auto-update"):
             self.__inotify = Inotify()
         else:
@@ -66,6 +99,21 @@ class CollectionScanner(GObject.GObject, TagReader):
             self.__thread.daemon = True
             self.__thread.start()
 
+    def update_uris(self, uris):
+        """
+            Update database for changed uris only
+            @param uris as [str], files or directories
+            @return False if scanner is busy
+        """
+        if self.is_locked():
+            return False
+        Lp().window.progress.add(self)
+        Lp().window.progress.set_fraction(0.0, self)
+        self.__thread = Thread(target=self.__scan_uris, args=(uris,))
+        self.__thread.daemon = True
+        self.__thread.start()
+        return True
+
     def is_locked(self):
         """
             Return True if db locked
@@ -81,28 +129,65 @@ class CollectionScanner(GObject.GObject, TagReader):
 #######################
 # PRIVATE             #
 #######################
-    def __get_objects_for_uris(self, uris):
+    def __get_objects_for_uris(self, uris, mtimes):
         """
             Return all tracks/dirs for uris
+            Only one stat per file: type, content type and mtime
+            are read while enumerating directories
+            Directories unchanged since last scan are not enumerated,
+            their tracks and subdirectories are read from db
             @param uris as string
-            @return (track uri as [str], track dirs as [str],
-                     ignore dirs as [str])
+            @param mtimes as {uri as str: mtime as int}, tracks in db
+            @return (tracks as {uri as str: mtime as int},
+                     track dirs as [str], ignore dirs as [str],
+                     dirs as {uri as str: (parent as str,
+                                           mtime as int, inode as int)})
         """
-        tracks = []
+        tracks = {}
         ignore_dirs = []
         track_dirs = list(uris)
-        walk_uris = list(uris)
+        dirs = {}
+        known_dirs = self.__dirs.get()
+        known_subdirs = {}
+        for (uri, (parent, mtime, inode)) in known_dirs.items():
+            known_subdirs.setdefault(parent, []).append(uri)
+        known_tracks = {}
+        for (uri, mtime) in mtimes.items():
+            parent = uri.rsplit("/", 1)[0].rstrip("/")
+            known_tracks.setdefault(parent, {})[uri] = mtime
+        walk_uris = deque([(uri, None, self.__get_dir_stat(uri))
+                           for uri in uris])
         while walk_uris:
-            uri = walk_uris.pop(0)
+            (uri, parent, stat) = walk_uris.popleft()
+            if stat is not None:
+                dirs[uri] = (parent,) + stat
+            # Nothing added/removed/renamed in directory, reuse db content
+            known = known_dirs.get(uri)
+            if stat is not None and known is not None and\
+                    known[0] == parent and known[1:] == stat:
+                children = known_tracks.get(uri.rstrip("/"), {})
+                subdirs = known_subdirs.get(uri, [])
+                tracks.update(children)
+                for subdir in subdirs:
+                    track_dirs.append(subdir)
+                    walk_uris.append((subdir, uri,
+                                      self.__get_dir_stat(subdir)))
+                if not children and not subdirs and uri in uris:
+                    ignore_dirs.append(uri)
+                continue
             empty = True
             try:
                 d = Gio.File.new_for_uri(uri)
                 infos = d.enumerate_children(
-                    "standard::name,standard::type,standard::is-hidden",
+                    "standard::name,standard::type,standard::is-hidden,"
+                    "standard::content-type,time::modified,"
+                    "time::modified-usec,unix::inode",
                     Gio.FileQueryInfoFlags.NONE,
                     None)
             except Exception as e:
                 print("CollectionScanner::__get_objects_for_uris():", e)
+                # Enumerate it again on next scan
+                dirs.pop(uri, None)
                 continue
             for info in infos:
                 f = infos.get_child(info)
@@ -112,14 +197,15 @@ class CollectionScanner(GObject.GObject, TagReader):
                     continue
                 elif info.get_file_type() == Gio.FileType.DIRECTORY:
                     track_dirs.append(child_uri)
-                    walk_uris.append(child_uri)
+                    walk_uris.append((child_uri, uri,
+                                      self.__get_stat(info)))
                 else:
                     try:
-                        f = Gio.File.new_for_uri(child_uri)
-                        if is_pls(f):
+                        if is_pls(f, info):
                             pass
-                        elif is_audio(f):
-                            tracks.append(child_uri)
+                        elif is_audio(f, info):
+                            tracks[child_uri] = info.get_attribute_uint64(
+                                                             "time::modified")
                         else:
                             debug("%s not detected as a music file" %
                                   child_uri)
@@ -130,7 +216,64 @@ class CollectionScanner(GObject.GObject, TagReader):
             # Ensure user is not doing something bad
             if empty and uri in uris:
                 ignore_dirs.append(uri)
-        return (tracks, track_dirs, ignore_dirs)
+        return (tracks, track_dirs, ignore_dirs, dirs)
+
+    def __get_dir_stat(self, uri):
+        """
+            Get directory stat
+            @param uri as str
+            @return (mtime as int, inode as int) or None
+        """
+        try:
+            d = Gio.File.new_for_uri(uri)
+            info = d.query_info("time::modified,time::modified-usec,"
+                                "unix::inode",
+                                Gio.FileQueryInfoFlags.NONE,
+                                None)
+            return self.__get_stat(info)
+        except Exception as e:
+            print("CollectionScanner::__get_dir_stat():", e)
+            return None
+
+    def __get_stat(self, info):
+        """
+            Get directory stat from info
+            @param info as Gio.FileInfo
+            @return (mtime as int, inode as int)
+        """
+        # Two changes in the same second must not look unchanged
+        mtime = info.get_attribute_uint64("time::modified") * 1000000 +\
+            info.get_attribute_uint32("time::modified-usec")
+        inode = info.get_attribute_uint64("unix::inode")
+        return (mtime, inode)
+
+    def __set_progress(self, current, total):
+        """
+            Update progress bar from scanner thread, rate limited
+            @param scanned items as int, total items as int
+        """
+        if current < total and\
+                time() - self.__last_progress < self.__PROGRESS_INTERVAL:
+            return
+        self.__last_progress = time()
+        GLib.idle_add(self.__update_progress, current, total)
+
+    def __notify(self, force=False):
+        """
+            Emit committed collection changes, rate limited
+            @param force as bool
+        """
+        if not (self.__albums or self.__artists or self.__genres):
+            return
+        if not force and\
+                time() - self.__last_notify < self.__NOTIFY_INTERVAL:
+            return
+        self.__last_notify = time()
+        GLib.idle_add(self.emit, "collection-updated",
+                      self.__albums, self.__artists, self.__genres)
+        self.__albums = {}
+        self.__artists = {}
+        self.__genres = {}
 
     def __update_progress(self, current, total):
         """
@@ -159,10 +302,25 @@ class CollectionScanner(GObject.GObject, TagReader):
         """
         if self.__history is None:
             self.__history = History()
+        # Finish interrupted scan first, walking is then cheap as
+        # its directories are known. Skip files inotify added since
         mtimes = Lp().tracks.get_mtimes()
-        (new_tracks, new_dirs, ignore_dirs) = self.__get_objects_for_uris(
-                                                                         uris)
-        orig_tracks = Lp().tracks.get_uris(ignore_dirs)
+        pending = [(uri, mtime) for (uri, mtime) in self.__dirs.get_pending()
+                   if uri not in mtimes]
+        if pending:
+            debug("CollectionScanner::__scan(): resume %s files" %
+                  len(pending))
+            with SqlCursor(Lp().db) as sql:
+                try:
+                    if not self.__add_files(pending, 0, len(pending)):
+                        return
+                    sql.commit()
+                except Exception as e:
+                    print("CollectionScanner::__scan(resume):", e)
+            mtimes = Lp().tracks.get_mtimes()
+        (new_tracks, new_dirs,
+         ignore_dirs, dirs) = self.__get_objects_for_uris(uris, mtimes)
+        orig_tracks = set(Lp().tracks.get_uris(ignore_dirs))
         was_empty = len(orig_tracks) == 0
 
         if ignore_dirs:
@@ -181,66 +339,301 @@ class CollectionScanner(GObject.GObject, TagReader):
             # Look for new files/modified files
             try:
                 to_add = []
-                for uri in new_tracks:
+                to_del = []
+                for (uri, mtime) in new_tracks.items():
                     if self.__thread is None:
                         return
-                    try:
-                        GLib.idle_add(self.__update_progress, i, count)
-                        f = Gio.File.new_for_uri(uri)
-                        info = f.query_info("time::modified",
-                                            Gio.FileQueryInfoFlags.NONE,
-                                            None)
-                        mtime = int(info.get_attribute_as_string(
-                                                             "time::modified"))
-                        # If songs exists and mtime unchanged, continue,
-                        # else rescan
-                        if uri in orig_tracks:
-                            orig_tracks.remove(uri)
+                    self.__set_progress(i, count)
+                    # If songs exists and mtime unchanged, continue,
+                    # else rescan
+                    if uri in orig_tracks:
+                        orig_tracks.discard(uri)
+                        i += 1
+                        if mtime <= mtimes.get(uri, mtime + 1):
                             i += 1
-                            if mtime <= mtimes.get(uri, mtime + 1):
-                                i += 1
-                                continue
-                            else:
-                                self.__del_from_db(uri)
-                        # On first scan, use modification time
-                        # Else, use current time
-                        if not was_empty:
-                            mtime = int(time())
-                        to_add.append((uri, mtime))
-                    except Exception as e:
-                        print("CollectionScanner::__scan(mtime):", e)
-                # Clean deleted files
+                            continue
+                        else:
+                            to_del.append(uri)
+                    # On first scan, use modification time
+                    # Else, use current time
+                    if not was_empty:
+                        mtime = int(time())
+                    to_add.append((uri, mtime))
+                # Clean deleted and modified files
                 # Now because we need to populate history
-                for uri in orig_tracks:
-                    i += 1
-                    GLib.idle_add(self.__update_progress, i, count)
-                    self.__del_from_db(uri)
+                i += len(orig_tracks)
+                self.__set_progress(i, count)
+                self.__del_from_db(to_del + list(orig_tracks))
+                # Remember what is left, a stopped scan will resume here
+                self.__dirs.set(dirs)
+                self.__dirs.set_pending(to_add)
+                sql.commit()
                 # Add files to db
-                for (uri, mtime) in to_add:
-                    try:
-                        debug("Adding file: %s" % uri)
-                        i += 1
-                        GLib.idle_add(self.__update_progress, i, count)
-                        self.__add2db(uri, mtime)
-                    except Exception as e:
-                        print("CollectionScanner::__scan(add):", e, uri)
+                if not self.__add_files(to_add, i, count):
+                    return
                 sql.commit()
+                Lp().db.checkpoint()
             except Exception as e:
                 print("CollectionScanner::__scan():", e)
         GLib.idle_add(self.__finish)
         del self.__history
         self.__history = None
 
-    def __add2db(self, uri, mtime):
+    def __scan_uris(self, uris):
+        """
+            Add, update or remove tracks for uris
+            Directories are walked, as they are new to the scanner
+            @param uris as [str], files or directories
+            @thread safe
+        """
+        if self.__history is None:
+            self.__history = History()
+        # Uris may overlap: a file and its new parent directory
+        to_del = set()
+        to_add = {}
+        for uri in uris:
+            if self.__thread is None:
+                return
+            mtimes = Lp().tracks.get_mtimes_for_uri(uri)
+            f = Gio.File.new_for_uri(uri)
+            try:
+                info = f.query_info("standard::type,standard::is-hidden,"
+                                    "standard::content-type,time::modified",
+                                    Gio.FileQueryInfoFlags.NONE,
+                                    None)
+            except:
+                # Deleted, remove track or all tracks under directory
+                to_del |= set(mtimes.keys())
+                continue
+            if info.get_is_hidden():
+                continue
+            elif info.get_file_type() == Gio.FileType.DIRECTORY:
+                (tracks, track_dirs,
+                 ignore_dirs, dirs) = self.__get_objects_for_uris([uri],
+                                                                  mtimes)
+                if self.__inotify is not None:
+                    for d in track_dirs:
+                        if d.startswith("file://"):
+                            self.__inotify.add_monitor(d)
+            elif is_audio(f, info):
+                tracks = {uri: info.get_attribute_uint64("time::modified")}
+            else:
+                continue
+            for (track_uri, mtime) in tracks.items():
+                if track_uri in mtimes:
+                    if mtime <= mtimes.pop(track_uri):
+                        continue
+                    to_del.add(track_uri)
+                to_add[track_uri] = int(time())
+            # Tracks not found anymore under directory
+            to_del |= set(mtimes.keys())
+        count = len(to_del) + len(to_add)
+        with SqlCursor(Lp().db) as sql:
+            i = 0
+            try:
+                i += len(to_del)
+                self.__set_progress(i, count)
+                self.__del_from_db(list(to_del))
+                if not self.__add_files(list(to_add.items()), i, count):
+                    return
+                sql.commit()
+                Lp().db.checkpoint()
+            except Exception as e:
+                print("CollectionScanner::__scan_uris():", e)
+        GLib.idle_add(self.__finish)
+        del self.__history
+        self.__history = None
+
+    def __checkpoint(self, force=False):
+        """
+            Commit scanner transaction and checkpoint WAL periodically,
+            so other threads can write and readers see a small WAL
+            When batching, delayed rows are inserted before and changes
+            notified after
+            @param force as bool
+        """
+        if force or\
+                (self.__batching and
+                 self.__pending >= self.__batch_size) or\
+                time() - self.__last_checkpoint > self.__CHECKPOINT_INTERVAL:
+            self.flush_batch()
+            # Same transaction as added files
+            if self.__handled:
+                self.__dirs.remove_pending(self.__handled)
+                self.__handled = []
+            # Not known as scanned, so failed files are read again
+            if self.__failed:
+                parents = set()
+                for uri in self.__failed:
+                    parent = uri.rsplit("/", 1)[0]
+                    parents.update([parent, parent + "/"])
+                self.__dirs.remove(list(parents))
+                self.__failed = []
+            Lp().db.checkpoint()
+            self.__last_checkpoint = time()
+            self.__pending = 0
+            self.__notify(force)
+
+    def __add_files(self, to_add, i, count):
+        """
+            Read tags in a pool of threads and add files to db
+            Current thread is the only one writing to db
+            @param to_add as [(uri as str, mtime as int)]
+            @param i as int, scanned items
+            @param count as int, total items
+            @return False if scan has been stopped
+        """
+        if not to_add:
+            return True
+        self.start_batch()
+        self.__batching = True
+        self.__pending = 0
+        self.__handled = []
+        self.__failed = []
+        self.__batch_size = Lp().settings.get_value(
+                                             "scan-batch-size").get_int32()
+        # Stats of removed files are already in history
+        self.__history.preload([Gio.File.new_for_uri(uri).get_basename()
+                                for (uri, mtime) in to_add])
+        workers = self.__get_worker_count(len(to_add))
+        uris = Queue()
+        for item in to_add:
+            uris.put(item)
+        infos = Queue(maxsize=workers * self.__QUEUE_SIZE)
+        cancel = Event()
+        threads = []
+        for n in range(workers):
+            thread = Thread(target=self.__read_tags,
+                            args=(uris, infos, cancel),
+                            name="TagReader-%s" % n)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        start = time()
+        write_time = 0
+        added = 0
+        running = workers
+        try:
+            while running:
+                # Checked before waiting, so dead workers' items are read
+                alive = [thread for thread in threads if thread.is_alive()]
+                try:
+                    item = infos.get(timeout=0.5)
+                except Empty:
+                    # Do not wait for workers that died without notifying
+                    if not alive:
+                        break
+                    continue
+                if item is None:
+                    running -= 1
+                    continue
+                if self.__thread is None:
+                    return False
+                (uri, mtime, info) = item
+                i += 1
+                self.__set_progress(i, count)
+                # Failed files stay pending
+                if info is None:
+                    self.__failed.append(uri)
+                    continue
+                write_start = time()
+                try:
+                    debug("Adding file: %s" % uri)
+                    self.__add2db(uri, mtime, info)
+                    self.__handled.append(uri)
+                    added += 1
+                except Exception as e:
+                    print("CollectionScanner::__add_files():", e, uri)
+                    self.__failed.append(uri)
+                self.__checkpoint()
+                write_time += time() - write_start
+            self.__checkpoint(True)
+        finally:
+            cancel.set()
+            self.stop_batch()
+            self.__history.unload()
+            self.__batching = False
+            self.__handled = []
+            self.__failed = []
+        duration = max(time() - start, 0.001)
+        debug("CollectionScanner::__add_files(): %s/%s files in %.1fs, "
+              "%.1f files/s, %s tag readers, db writer busy %d%%" % (
+                  added, len(to_add), duration, added / duration,
+                  workers, 100 * write_time / duration))
+        return True
+
+    def __read_tags(self, uris, infos, cancel):
+        """
+            Read tags for uris and pass them to db writer
+            @param uris as Queue of (uri as str, mtime as int)
+            @param infos as Queue of (uri as str, mtime as int,
+                                      info as GstPbutils.DiscovererInfo)
+            @param cancel as threading.Event
+            @thread safe
+        """
+        try:
+            # Discoverers can't be shared between threads
+            if Lp().settings.get_value("header-tag-reader"):
+                discoverer = HeaderDiscoverer()
+            else:
+                discoverer = Discoverer()
+            while not cancel.is_set():
+                try:
+                    (uri, mtime) = uris.get_nowait()
+                except Empty:
+                    break
+                try:
+                    info = discoverer.get_info(uri)
+                except Exception as e:
+                    print("CollectionScanner::__read_tags():", e, uri)
+                    info = None
+                if not self.__put(infos, (uri, mtime, info), cancel):
+                    return
+        except Exception as e:
+            print("CollectionScanner::__read_tags():", e)
+        finally:
+            # Tell db writer we are done
+            self.__put(infos, None, cancel)
+
+    def __put(self, queue, item, cancel):
+        """
+            Put item in bounded queue, give up if cancelled
+            @param queue as Queue
+            @param item as object
+            @param cancel as threading.Event
+            @return True if item has been queued
+        """
+        while not cancel.is_set():
+            try:
+                queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def __get_worker_count(self, count):
+        """
+            Get tag reader thread count for files
+            @param count as int
+            @return int
+        """
+        workers = Lp().settings.get_value("scan-workers").get_int32()
+        if workers <= 0:
+            workers = cpu_count() or 1
+        return max(1, min(workers, count))
+
+    def __add2db(self, uri, mtime, info=None):
         """
             Add new file to db with information
             @param uri as string
             @param mtime as int
+            @param info as GstPbutils.DiscovererInfo, read if None
             @return track id as int
         """
         f = Gio.File.new_for_uri(uri)
-        debug("CollectionScanner::add2db(): Read tags")
-        info = self.get_info(uri)
+        if info is None:
+            debug("CollectionScanner::add2db(): Read tags")
+            info = self.get_info(uri)
         tags = info.get_tags()
         name = f.get_basename()
         title = self.get_title(tags, name)
@@ -309,52 +702,34 @@ class CollectionScanner(GObject.GObject, TagReader):
         self.update_track(track_id, artist_ids, genre_ids)
         debug("CollectionScanner::add2db(): Update album")
         self.update_album(album_id, album_artist_ids, genre_ids, year)
-        if new_album:
-            with SqlCursor(Lp().db) as sql:
-                sql.commit()
+        # Notified once committed
+        # Cached album values are removed again then, see DatabaseCache
+        self.__albums.setdefault(album_id, False)
         for genre_id in genre_ids:
-            GLib.idle_add(self.emit, "genre-updated", genre_id, True)
+            self.__genres[genre_id] = True
         for artist_id in new_artist_ids:
-            GLib.idle_add(self.emit, "artist-updated", artist_id, True)
+            self.__artists[artist_id] = True
+        self.__pending += 1
         return track_id
 
-    def __del_from_db(self, uri):
+    def __del_from_db(self, uris):
         """
-            Delete track from db
-            @param uri as str
+            Delete tracks from db
+            @param uris as [str]
         """
+        if not uris:
+            return
         try:
-            f = Gio.File.new_for_uri(uri)
-            name = f.get_basename()
-            track_id = Lp().tracks.get_id_by_uri(uri)
-            album_id = Lp().tracks.get_album_id(track_id)
-            genre_ids = Lp().tracks.get_genre_ids(track_id)
-            album_artist_ids = Lp().albums.get_artist_ids(album_id)
-            artist_ids = Lp().tracks.get_artist_ids(track_id)
-            popularity = Lp().tracks.get_popularity(track_id)
-            rate = Lp().tracks.get_rate(track_id)
-            ltime = Lp().tracks.get_ltime(track_id)
-            mtime = Lp().tracks.get_mtime(track_id)
-            duration = Lp().tracks.get_duration(track_id)
-            album_popularity = Lp().albums.get_popularity(album_id)
-            album_rate = Lp().albums.get_rate(album_id)
-            loved = Lp().albums.get_loved(album_id)
-            uri = Lp().tracks.get_uri(track_id)
-            self.__history.add(name, duration, popularity, rate,
-                               ltime, mtime, loved, album_popularity,
-                               album_rate)
-            Lp().tracks.remove(track_id)
-            Lp().tracks.clean(track_id)
-            deleted = Lp().albums.clean(album_id)
-            if deleted:
-                with SqlCursor(Lp().db) as sql:
-                    sql.commit()
-                GLib.idle_add(self.emit, "album-updated", album_id, True)
-            for artist_id in album_artist_ids + artist_ids:
-                Lp().artists.clean(artist_id)
-                GLib.idle_add(self.emit, "artist-updated", artist_id, False)
+            (album_ids, artist_ids, genre_ids) = Lp().db.del_uris(
+                                                        uris, self.__history)
+            # Removed ids must not be seen by readers before notification
+            Lp().db.checkpoint()
+            for album_id in album_ids:
+                self.__albums[album_id] = True
+            for artist_id in artist_ids:
+                self.__artists[artist_id] = False
             for genre_id in genre_ids:
-                Lp().genres.clean(genre_id)
-                GLib.idle_add(self.emit, "genre-updated", genre_id, False)
+                self.__genres[genre_id] = False
+            self.__notify(True)
         except Exception as e:
             print("CollectionScanner::__del_from_db:", e)
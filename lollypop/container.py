@@ -405,6 +405,8 @@ class Container:
         Lp().scanner.connect("scan-finished", self.on_scan_finished)
         Lp().scanner.connect("genre-updated", self.__on_genre_updated)
         Lp().scanner.connect("artist-updated", self.__on_artist_updated)
+        Lp().scanner.connect("collection-updated",
+                             self.__on_collection_updated)
 
     def __update_playlists(self, playlists, playlist_id):
         """
@@ -806,43 +808,76 @@ class Container:
         else:
             self.__list_one.grab_focus()
 
-    def __on_genre_updated(self, scanner, genre_id, add):
+    def __update_genres(self, genres):
         """
-            Add genre to genre list
-            @param scanner as CollectionScanner
-            @param genre id as int
-            @param add as bool
+            Add/remove genres in genre list
+            @param genres as {genre id as int: add as bool}
         """
-        if self.__show_genres:
+        if not self.__show_genres:
+            return
+        genre_ids = None
+        for (genre_id, add) in genres.items():
             if add:
                 genre_name = Lp().genres.get_name(genre_id)
                 self.__list_one.add_value((genre_id, genre_name))
             else:
-                genre_ids = Lp().genres.get_ids()
+                if genre_ids is None:
+                    genre_ids = set(Lp().genres.get_ids())
                 if genre_id not in genre_ids:
                     self.__list_one.remove_value(genre_id)
 
-    def __on_artist_updated(self, scanner, artist_id, add):
+    def __update_artists(self, artists):
         """
-            Add artist to artist list
-            @param scanner as CollectionScanner
-            @param artist id as int
-            @param add as bool
+            Add/remove artists in artist list
+            @param artists as {artist id as int: add as bool}
         """
-        artist_name = Lp().artists.get_name(artist_id)
-        sortname = Lp().artists.get_sortname(artist_id)
         if self.__show_genres:
             l = self.__list_two
             artist_ids = Lp().artists.get_ids(self.__list_one.selected_ids)
         else:
             l = self.__list_one
             artist_ids = Lp().artists.get_ids()
-        if add:
-            if artist_id in artist_ids:
-                l.add_value((artist_id, artist_name, sortname))
-        else:
-            if artist_id not in artist_ids:
-                l.remove_value(artist_id)
+        artist_ids = set(artist_ids)
+        for (artist_id, add) in artists.items():
+            if add:
+                if artist_id in artist_ids:
+                    artist_name = Lp().artists.get_name(artist_id)
+                    sortname = Lp().artists.get_sortname(artist_id)
+                    l.add_value((artist_id, artist_name, sortname))
+            else:
+                if artist_id not in artist_ids:
+                    l.remove_value(artist_id)
+
+    def __on_genre_updated(self, scanner, genre_id, add):
+        """
+            Add genre to genre list
+            @param scanner as CollectionScanner
+            @param genre id as int
+            @param add as bool
+        """
+        self.__update_genres({genre_id: add})
+
+    def __on_artist_updated(self, scanner, artist_id, add):
+        """
+            Add artist to artist list
+            @param scanner as CollectionScanner
+            @param artist id as int
+            @param add as bool
+        """
+        self.__update_artists({artist_id: add})
+
+    def __on_collection_updated(self, scanner, albums, artists, genres):
+        """
+            Update lists once for many changes
+            @param scanner as CollectionScanner
+            @param albums as {album id as int: destroy as bool}
+            @param artists as {artist id as int: add as bool}
+            @param genres as {genre id as int: add as bool}
+        """
+        if genres:
+            self.__update_genres(genres)
+        if artists:
+            self.__update_artists(artists)
 
     def __on_mount_added(self, vm, mount):
         """
@@ -17,8 +17,11 @@ import sqlite3
 from lollypop.define import Lp
 from lollypop.objects import Album
 from lollypop.database_upgrade import DatabaseUpgrade
+from lollypop.database_stats import PopularityStats
+from lollypop.database_dirs import DirsDatabase
 from lollypop.sqlcursor import SqlCursor
-from lollypop.localized import LocalizedCollation
+from lollypop.localized import LocalizedCollation, get_sort_key
+from lollypop.localized import get_collation_locale
 from lollypop.utils import noaccents
 
 
@@ -46,10 +49,12 @@ class Database:
                                               rate INT NOT NULL,
                                               loved INT NOT NULL,
                                               mtime INT NOT NULL,
-                                              synced INT NOT NULL)"""
+                                              synced INT NOT NULL,
+                                              sortkey BLOB)"""
     __create_artists = """CREATE TABLE artists (id INTEGER PRIMARY KEY,
                                                name TEXT NOT NULL,
-                                               sortname TEXT NOT NULL)"""
+                                               sortname TEXT NOT NULL,
+                                               sortkey BLOB)"""
     __create_genres = """CREATE TABLE genres (id INTEGER PRIMARY KEY,
                                             name TEXT NOT NULL)"""
     __create_album_artists = """CREATE TABLE album_artists (
@@ -78,6 +83,13 @@ class Database:
     __create_track_genres = """CREATE TABLE track_genres (
                                                 track_id INT NOT NULL,
                                                 genre_id INT NOT NULL)"""
+    # Full text search, content is accent folded name, rowid is item id
+    __create_albums_fts = """CREATE VIRTUAL TABLE albums_fts
+                             USING fts5(name, tokenize=unicode61)"""
+    __create_artists_fts = """CREATE VIRTUAL TABLE artists_fts
+                              USING fts5(name, tokenize=unicode61)"""
+    __create_tracks_fts = """CREATE VIRTUAL TABLE tracks_fts
+                             USING fts5(name, tokenize=unicode61)"""
     __create_album_artists_idx = """CREATE index idx_aa ON album_artists(
                                                 album_id)"""
     __create_track_artists_idx = """CREATE index idx_ta ON track_artists(
@@ -86,6 +98,36 @@ class Database:
                                                 album_id)"""
     __create_track_genres_idx = """CREATE index idx_tg ON track_genres(
                                                 track_id)"""
+    __create_tracks_uri_idx = """CREATE index idx_tracks_uri ON tracks(
+                                                uri)"""
+    __create_tracks_album_idx = """CREATE index idx_tracks_album ON tracks(
+                                                album_id)"""
+    __create_albums_uri_idx = """CREATE index idx_albums_uri ON albums(
+                                                uri)"""
+    __create_albums_name_idx = """CREATE index idx_albums_name ON albums(
+                                                name COLLATE NOCASE)"""
+    __create_tracks_name_idx = """CREATE index idx_tracks_name ON tracks(
+                                                name COLLATE NOCASE)"""
+    __create_artists_name_idx = """CREATE index idx_artists_name ON artists(
+                                                name COLLATE NOCASE)"""
+    __create_albums_sortkey_idx = """CREATE index idx_albums_sortkey ON
+                                                albums(sortkey)"""
+    __create_artists_sortkey_idx = """CREATE index idx_artists_sortkey ON
+                                                artists(sortkey)"""
+    __create_genres_name_idx = """CREATE index idx_genres_name ON genres(
+                                                name)"""
+    __create_album_artists_artist_idx = """CREATE index idx_aa_artist ON
+                                                album_artists(artist_id)"""
+    __create_track_artists_artist_idx = """CREATE index idx_ta_artist ON
+                                                track_artists(artist_id)"""
+    __create_album_genres_genre_idx = """CREATE index idx_ag_genre ON
+                                                album_genres(genre_id)"""
+    __create_track_genres_genre_idx = """CREATE index idx_tg_genre ON
+                                                track_genres(genre_id)"""
+    __create_tracks_popularity_idx = """CREATE index idx_tracks_popularity ON
+                                                tracks(popularity)"""
+    __create_albums_popularity_idx = """CREATE index idx_albums_popularity ON
+                                                albums(popularity)"""
 
     def __init__(self):
         """
@@ -113,9 +155,35 @@ class Database:
                     sql.execute(self.__create_track_artists_idx)
                     sql.execute(self.__create_album_genres_idx)
                     sql.execute(self.__create_track_genres_idx)
+                    sql.execute(self.__create_tracks_uri_idx)
+                    sql.execute(self.__create_tracks_album_idx)
+                    sql.execute(self.__create_albums_uri_idx)
+                    sql.execute(self.__create_albums_name_idx)
+                    sql.execute(self.__create_tracks_name_idx)
+                    sql.execute(self.__create_artists_name_idx)
+                    sql.execute(self.__create_genres_name_idx)
+                    sql.execute(self.__create_albums_sortkey_idx)
+                    sql.execute(self.__create_artists_sortkey_idx)
+                    sql.execute(self.__create_album_artists_artist_idx)
+                    sql.execute(self.__create_track_artists_artist_idx)
+                    sql.execute(self.__create_album_genres_genre_idx)
+                    sql.execute(self.__create_track_genres_genre_idx)
+                    sql.execute(self.__create_albums_fts)
+                    sql.execute(self.__create_artists_fts)
+                    sql.execute(self.__create_tracks_fts)
+                    sql.execute(self.__create_tracks_popularity_idx)
+                    sql.execute(self.__create_albums_popularity_idx)
+                    sql.execute(PopularityStats.create_stats)
+                    sql.execute(DirsDatabase.create_dirs)
+                    sql.execute(DirsDatabase.create_pending)
+                    PopularityStats("tracks").reset(sql)
+                    PopularityStats("albums").reset(sql)
                     sql.commit()
                     Lp().settings.set_value("db-version",
                                             GLib.Variant("i", upgrade.count()))
+                    Lp().settings.set_value("db-collation",
+                                            GLib.Variant(
+                                                "s", get_collation_locale()))
             except Exception as e:
                 print("Database::__init__(): %s" % e)
 
@@ -131,18 +199,70 @@ class Database:
             Lp().settings.set_value("db-version",
                                     GLib.Variant("i", upgrade.count()))
 
+    def update_sort_keys(self):
+        """
+            Rebuild artists/albums sort keys if locale changed
+        """
+        current = get_collation_locale()
+        if Lp().settings.get_value("db-collation").get_string() == current:
+            return
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT rowid, sortname FROM artists")
+            sql.executemany("UPDATE artists SET sortkey=? WHERE rowid=?",
+                            [(get_sort_key(sortname), rowid)
+                             for (rowid, sortname) in list(result)])
+            result = sql.execute("SELECT rowid, name FROM albums")
+            sql.executemany("UPDATE albums SET sortkey=? WHERE rowid=?",
+                            [(get_sort_key(name), rowid)
+                             for (rowid, name) in list(result)])
+            sql.commit()
+        Lp().settings.set_value("db-collation", GLib.Variant("s", current))
+
     def get_cursor(self):
         """
             Return a new sqlite cursor
         """
         try:
             c = sqlite3.connect(self.DB_PATH, 600.0)
+            try:
+                if Lp().settings.get_value("db-wal"):
+                    c.execute("PRAGMA journal_mode=WAL")
+                    # Safe with WAL, only last transactions may be lost
+                    c.execute("PRAGMA synchronous=NORMAL")
+                else:
+                    c.execute("PRAGMA journal_mode=DELETE")
+            except Exception as e:  # Database is locked
+                print("Database::get_cursor():", e)
             c.create_collation("LOCALIZED", LocalizedCollation())
             c.create_function("noaccents", 1, noaccents)
             return c
         except:
             exit(-1)
 
+    def get_reader_cursor(self):
+        """
+            Return a new read only sqlite cursor
+            With WAL, readers do not wait for scanner transactions
+        """
+        try:
+            c = sqlite3.connect("file:%s?mode=ro" % self.DB_PATH,
+                                600.0, uri=True)
+            c.create_collation("LOCALIZED", LocalizedCollation())
+            c.create_function("noaccents", 1, noaccents)
+            return c
+        except:
+            exit(-1)
+
+    def checkpoint(self):
+        """
+            Commit pending changes and move WAL content into database
+            Do not wait for readers
+        """
+        with SqlCursor(self) as sql:
+            sql.commit()
+            if Lp().settings.get_value("db-wal"):
+                sql.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
     def drop_db(self):
         """
             Drop database
@@ -150,6 +270,9 @@ class Database:
         try:
             f = Gio.File.new_for_path(self.DB_PATH)
             f.trash()
+            # Pooled connections still point to trashed file
+            Lp().cursors.clear()
+            Lp().cache.clear()
         except Exception as e:
             print("Database::drop_db():", e)
 
@@ -186,6 +309,111 @@ class Database:
             sql.commit()
         SqlCursor.remove(Lp().playlists)
 
+    def del_uris(self, uris, history):
+        """
+            Delete tracks for uris from db, their stats go to history
+            Work is done on the whole set, not track by track
+            @param uris as [str]
+            @param history as History
+            @return (album ids as [int], artist ids as [int],
+                     genre ids as [int]) albums deleted or with genres
+                     changed, artists and genres of deleted tracks
+            @warning commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS del_tracks (\
+                             track_id INTEGER PRIMARY KEY)")
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS del_albums (\
+                             album_id INTEGER PRIMARY KEY)")
+            sql.execute("DELETE FROM del_tracks")
+            sql.execute("DELETE FROM del_albums")
+            sql.executemany("INSERT OR IGNORE INTO del_tracks (track_id)\
+                             SELECT rowid FROM tracks WHERE uri=?",
+                            [(uri,) for uri in uris])
+            sql.execute("INSERT INTO del_albums (album_id)\
+                         SELECT DISTINCT album_id FROM tracks\
+                         WHERE rowid IN (SELECT track_id FROM del_tracks)")
+            result = sql.execute("SELECT tracks.uri, tracks.duration,\
+                                  tracks.popularity, tracks.rate,\
+                                  tracks.ltime, tracks.mtime, albums.loved,\
+                                  albums.popularity, albums.rate\
+                                  FROM del_tracks, tracks, albums\
+                                  WHERE tracks.rowid=del_tracks.track_id\
+                                  AND albums.rowid=tracks.album_id")
+            rows = [(Gio.File.new_for_uri(row[0]).get_basename(),) + row[1:]
+                    for row in result]
+            history.add_rows(rows)
+            result = sql.execute("SELECT artist_id FROM track_artists\
+                                  WHERE track_id IN\
+                                  (SELECT track_id FROM del_tracks)\
+                                  UNION\
+                                  SELECT artist_id FROM album_artists\
+                                  WHERE album_id IN\
+                                  (SELECT album_id FROM del_albums)")
+            artist_ids = [row[0] for row in result]
+            result = sql.execute("SELECT DISTINCT genre_id FROM track_genres\
+                                  WHERE track_id IN\
+                                  (SELECT track_id FROM del_tracks)")
+            genre_ids = [row[0] for row in result]
+            # Tracks
+            for table in ["track_artists", "track_genres"]:
+                sql.execute("DELETE FROM %s WHERE track_id IN\
+                             (SELECT track_id FROM del_tracks)" % table)
+            for table in ["tracks", "tracks_fts"]:
+                sql.execute("DELETE FROM %s WHERE rowid IN\
+                             (SELECT track_id FROM del_tracks)" % table)
+            # Albums, genres without tracks then empty albums
+            result = sql.execute("SELECT DISTINCT album_id FROM album_genres\
+                                  WHERE album_id IN\
+                                  (SELECT album_id FROM del_albums)\
+                                  AND NOT EXISTS (\
+                                    SELECT 1 FROM tracks, track_genres\
+                                    WHERE tracks.album_id=\
+                                    album_genres.album_id\
+                                    AND track_genres.track_id=tracks.rowid\
+                                    AND track_genres.genre_id=\
+                                    album_genres.genre_id)")
+            album_ids = set(row[0] for row in result)
+            sql.execute("DELETE FROM album_genres\
+                         WHERE album_id IN (SELECT album_id FROM del_albums)\
+                         AND NOT EXISTS (\
+                           SELECT 1 FROM tracks, track_genres\
+                           WHERE tracks.album_id=album_genres.album_id\
+                           AND track_genres.track_id=tracks.rowid\
+                           AND track_genres.genre_id=album_genres.genre_id)")
+            sql.execute("DELETE FROM del_albums\
+                         WHERE EXISTS (SELECT 1 FROM tracks\
+                                       WHERE tracks.album_id=\
+                                       del_albums.album_id)")
+            result = sql.execute("SELECT album_id FROM del_albums")
+            album_ids |= set(row[0] for row in result)
+            for table in ["album_artists", "album_genres"]:
+                sql.execute("DELETE FROM %s WHERE album_id IN\
+                             (SELECT album_id FROM del_albums)" % table)
+            for table in ["albums", "albums_fts"]:
+                sql.execute("DELETE FROM %s WHERE rowid IN\
+                             (SELECT album_id FROM del_albums)" % table)
+            # Artists and genres without relations
+            sql.execute("DELETE FROM artists\
+                         WHERE rowid IN (%s)\
+                         AND NOT EXISTS (SELECT 1 FROM album_artists\
+                                         WHERE artist_id=artists.rowid)\
+                         AND NOT EXISTS (SELECT 1 FROM track_artists\
+                                         WHERE artist_id=artists.rowid)" %
+                        ",".join(str(i) for i in artist_ids))
+            sql.execute("DELETE FROM artists_fts\
+                         WHERE rowid IN (%s)\
+                         AND rowid NOT IN (SELECT rowid FROM artists)" %
+                        ",".join(str(i) for i in artist_ids))
+            sql.execute("DELETE FROM genres\
+                         WHERE rowid IN (%s)\
+                         AND NOT EXISTS (SELECT 1 FROM track_genres\
+                                         WHERE genre_id=genres.rowid)" %
+                        ",".join(str(i) for i in genre_ids))
+            PopularityStats("tracks").reset(sql)
+            PopularityStats("albums").reset(sql)
+            return (list(album_ids), artist_ids, genre_ids)
+
 #######################
 # PRIVATE             #
 #######################
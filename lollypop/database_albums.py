@@ -14,8 +14,11 @@ from gettext import gettext as _
 import itertools
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.database_cache import cached
+from lollypop.database_stats import PopularityStats
 from lollypop.define import Lp, Type, OrderBy
-from lollypop.utils import remove_static_genres, noaccents
+from lollypop.utils import remove_static_genres, noaccents, fts_query
+from lollypop.localized import get_sort_key
 
 
 class AlbumsDatabase:
@@ -28,6 +31,7 @@ class AlbumsDatabase:
             Init albums database object
         """
         self.__max_count = 1
+        self.__stats = PopularityStats("albums")
         self._cached_randoms = []
 
     def add(self, name, artist_ids, uri, loved, popularity, rate, mtime):
@@ -44,18 +48,34 @@ class AlbumsDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
+            self.__stats.update(sql, None, popularity)
             result = sql.execute("INSERT INTO albums\
                                   (name, no_album_artist,\
-                                  uri, loved, popularity, rate, mtime, synced)\
-                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                  uri, loved, popularity, rate, mtime, synced,\
+                                  sortkey)\
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
                                  (name, artist_ids == [],
-                                  uri, loved, popularity, rate, mtime, 0))
+                                  uri, loved, popularity, rate, mtime, 0,
+                                  get_sort_key(name)))
             for artist_id in artist_ids:
                 sql.execute("INSERT INTO album_artists\
                              (album_id, artist_id)\
                              VALUES (?, ?)", (result.lastrowid, artist_id))
+            sql.execute("INSERT INTO albums_fts (rowid, name)\
+                         VALUES (?, ?)", (result.lastrowid, noaccents(name)))
             return result.lastrowid
 
+    def add_genre_rows(self, rows):
+        """
+            Add genres to albums
+            @param rows as [(album id as int, genre id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO\
+                             album_genres (album_id, genre_id)\
+                             VALUES (?, ?)", rows)
+
     def add_artist(self, album_id, artist_id):
         """
             Add artist to track
@@ -69,6 +89,7 @@ class AlbumsDatabase:
                 sql.execute("INSERT INTO "
                             "album_artists (album_id, artist_id)"
                             "VALUES (?, ?)", (album_id, artist_id))
+                Lp().cache.remove("albums.artist_ids", album_id)
 
     def add_genre(self, album_id, genre_id):
         """
@@ -120,6 +141,7 @@ class AlbumsDatabase:
             @param loved as int
             @warning: commit needed
         """
+        Lp().cache.remove("albums.loved", album_id)
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE albums SET loved=? WHERE rowid=?",
                         (loved, album_id))
@@ -130,6 +152,7 @@ class AlbumsDatabase:
             Set album rate
             @param rate as int
         """
+        Lp().cache.remove("albums.rate", album_id)
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE albums SET rate=? WHERE rowid=?",
                         (rate, album_id))
@@ -142,6 +165,7 @@ class AlbumsDatabase:
             @param year as int
             @warning: commit needed
         """
+        Lp().cache.remove("albums.year", album_id)
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE albums SET year=? WHERE rowid=?",
                         (year, album_id))
@@ -163,8 +187,14 @@ class AlbumsDatabase:
             @param popularity as int
             @param commit as bool
         """
+        Lp().cache.remove("albums.popularity", album_id)
         with SqlCursor(Lp().db) as sql:
             try:
+                result = sql.execute("SELECT popularity FROM albums\
+                                      WHERE rowid=?", (album_id,))
+                v = result.fetchone()
+                if v is not None:
+                    self.__stats.update(sql, v[0], popularity)
                 sql.execute("UPDATE albums set popularity=? WHERE rowid=?",
                             (popularity, album_id))
                 if commit:
@@ -183,11 +213,9 @@ class AlbumsDatabase:
                        AND (album_artists.artist_id = artists.rowid\
                             OR album_artists.artist_id=?)\
                        AND synced=1"
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
             filters = (Type.COMPILATIONS,)
             result = sql.execute(request + order, filters)
             return list(itertools.chain(*result))
@@ -207,6 +235,7 @@ class AlbumsDatabase:
                 return v[0]
             return 0
 
+    @cached("albums.loved")
     def get_loved(self, album_id):
         """
             Get album loved
@@ -235,6 +264,7 @@ class AlbumsDatabase:
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
+    @cached("albums.rate")
     def get_rate(self, album_id):
         """
             Get album rate
@@ -250,6 +280,7 @@ class AlbumsDatabase:
                 return v[0]
             return 0
 
+    @cached("albums.popularity")
     def get_popularity(self, album_id):
         """
             Get popularity
@@ -272,12 +303,14 @@ class AlbumsDatabase:
             @param pop as int
             @raise sqlite3.OperationalError on db update
         """
+        Lp().cache.remove("albums.popularity", album_id)
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT popularity from albums WHERE rowid=?",
                                  (album_id,))
             pop = result.fetchone()
             if pop:
                 current = pop[0]
+                self.__stats.update(sql, current, current + pop_to_add)
             else:
                 current = 0
             current += pop_to_add
@@ -291,13 +324,9 @@ class AlbumsDatabase:
             @return avarage popularity as int
         """
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT AVG(popularity)\
-                                  FROM (SELECT popularity\
-                                        FROM albums\
-                                        ORDER BY POPULARITY DESC LIMIT 100)")
-            v = result.fetchone()
-            if v and v[0] > 5:
-                return v[0]
+            avg = self.__stats.get_avg(sql)
+            if avg > 5:
+                return avg
             return 5
 
     def get_id(self, album_name, artist_ids):
@@ -314,10 +343,8 @@ class AlbumsDatabase:
                 request = "SELECT albums.rowid FROM albums, album_artists\
                            WHERE name=? COLLATE NOCASE AND\
                            no_album_artist=0 AND\
-                           album_artists.album_id=albums.rowid AND (1=0 "
-                for artist_id in artist_ids:
-                    request += "OR artist_id=? "
-                request += ")"
+                           album_artists.album_id=albums.rowid AND\
+                           artist_id IN (%s)" % ",".join("?" * len(artist_ids))
             else:
                 request = "SELECT rowid FROM albums\
                            WHERE name=?\
@@ -328,6 +355,29 @@ class AlbumsDatabase:
                 return v[0]
             return None
 
+    def get_id_rows(self):
+        """
+            Get what get_id() looks for, for all albums
+            @return [(album id as int, name as str, uri as str,
+                      no album artist as bool, artist id as int/None)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT albums.rowid, name, uri,\
+                                  no_album_artist, artist_id\
+                                  FROM albums LEFT JOIN album_artists\
+                                  ON album_artists.album_id=albums.rowid")
+            return list(result)
+
+    def get_genre_rows(self):
+        """
+            Get genres for all albums
+            @return [(album id as int, genre id as int)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT album_id, genre_id\
+                                  FROM album_genres")
+            return list(result)
+
     def get_year_from_tracks(self, album_id):
         """
             Get album year based on tracks
@@ -386,6 +436,7 @@ class AlbumsDatabase:
                                  (album_id,))
             return list(itertools.chain(*result))
 
+    @cached("albums.artist_ids")
     def get_artist_ids(self, album_id):
         """
             Get album artist id
@@ -399,6 +450,7 @@ class AlbumsDatabase:
                                  (album_id,))
             return list(itertools.chain(*result))
 
+    @cached("albums.year")
     def get_year(self, album_id):
         """
             Get album year
@@ -428,6 +480,41 @@ class AlbumsDatabase:
                 uri = v[0]
             return uri
 
+    def get_rows(self, album_ids):
+        """
+            Get album fields for many albums at once
+            @param album ids as [int]
+            @return {album id as int: {field as str: value}}
+        """
+        rows = {}
+        if not album_ids:
+            return rows
+        with SqlCursor(Lp().db) as sql:
+            filters = tuple(album_ids)
+            ids = ",".join("?" * len(filters))
+            result = sql.execute("SELECT rowid, name, year, uri, synced, loved\
+                                  FROM albums WHERE rowid IN (%s)" % ids,
+                                 filters)
+            for (album_id, name, year, uri, synced, loved) in result:
+                rows[album_id] = {"name": name,
+                                  "year": str(year) if year else "",
+                                  "uri": uri,
+                                  "synced": synced,
+                                  "loved": loved,
+                                  "artists": [],
+                                  "artist_ids": []}
+            result = sql.execute("SELECT album_artists.album_id,\
+                                  artists.rowid, artists.name\
+                                  FROM artists, album_artists\
+                                  WHERE album_artists.album_id IN (%s)\
+                                  AND album_artists.artist_id=artists.rowid"
+                                 % ids, filters)
+            for (album_id, artist_id, artist) in result:
+                if album_id in rows:
+                    rows[album_id]["artist_ids"].append(artist_id)
+                    rows[album_id]["artists"].append(artist)
+            return rows
+
     def get_uri_count(self, uri):
         """
             Count album having uri as album uri
@@ -586,9 +673,8 @@ class AlbumsDatabase:
                        AND track_genres.track_id = tracks.rowid"
             if genre_ids:
                 request += " AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "track_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
             request += " ORDER BY discnumber"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -620,14 +706,12 @@ class AlbumsDatabase:
             request += " WHERE album_id=? "
             if genre_ids:
                 request += "AND track_genres.track_id=tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "track_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
             if artist_ids:
                 request += "AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                request += "track_artists.artist_id IN (%s))" %\
+                    ",".join("?" * len(artist_ids))
             request += " ORDER BY discnumber, tracknumber"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -661,14 +745,12 @@ class AlbumsDatabase:
             request += " WHERE album_id=? "
             if genre_ids:
                 request += "AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "track_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
             if artist_ids:
                 request += "AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                request += "track_artists.artist_id IN (%s))" %\
+                    ",".join("?" * len(artist_ids))
             request += " ORDER BY discnumber, tracknumber, tracks.name"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -703,14 +785,12 @@ class AlbumsDatabase:
                        AND discnumber=?"
             if genre_ids:
                 request += " AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "track_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
             if artist_ids:
                 request += " AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                request += "track_artists.artist_id IN (%s))" %\
+                    ",".join("?" * len(artist_ids))
             request += " ORDER BY discnumber, tracknumber, tracks.name"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -741,22 +821,17 @@ class AlbumsDatabase:
         genre_ids = remove_static_genres(genre_ids)
         orderby = Lp().settings.get_enum("orderby")
         if orderby == OrderBy.ARTIST:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.NAME:
-            order = " ORDER BY albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY albums.sortkey"
         elif orderby == OrderBy.YEAR:
             order = " ORDER BY albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         else:
             order = " ORDER BY albums.popularity DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
 
         with SqlCursor(Lp().db) as sql:
             result = []
@@ -776,9 +851,8 @@ class AlbumsDatabase:
                            WHERE albums.rowid = album_artists.album_id AND\
                            artists.rowid = album_artists.artist_id AND\
                            album_genres.album_id=albums.rowid AND ( "
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "album_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
                 request += order
                 result = sql.execute(request, filters)
             # Get albums for artist
@@ -788,9 +862,8 @@ class AlbumsDatabase:
                            FROM albums, album_artists, artists\
                            WHERE album_artists.album_id=albums.rowid AND\
                            artists.rowid = album_artists.artist_id AND ("
-                for artist_id in artist_ids:
-                    request += "artists.rowid=? OR "
-                request += "1=0)"
+                request += "artists.rowid IN (%s))" %\
+                    ",".join("?" * len(artist_ids))
                 request += order
                 result = sql.execute(request, filters)
             # Get albums for artist id and genre id
@@ -802,12 +875,10 @@ class AlbumsDatabase:
                            WHERE album_genres.album_id=albums.rowid AND\
                            artists.rowid = album_artists.artist_id AND\
                            album_artists.album_id=albums.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "artists.rowid=? OR "
-                request += "1=0) AND ("
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "artists.rowid IN (%s)) AND (" %\
+                    ",".join("?" * len(artist_ids))
+                request += "album_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
                 request += order
                 result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -837,9 +908,9 @@ class AlbumsDatabase:
                            WHERE album_genres.album_id=albums.rowid\
                            AND album_artists.album_id=albums.rowid\
                            AND album_artists.artist_id=? AND ( "
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1==0) ORDER BY albums.name,albums.year"
+                request += "album_genres.genre_id IN (%s))\
+                            ORDER BY albums.name, albums.year" %\
+                    ",".join("?" * len(genre_ids))
                 result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
@@ -858,9 +929,8 @@ class AlbumsDatabase:
                            FROM tracks, track_genres\
                            WHERE tracks.album_id=?\
                            AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                request += "track_genres.genre_id IN (%s))" %\
+                    ",".join("?" * len(genre_ids))
                 result = sql.execute(request, filters)
             else:
                 result = sql.execute("SELECT SUM(duration) FROM tracks\
@@ -913,19 +983,23 @@ class AlbumsDatabase:
 
     def search(self, string, limit=25):
         """
-            Search for albums looking like string
+            Search for albums with words starting like string
             @param search as str
             @param limit as int/None
             @return album ids as [int]
         """
+        query = fts_query(string)
+        if not query:
+            return []
         with SqlCursor(Lp().db) as sql:
             if limit is None:
-                filters = ("%" + noaccents(string) + "%")
+                filters = (query,)
             else:
-                filters = ("%" + noaccents(string) + "%", limit)
-            request = ("SELECT albums.rowid\
-                       FROM albums\
-                       WHERE noaccents(name) LIKE ?")
+                filters = (query, limit)
+            request = "SELECT rowid\
+                       FROM albums_fts\
+                       WHERE albums_fts MATCH ?\
+                       ORDER BY rank"
             if limit is not None:
                 request += " LIMIT ?"
             result = sql.execute(request, filters)
@@ -997,10 +1071,17 @@ class AlbumsDatabase:
             # Album empty, remove it
             if not v:
                 ret = True
+                result = sql.execute("SELECT popularity FROM albums\
+                                      WHERE rowid=?", (album_id,))
+                v = result.fetchone()
+                if v is not None:
+                    self.__stats.update(sql, v[0], None)
                 sql.execute("DELETE FROM album_artists\
                             WHERE album_id=?",
                             (album_id,))
                 sql.execute("DELETE FROM albums WHERE rowid=?", (album_id,))
+                sql.execute("DELETE FROM albums_fts WHERE rowid=?",
+                            (album_id,))
             return ret
 
     @property
@@ -0,0 +1,319 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib, Gio, GdkPixbuf
+
+import sqlite3
+from threading import Lock
+from time import time
+
+from lollypop.sqlcursor import SqlCursor
+from lollypop.define import Lp
+
+
+class ArtDatabase:
+    """
+        Artwork cache database, lives in cache dir
+        Not in main database, so artwork threads never wait for scanner
+    """
+    if GLib.getenv("XDG_CACHE_HOME") is None:
+        __CACHE_PATH = GLib.get_home_dir() + "/.cache/lollypop"
+    else:
+        __CACHE_PATH = GLib.getenv("XDG_CACHE_HOME") + "/lollypop"
+    __DB_PATH = "%s/art.db" % __CACHE_PATH
+    # Source that won last artwork lookup for album
+    # Key is album cache name, so it survives a database reset
+    __create_sources = """CREATE TABLE IF NOT EXISTS sources (
+                            name TEXT PRIMARY KEY,
+                            album_uri TEXT NOT NULL,
+                            album_mtime INT NOT NULL,
+                            source INT NOT NULL,
+                            uri TEXT,
+                            mtime INT NOT NULL)"""
+    # Artworks at requested sizes as jpeg, instead of one file per size
+    # atime is last access time, least recently used are evicted first
+    __create_thumbnails = """CREATE TABLE IF NOT EXISTS thumbnails (
+                               name TEXT NOT NULL,
+                               size INT NOT NULL,
+                               data BLOB NOT NULL,
+                               atime INT NOT NULL DEFAULT 0,
+                               PRIMARY KEY (name, size))"""
+    # Cache hits and misses, so lollypop-cli can report them
+    __create_stats = """CREATE TABLE IF NOT EXISTS stats (
+                          name TEXT PRIMARY KEY,
+                          value INT NOT NULL)"""
+    # Evict until cache is below this ratio of budget
+    __LOW_WATERMARK = 0.9
+
+    def __init__(self):
+        """
+            Init artwork database
+        """
+        # Access times are written by save(), not on each read
+        # {(name, size): atime}
+        self.__accesses = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = Lock()
+        self.create()
+
+    def create(self):
+        """
+            Create db schema, cache dir may have been removed
+        """
+        try:
+            with SqlCursor(self) as sql:
+                sql.execute(self.__create_sources)
+                sql.execute(self.__create_thumbnails)
+                sql.execute(self.__create_stats)
+                sql.commit()
+        except Exception as e:
+            print("ArtDatabase::create():", e)
+        # Thumbnails table may predate atime
+        try:
+            with SqlCursor(self) as sql:
+                sql.execute("ALTER TABLE thumbnails\
+                             ADD atime INT NOT NULL DEFAULT 0")
+                sql.commit()
+        except:
+            pass
+
+    def get_source(self, name):
+        """
+            Get artwork source for album
+            @param name as str, album cache name
+            @return (album_uri as str, album_mtime as int, source as int,
+                     uri as str, mtime as int)/None
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT album_uri, album_mtime, source,\
+                                  uri, mtime FROM sources\
+                                  WHERE name=?", (name,))
+            return result.fetchone()
+
+    def set_source(self, name, album_uri, album_mtime, source, uri, mtime):
+        """
+            Set artwork source for album
+            @param name as str, album cache name
+            @param album_uri as str
+            @param album_mtime as int, album dir mtime
+            @param source as ArtSource
+            @param uri as str/None, image or track uri
+            @param mtime as int, uri mtime
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("INSERT OR REPLACE INTO sources\
+                         (name, album_uri, album_mtime, source, uri, mtime)\
+                         VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, album_uri, album_mtime, source, uri, mtime))
+            sql.commit()
+
+    def remove_source(self, name):
+        """
+            Forget artwork source for album
+            @param name as str, album cache name
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("DELETE FROM sources WHERE name=?", (name,))
+            sql.commit()
+
+    def get_data(self, name, size):
+        """
+            Get thumbnail content
+            @param name as str
+            @param size as int
+            @return jpeg as bytes/None
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT data FROM thumbnails\
+                                  WHERE name=? AND size=?", (name, size))
+            v = result.fetchone()
+        with self.__lock:
+            if v is not None:
+                self.__accesses[(name, size)] = int(time())
+                self.__hits += 1
+                return v[0]
+            self.__misses += 1
+            return None
+
+    def get_pixbuf(self, name, size):
+        """
+            Get thumbnail
+            @param name as str
+            @param size as int
+            @return GdkPixbuf.Pixbuf/None
+        """
+        data = self.get_data(name, size)
+        if data is None:
+            return None
+        bytes = GLib.Bytes(data)
+        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
+        bytes.unref()
+        pixbuf = GdkPixbuf.Pixbuf.new_from_stream(stream, None)
+        stream.close()
+        return pixbuf
+
+    def set_pixbuf(self, name, size, pixbuf):
+        """
+            Save thumbnail
+            @param name as str
+            @param size as int
+            @param pixbuf as GdkPixbuf.Pixbuf
+            @thread safe
+        """
+        (status, data) = pixbuf.save_to_bufferv(
+                               "jpeg", ["quality"],
+                               [str(Lp().settings.get_value(
+                                               "cover-quality").get_int32())])
+        if not status:
+            return
+        with SqlCursor(self) as sql:
+            sql.execute("INSERT OR REPLACE INTO thumbnails\
+                         (name, size, data, atime) VALUES (?, ?, ?, ?)",
+                        (name, size, data, int(time())))
+            sql.commit()
+
+    def remove_pixbufs(self, name, sizes=[]):
+        """
+            Remove thumbnails
+            @param name as str
+            @param sizes as [int], all sizes if empty
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            if sizes:
+                sql.executemany("DELETE FROM thumbnails\
+                                 WHERE name=? AND size=?",
+                                [(name, size) for size in sizes])
+            else:
+                sql.execute("DELETE FROM thumbnails WHERE name=?", (name,))
+            sql.commit()
+
+    def clear(self):
+        """
+            Remove all thumbnails and sources
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("DELETE FROM thumbnails")
+            sql.execute("DELETE FROM sources")
+            sql.commit()
+
+    def save(self):
+        """
+            Save access times and cache statistics
+            @thread safe
+        """
+        with self.__lock:
+            accesses = self.__accesses
+            hits = self.__hits
+            misses = self.__misses
+            self.__accesses = {}
+            self.__hits = 0
+            self.__misses = 0
+        with SqlCursor(self) as sql:
+            sql.executemany("UPDATE thumbnails SET atime=?\
+                             WHERE name=? AND size=?",
+                            [(atime, name, size)
+                             for ((name, size), atime) in accesses.items()])
+            for (name, value) in [("hits", hits), ("misses", misses)]:
+                sql.execute("INSERT OR IGNORE INTO stats (name, value)\
+                             VALUES (?, 0)", (name,))
+                sql.execute("UPDATE stats SET value=value+?\
+                             WHERE name=?", (value, name))
+            sql.commit()
+
+    def get_stats(self):
+        """
+            Get cache statistics, as saved by save()
+            @return (thumbnails as int, bytes as int,
+                     hits as int, misses as int)
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT COUNT(*), SUM(LENGTH(data))\
+                                  FROM thumbnails")
+            (count, size) = result.fetchone()
+            result = sql.execute("SELECT name, value FROM stats")
+            stats = dict(result)
+            return (count, size or 0,
+                    stats.get("hits", 0), stats.get("misses", 0))
+
+    def evict(self, budget):
+        """
+            Remove least recently used thumbnails if cache is over budget
+            Call save() before, so atimes are up to date
+            @param budget as int, bytes
+            @return removed thumbnails as int
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT SUM(LENGTH(data)) FROM thumbnails")
+            v = result.fetchone()
+            size = v[0] if v is not None and v[0] is not None else 0
+            if size <= budget:
+                return 0
+            removed = []
+            result = sql.execute("SELECT name, size, LENGTH(data)\
+                                  FROM thumbnails ORDER BY atime")
+            for (name, thumbnail_size, length) in result:
+                if size <= budget * self.__LOW_WATERMARK:
+                    break
+                removed.append((name, thumbnail_size))
+                size -= length
+            sql.executemany("DELETE FROM thumbnails\
+                             WHERE name=? AND size=?", removed)
+            sql.commit()
+            return len(removed)
+
+    def remove_orphans(self, album_names, info_prefixes):
+        """
+            Remove thumbnails and sources not matching an album or an artist
+            @param album_names as set(str), album cache names
+            @param info_prefixes as set(str), escaped artist names
+            @return removed names as int
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT name FROM thumbnails\
+                                  UNION SELECT name FROM sources")
+            orphans = []
+            for (name,) in result:
+                if name.startswith("info/"):
+                    if name[5:].rsplit("_", 1)[0] not in info_prefixes:
+                        orphans.append((name,))
+                elif name not in album_names:
+                    orphans.append((name,))
+            sql.executemany("DELETE FROM thumbnails WHERE name=?", orphans)
+            sql.executemany("DELETE FROM sources WHERE name=?", orphans)
+            sql.commit()
+            return len(orphans)
+
+    def vacuum(self):
+        """
+            Give back space freed by removed thumbnails
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.isolation_level = None
+            sql.execute("VACUUM")
+            sql.isolation_level = ""
+
+    def get_cursor(self):
+        """
+            Return a new sqlite cursor
+        """
+        try:
+            return sqlite3.connect(self.__DB_PATH, 600.0)
+        except:
+            exit(-1)
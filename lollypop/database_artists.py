@@ -14,8 +14,10 @@ from gettext import gettext as _
 import itertools
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.database_cache import cached
 from lollypop.define import Lp, Type
-from lollypop.utils import format_artist_name, noaccents
+from lollypop.utils import format_artist_name, noaccents, fts_query
+from lollypop.localized import get_sort_key
 
 
 class ArtistsDatabase:
@@ -40,11 +42,23 @@ class ArtistsDatabase:
         if sortname == "":
             sortname = format_artist_name(name)
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("INSERT INTO artists (name, sortname)\
-                                  VALUES (?, ?)",
-                                 (name, sortname))
+            result = sql.execute("INSERT INTO artists\
+                                  (name, sortname, sortkey)\
+                                  VALUES (?, ?, ?)",
+                                 (name, sortname, get_sort_key(sortname)))
+            sql.execute("INSERT INTO artists_fts (rowid, name)\
+                         VALUES (?, ?)", (result.lastrowid, noaccents(name)))
             return result.lastrowid
 
+    def get_names(self):
+        """
+            Get all artists names, even artists without album
+            @return [(artist id as int, name as str, sortname as str)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, name, sortname FROM artists")
+            return list(result)
+
     def set_sortname(self, artist_id, sortname):
         """
             Set sort name
@@ -54,9 +68,9 @@ class ArtistsDatabase:
         """
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE artists\
-                         SET sortname=?\
+                         SET sortname=?, sortkey=?\
                          WHERE rowid=?",
-                        (sortname, artist_id))
+                        (sortname, get_sort_key(sortname), artist_id))
 
     def get_sortname(self, artist_id):
         """
@@ -86,6 +100,7 @@ class ArtistsDatabase:
                 return v[0]
             return None
 
+    @cached("artists.name")
     def get_name(self, artist_id):
         """
             Get artist name
@@ -111,11 +126,10 @@ class ArtistsDatabase:
         with SqlCursor(Lp().db) as sql:
             request = "SELECT DISTINCT albums.rowid\
                        FROM album_artists, albums\
-                       WHERE albums.rowid=album_artists.album_id AND(1=0 "
-            for artist_id in artist_ids:
-                request += "OR album_artists.artist_id=%s " % artist_id
-            request += ") ORDER BY year"
-            result = sql.execute(request)
+                       WHERE albums.rowid=album_artists.album_id\
+                       AND album_artists.artist_id IN (%s)\
+                       ORDER BY year" % ",".join("?" * len(artist_ids))
+            result = sql.execute(request, tuple(artist_ids))
             return list(itertools.chain(*result))
 
     def get_compilations(self, artist_ids):
@@ -127,14 +141,13 @@ class ArtistsDatabase:
             request = "SELECT DISTINCT albums.rowid FROM albums,\
                        tracks, track_artists, album_artists\
                        WHERE track_artists.track_id=tracks.rowid\
-                       AND album_artists.artists_id=%s\
+                       AND album_artists.artist_id=?\
                        AND album_artists.album_id=albums.rowid\
-                       AND albums.rowid=tracks.album_id AND (1=0 " %\
-                       Type.COMPILATIONS
-            for artist_id in artist_ids:
-                request += "OR track_artists.artist_id=%s " % artist_id
-            request += ") ORDER BY albums.year"
-            result = sql.execute(request)
+                       AND albums.rowid=tracks.album_id\
+                       AND track_artists.artist_id IN (%s)\
+                       ORDER BY albums.year" % ",".join("?" * len(artist_ids))
+            filters = (Type.COMPILATIONS,) + tuple(artist_ids)
+            result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
     def get(self, genre_ids=[]):
@@ -153,8 +166,7 @@ class ArtistsDatabase:
                                   FROM artists, albums, album_artists\
                                   WHERE album_artists.artist_id=artists.rowid\
                                   AND album_artists.album_id=albums.rowid\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED")
+                                  ORDER BY artists.sortkey")
             else:
                 genres = tuple(genre_ids)
                 request = "SELECT DISTINCT artists.rowid,\
@@ -163,10 +175,9 @@ class ArtistsDatabase:
                            WHERE artists.rowid=album_artists.artist_id\
                            AND albums.rowid=album_artists.album_id\
                            AND album_genres.album_id=albums.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1=0) ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                request += "album_genres.genre_id IN (%s))\
+                            ORDER BY artists.sortkey" %\
+                    ",".join("?" * len(genre_ids))
                 result = sql.execute(request, genres)
             return [(row[0], row[1], row[2]) for row in result]
 
@@ -184,8 +195,7 @@ class ArtistsDatabase:
                               WHERE album_artists.artist_id=artists.rowid\
                               AND album_artists.album_id=albums.rowid\
                               AND albums.synced!=?\
-                              ORDER BY artists.sortname\
-                              COLLATE NOCASE COLLATE LOCALIZED",
+                              ORDER BY artists.sortkey",
                              (Type.NONE,))
             return [(row[0], row[1], row[2]) for row in result]
 
@@ -204,8 +214,7 @@ class ArtistsDatabase:
                                   FROM artists, albums, album_artists\
                                   WHERE album_artists.artist_id=artists.rowid\
                                   AND album_artists.album_id=albums.rowid\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED")
+                                  ORDER BY artists.sortkey")
             else:
                 genres = tuple(genre_ids)
                 request = "SELECT DISTINCT artists.rowid\
@@ -213,10 +222,9 @@ class ArtistsDatabase:
                            WHERE artists.rowid=album_artists.artist_id\
                            AND albums.rowid=album_artists.album_id\
                            AND album_genres.album_id=albums.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1=0) ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                request += "album_genres.genre_id IN (%s))\
+                            ORDER BY artists.sortkey" %\
+                    ",".join("?" * len(genre_ids))
                 result = sql.execute(request, genres)
             return list(itertools.chain(*result))
 
@@ -235,17 +243,21 @@ class ArtistsDatabase:
 
     def search(self, string):
         """
-            Search for artists looking like string
+            Search for artists with words starting like string
             @param string
             @return Array of id as int
         """
+        query = fts_query(string)
+        if not query:
+            return []
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT artists.rowid FROM artists, albums,\
-                                  album_artists\
-                                  WHERE noaccents(artists.name) LIKE ?\
-                                  AND album_artists.artist_id=artists.rowid\
-                                  AND album_artists.album_id=albums.rowid\
-                                  LIMIT 25", ("%" + noaccents(string) + "%",))
+            result = sql.execute("SELECT rowid FROM artists_fts\
+                                  WHERE artists_fts MATCH ?\
+                                  AND EXISTS (\
+                                    SELECT album_id FROM album_artists\
+                                    WHERE artist_id=artists_fts.rowid)\
+                                  ORDER BY rank\
+                                  LIMIT 25", (query,))
             return list(itertools.chain(*result))
 
     def count(self):
@@ -284,3 +296,5 @@ class ArtistsDatabase:
                 if not v:
                     sql.execute("DELETE FROM artists WHERE rowid=?",
                                 (artist_id,))
+                    sql.execute("DELETE FROM artists_fts WHERE rowid=?",
+                                (artist_id,))
@@ -0,0 +1,212 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Lock, current_thread, main_thread
+from collections import OrderedDict
+from functools import wraps
+
+from lollypop.define import Lp
+
+
+def cached(namespace):
+    """
+        Cache getter result in Lp().cache
+        @param namespace as str
+        @return decorator
+    """
+    def decorator(getter):
+        @wraps(getter)
+        def wrapper(obj, *args):
+            return Lp().cache.get(namespace, args, getter, obj)
+        return wrapper
+    return decorator
+
+
+class DatabaseCache:
+    """
+        Bounded LRU cache in front of per id database getters
+        Only main thread reads from cache, other threads may see
+        uncommitted values (scanner) and always query database
+    """
+    __SIZE = 10000
+
+    def __init__(self):
+        """
+            Init cache
+        """
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+        # Bumped on each removal, a value read while it changes is stale
+        self.__generation = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, namespace, args, getter, obj):
+        """
+            Get value from cache, call getter if missing
+            @param namespace as str
+            @param args as tuple
+            @param getter as function
+            @param obj as *Database
+            @return getter result
+        """
+        if current_thread() is not main_thread():
+            return getter(obj, *args)
+        key = (namespace, args)
+        with self.__lock:
+            if key in self.__items:
+                self.__items.move_to_end(key)
+                self.__hits += 1
+                value = self.__items[key]
+                return list(value) if isinstance(value, list) else value
+            self.__misses += 1
+            generation = self.__generation
+        value = getter(obj, *args)
+        with self.__lock:
+            if generation == self.__generation:
+                self.__items[key] = value
+                if len(self.__items) > self.__SIZE:
+                    self.__items.popitem(last=False)
+        # Do not let caller modify cached list
+        return list(value) if isinstance(value, list) else value
+
+    def remove(self, namespace, *args):
+        """
+            Remove value from cache, all namespace values if no args
+            Database writers not yet committed must also remove value
+            when notifying changes, main thread may have cached it again
+            @param namespace as str
+            @param args as values passed to getter
+        """
+        with self.__lock:
+            self.__generation += 1
+            if args:
+                self.__items.pop((namespace, args), None)
+            else:
+                for key in [key for key in self.__items
+                            if key[0] == namespace]:
+                    del self.__items[key]
+
+    def clear(self):
+        """
+            Remove all values from cache
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__items.clear()
+
+    def watch(self, scanner):
+        """
+            Invalidate cache on collection changes
+            @param scanner as CollectionScanner
+        """
+        scanner.connect("album-updated", self.__on_album_updated)
+        scanner.connect("artist-updated", self.__on_artist_updated)
+        scanner.connect("genre-updated", self.__on_genre_updated)
+        scanner.connect("collection-updated", self.__on_collection_updated)
+
+    @property
+    def hits(self):
+        """
+            Values read from cache
+            @return int
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+            Values read from database
+            @return int
+        """
+        return self.__misses
+
+    @property
+    def hit_rate(self):
+        """
+            Cache efficiency
+            @return float between 0 and 1
+        """
+        total = self.__hits + self.__misses
+        if total == 0:
+            return 0.0
+        return self.__hits / total
+
+    @property
+    def count(self):
+        """
+            Values in cache
+            @return int
+        """
+        return len(self.__items)
+
+#######################
+# PRIVATE             #
+#######################
+    def __on_album_updated(self, scanner, album_id, added):
+        """
+            Remove album values, tracks may have been replaced
+            @param scanner as CollectionScanner
+            @param album id as int
+            @param added as bool
+        """
+        for namespace in ["albums.artist_ids", "albums.year",
+                          "albums.loved", "albums.rate",
+                          "albums.popularity"]:
+            self.remove(namespace, album_id)
+        # Track ids are reused by sqlite
+        for namespace in ["tracks.artist_ids", "tracks.rate",
+                          "tracks.popularity"]:
+            self.remove(namespace)
+
+    def __on_artist_updated(self, scanner, artist_id, added):
+        """
+            Remove artist values
+            @param scanner as CollectionScanner
+            @param artist id as int
+            @param added as bool
+        """
+        self.remove("artists.name", artist_id)
+        self.remove("albums.artist_ids")
+
+    def __on_genre_updated(self, scanner, genre_id, added):
+        """
+            Remove genre values
+            @param scanner as CollectionScanner
+            @param genre id as int
+            @param added as bool
+        """
+        self.remove("genres.name", genre_id)
+
+    def __on_collection_updated(self, scanner, albums, artists, genres):
+        """
+            Remove values for changed items
+            @param scanner as CollectionScanner
+            @param albums as {album id as int: destroy as bool}
+            @param artists as {artist id as int: add as bool}
+            @param genres as {genre id as int: add as bool}
+        """
+        for album_id in albums.keys():
+            for namespace in ["albums.artist_ids", "albums.year",
+                              "albums.loved", "albums.rate",
+                              "albums.popularity"]:
+                self.remove(namespace, album_id)
+        if albums:
+            for namespace in ["tracks.artist_ids", "tracks.rate",
+                              "tracks.popularity"]:
+                self.remove(namespace)
+        for artist_id in artists.keys():
+            self.remove("artists.name", artist_id)
+        if artists:
+            self.remove("albums.artist_ids")
+        for genre_id in genres.keys():
+            self.remove("genres.name", genre_id)
@@ -0,0 +1,102 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from lollypop.sqlcursor import SqlCursor
+from lollypop.define import Lp
+
+
+class DirsDatabase:
+    """
+        Directories seen by last collection scan
+        A directory mtime changes when an entry is added/removed/renamed,
+        so scanner does not need to enumerate unchanged directories
+        Files this scan still has to add are kept, so an interrupted scan
+        can resume
+    """
+    create_dirs = """CREATE TABLE IF NOT EXISTS dirs (
+                                            uri TEXT PRIMARY KEY,
+                                            parent TEXT,
+                                            mtime INT NOT NULL,
+                                            inode INT NOT NULL)"""
+    create_pending = """CREATE TABLE IF NOT EXISTS scan_pending (
+                                            uri TEXT PRIMARY KEY,
+                                            mtime INT NOT NULL)"""
+
+    def __init__(self):
+        """
+            Init dirs database object
+        """
+        pass
+
+    def get(self):
+        """
+            Get all directories
+            @return {uri as str: (parent as str, mtime as int, inode as int)}
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri, parent, mtime, inode\
+                                  FROM dirs")
+            return {row[0]: row[1:] for row in result}
+
+    def set(self, dirs):
+        """
+            Replace directories
+            @param dirs as {uri as str: (parent as str,
+                                          mtime as int, inode as int)}
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("DELETE FROM dirs")
+            sql.executemany("INSERT INTO dirs (uri, parent, mtime, inode)\
+                             VALUES (?, ?, ?, ?)",
+                            [(uri,) + values for (uri, values) in
+                             dirs.items()])
+
+    def remove(self, uris):
+        """
+            Remove directories, they will be enumerated on next scan
+            @param uris as [str]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM dirs WHERE uri=?",
+                            [(uri,) for uri in uris])
+
+    def get_pending(self):
+        """
+            Get files not added yet by an interrupted scan
+            @return [(uri as str, mtime as int)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri, mtime FROM scan_pending")
+            return list(result)
+
+    def set_pending(self, items):
+        """
+            Replace files to add
+            @param items as [(uri as str, mtime as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("DELETE FROM scan_pending")
+            sql.executemany("INSERT OR REPLACE INTO scan_pending\
+                             (uri, mtime) VALUES (?, ?)", items)
+
+    def remove_pending(self, uris):
+        """
+            Remove files handled by scanner
+            @param uris as [str]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM scan_pending WHERE uri=?",
+                            [(uri,) for uri in uris])
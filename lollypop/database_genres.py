@@ -14,6 +14,7 @@ from gettext import gettext as _
 import itertools
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.database_cache import cached
 from lollypop.define import Lp, Type
 from lollypop.utils import get_network_available
 
@@ -55,6 +56,7 @@ class GenresDatabase:
                 return v[0]
             return None
 
+    @cached("genres.name")
     def get_name(self, genre_id):
         """
             Get genre name for genre id
@@ -39,11 +39,15 @@ class History:
                             album_rate INT NOT NULL,
                             loved_album INT NOT NULL,
                             album_popularity INT NOT NULL)"""
+    __create_history_idx = """CREATE UNIQUE INDEX IF NOT EXISTS idx_history
+                               ON history(name, duration)"""
 
     def __init__(self):
         """
             Init playlists manager
         """
+        # {(name, duration): stats} when preloaded
+        self.__preloaded = None
         # Create db schema
         try:
             with SqlCursor(self) as sql:
@@ -51,6 +55,19 @@ class History:
                 sql.commit()
         except:
             pass
+        try:
+            with SqlCursor(self) as sql:
+                # Old databases may contain duplicates, keep last one
+                sql.execute("DELETE FROM history\
+                             WHERE rowid NOT IN (SELECT MAX(rowid)\
+                                                 FROM history\
+                                                 GROUP BY name, duration)\
+                             AND NOT EXISTS (SELECT 1 FROM sqlite_master\
+                                             WHERE name='idx_history')")
+                sql.execute(self.__create_history_idx)
+                sql.commit()
+        except Exception as e:
+            print("History::__init__():", e)
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT COUNT(*)\
                                   FROM history")
@@ -79,20 +96,48 @@ class History:
             @thread safe
         """
         with SqlCursor(self) as sql:
-            if self.exists(name, duration):
-                sql.execute("UPDATE history\
-                             SET popularity=?,rate=?,ltime=?,mtime=?,\
-                             loved_album=?,album_popularity=?,album_rate=?\
-                             WHERE name=? AND duration=?",
-                            (popularity, rate, ltime, mtime, loved_album,
-                             album_popularity, album_rate, name, duration))
-            else:
-                sql.execute("INSERT INTO history\
+            sql.execute("INSERT OR REPLACE INTO history\
+                         (name, duration, popularity, rate, ltime, mtime,\
+                         loved_album, album_popularity, album_rate)\
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (name, duration, popularity, rate, ltime, mtime,
+                         loved_album, album_popularity, album_rate))
+            sql.commit()
+
+    def add_rows(self, rows):
+        """
+            Add many entries, replace existing ones
+            Last row wins for same name and duration
+            @param rows as [(name as str, duration as int, popularity as int,
+                             rate as int, ltime as int, mtime as int,
+                             loved_album as bool, album_popularity as int,
+                             album_rate as int)]
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS history_rows (\
+                             name TEXT NOT NULL,\
+                             duration INT NOT NULL,\
+                             popularity INT NOT NULL,\
+                             rate INT NOT NULL,\
+                             ltime INT NOT NULL,\
+                             mtime INT NOT NULL,\
+                             loved_album INT NOT NULL,\
+                             album_popularity INT NOT NULL,\
+                             album_rate INT NOT NULL,\
+                             PRIMARY KEY (name, duration))")
+            sql.execute("DELETE FROM history_rows")
+            sql.executemany("INSERT OR REPLACE INTO history_rows\
                              (name, duration, popularity, rate, ltime, mtime,\
                              loved_album, album_popularity, album_rate)\
-                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (name, duration, popularity, rate, ltime, mtime,
-                             loved_album, album_popularity, album_rate))
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            sql.execute("INSERT OR REPLACE INTO history\
+                         (name, duration, popularity, rate, ltime, mtime,\
+                         loved_album, album_popularity, album_rate)\
+                         SELECT name, duration, popularity, rate, ltime,\
+                         mtime, loved_album, album_popularity, album_rate\
+                         FROM history_rows")
+            sql.execute("DELETE FROM history_rows")
             sql.commit()
 
     def get(self, name, duration):
@@ -104,6 +149,9 @@ class History:
                      loved album, album_popularity)
              as (int, int, int, int, int, int)
         """
+        if self.__preloaded is not None:
+            return self.__preloaded.get((name, duration),
+                                        (0, 0, 0, 0, 0, 0, 0))
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT popularity, rate, ltime, mtime,\
                                   loved_album, album_popularity, album_rate\
@@ -116,6 +164,33 @@ class History:
                 return v
             return (0, 0, 0, 0, 0, 0, 0)
 
+    def preload(self, names):
+        """
+            Load stats for names in memory, get() will not query db
+            Until unload(), stats for other names are not found
+            @param names as [str]
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS history_names (\
+                             name TEXT PRIMARY KEY)")
+            sql.execute("DELETE FROM history_names")
+            sql.executemany("INSERT OR IGNORE INTO history_names (name)\
+                             VALUES (?)", [(name,) for name in names])
+            result = sql.execute("SELECT history.name, duration,\
+                                  popularity, rate, ltime, mtime,\
+                                  loved_album, album_popularity, album_rate\
+                                  FROM history_names, history\
+                                  WHERE history.name=history_names.name")
+            self.__preloaded = {(row[0], row[1]): row[2:] for row in result}
+            sql.execute("DELETE FROM history_names")
+            sql.commit()
+
+    def unload(self):
+        """
+            Drop stats loaded by preload()
+        """
+        self.__preloaded = None
+
     def exists(self, name, duration):
         """
             Return True if entry exists
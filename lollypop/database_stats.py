@@ -0,0 +1,111 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+class PopularityStats:
+    """
+        Sum and count of the most popular items of a table
+        Average popularity is then read without sorting the table
+    """
+    create_stats = """CREATE TABLE IF NOT EXISTS stats (
+                                            name TEXT PRIMARY KEY,
+                                            sum INT NOT NULL,
+                                            count INT NOT NULL)"""
+    # Average is done on most popular items only
+    __LIMIT = 100
+
+    def __init__(self, table):
+        """
+            Init stats
+            @param table as str
+        """
+        self.__table = table
+
+    def get_avg(self, sql):
+        """
+            Get average popularity
+            @param sql as sqlite3.Connection
+            @return float
+        """
+        result = sql.execute("SELECT sum, count FROM stats\
+                              WHERE name=?", (self.__table,))
+        v = result.fetchone()
+        if v is None:
+            v = self.__calculate(sql)
+        (total, count) = v
+        if count:
+            return total / count
+        return 0
+
+    def reset(self, sql):
+        """
+            Calculate stats from table
+            @param sql as sqlite3.Connection
+            @warning: commit needed
+        """
+        (total, count) = self.__calculate(sql)
+        sql.execute("INSERT OR REPLACE INTO stats (name, sum, count)\
+                     VALUES (?, ?, ?)", (self.__table, total, count))
+
+    def update(self, sql, old, new):
+        """
+            Update stats for an item popularity change
+            Must be called before item is changed in table
+            @param sql as sqlite3.Connection
+            @param old as int/None (new item)
+            @param new as int/None (removed item)
+            @warning: commit needed
+        """
+        result = sql.execute("SELECT sum, count FROM stats\
+                              WHERE name=?", (self.__table,))
+        v = result.fetchone()
+        if v is None:
+            return
+        (total, count) = v
+        # Popularity of last item in stats and of first item after
+        result = sql.execute("SELECT popularity FROM %s\
+                              ORDER BY popularity DESC\
+                              LIMIT 2 OFFSET ?" % self.__table,
+                             (self.__LIMIT - 1,))
+        limits = [row[0] for row in result] + [None, None]
+        (last, following) = limits[:2]
+        if old is not None and (last is None or old >= last):
+            total -= old
+            if following is None:
+                count -= 1
+            else:
+                total += following
+                last = following
+        if new is not None:
+            if count < self.__LIMIT:
+                total += new
+                count += 1
+            elif new > last:
+                total += new - last
+        sql.execute("UPDATE stats SET sum=?, count=? WHERE name=?",
+                    (total, count, self.__table))
+
+#######################
+# PRIVATE             #
+#######################
+    def __calculate(self, sql):
+        """
+            Calculate stats from table
+            @param sql as sqlite3.Connection
+            @return (sum as int, count as int)
+        """
+        result = sql.execute("SELECT IFNULL(SUM(popularity), 0), COUNT(*)\
+                              FROM (SELECT popularity FROM %s\
+                                    ORDER BY popularity DESC\
+                                    LIMIT ?)" % self.__table,
+                             (self.__LIMIT,))
+        return result.fetchone()
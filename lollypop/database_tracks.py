@@ -15,8 +15,10 @@ from gettext import gettext as _
 import itertools
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.database_cache import cached
+from lollypop.database_stats import PopularityStats
 from lollypop.define import Lp
-from lollypop.utils import noaccents
+from lollypop.utils import noaccents, fts_query
 
 
 class TracksDatabase:
@@ -29,7 +31,7 @@ class TracksDatabase:
         """
             Init tracks database object
         """
-        pass
+        self.__stats = PopularityStats("tracks")
 
     def add(self, name, uri, duration, tracknumber, discnumber,
             discname, album_id, year, popularity, rate, ltime, mtime):
@@ -52,6 +54,7 @@ class TracksDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
+            self.__stats.update(sql, None, popularity)
             result = sql.execute(
                 "INSERT INTO tracks (name, uri, duration, tracknumber,\
                 discnumber, discname, album_id,\
@@ -69,6 +72,8 @@ class TracksDatabase:
                                                         rate,
                                                         ltime,
                                                         mtime))
+            sql.execute("INSERT INTO tracks_fts (rowid, name)\
+                         VALUES (?, ?)", (result.lastrowid, noaccents(name)))
             return result.lastrowid
 
     def add_artist(self, track_id, artist_id):
@@ -84,6 +89,7 @@ class TracksDatabase:
                 sql.execute("INSERT INTO "
                             "track_artists (track_id, artist_id)"
                             "VALUES (?, ?)", (track_id, artist_id))
+                Lp().cache.remove("tracks.artist_ids", track_id)
 
     def add_genre(self, track_id, genre_id):
         """
@@ -100,6 +106,28 @@ class TracksDatabase:
                              VALUES (?, ?)",
                             (track_id, genre_id))
 
+    def add_artist_rows(self, rows):
+        """
+            Add artists to new tracks
+            @param rows as [(track id as int, artist id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO "
+                            "track_artists (track_id, artist_id)"
+                            "VALUES (?, ?)", rows)
+
+    def add_genre_rows(self, rows):
+        """
+            Add genres to new tracks
+            @param rows as [(track id as int, genre id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO\
+                             track_genres (track_id, genre_id)\
+                             VALUES (?, ?)", rows)
+
     def get_ids(self):
         """
             Return all internal track ids
@@ -118,7 +146,7 @@ class TracksDatabase:
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT rowid\
                                   FROM tracks WHERE name=?\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  COLLATE NOCASE",
                                  (name,))
             return list(itertools.chain(*result))
 
@@ -152,10 +180,8 @@ class TracksDatabase:
                             SELECT rowid\
                             FROM track_artists\
                             WHERE track_artists.track_id=tracks.rowid\
-                            AND ("
-            for artist_id in artist_ids:
-                request += " track_artists.artist_id=? OR"
-            request += " 1=0))"
+                            AND track_artists.artist_id IN (%s))" %\
+                ",".join("?" * len(artist_ids))
             result = sql.execute(request, filters)
             v = result.fetchone()
             if v is not None:
@@ -176,6 +202,64 @@ class TracksDatabase:
                 return v[0]
             return ""
 
+    def get_rows(self, track_ids):
+        """
+            Get track fields for many tracks at once
+            @param track ids as [int]
+            @return {track id as int: {field as str: value}}
+        """
+        rows = {}
+        if not track_ids:
+            return rows
+        with SqlCursor(Lp().db) as sql:
+            filters = tuple(track_ids)
+            ids = ",".join("?" * len(filters))
+            result = sql.execute("SELECT tracks.rowid, tracks.name,\
+                                  tracks.album_id, albums.name, tracks.year,\
+                                  tracks.uri, tracks.tracknumber,\
+                                  tracks.duration, tracks.mtime\
+                                  FROM tracks LEFT JOIN albums\
+                                  ON tracks.album_id=albums.rowid\
+                                  WHERE tracks.rowid IN (%s)" % ids,
+                                 filters)
+            for (track_id, name, album_id, album_name, year,
+                 uri, number, duration, mtime) in result:
+                rows[track_id] = {"name": name,
+                                  "album_id": album_id,
+                                  "album_name": album_name
+                                  if album_name is not None
+                                  else _("Unknown"),
+                                  "year": str(year) if year else "",
+                                  "uri": uri,
+                                  "number": number,
+                                  "duration": duration,
+                                  "mtime": mtime,
+                                  "artists": [],
+                                  "artist_ids": [],
+                                  "genres": [],
+                                  "genre_ids": []}
+            result = sql.execute("SELECT track_artists.track_id,\
+                                  artists.rowid, artists.name\
+                                  FROM artists, track_artists\
+                                  WHERE track_artists.track_id IN (%s)\
+                                  AND track_artists.artist_id=artists.rowid"
+                                 % ids, filters)
+            for (track_id, artist_id, artist) in result:
+                if track_id in rows:
+                    rows[track_id]["artist_ids"].append(artist_id)
+                    rows[track_id]["artists"].append(artist)
+            result = sql.execute("SELECT track_genres.track_id,\
+                                  genres.rowid, genres.name\
+                                  FROM genres, track_genres\
+                                  WHERE track_genres.track_id IN (%s)\
+                                  AND track_genres.genre_id=genres.rowid"
+                                 % ids, filters)
+            for (track_id, genre_id, genre) in result:
+                if track_id in rows:
+                    rows[track_id]["genre_ids"].append(genre_id)
+                    rows[track_id]["genres"].append(genre)
+            return rows
+
     def get_year(self, track_id):
         """
             Get track year
@@ -190,6 +274,7 @@ class TracksDatabase:
                 return str(v[0])
             return ""
 
+    @cached("tracks.rate")
     def get_rate(self, track_id):
         """
             Get track rate
@@ -238,6 +323,7 @@ class TracksDatabase:
             @param Track id as int
             @param rate as int
         """
+        Lp().cache.remove("tracks.rate", track_id)
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE tracks SET rate=?\
                          WHERE rowid=?",
@@ -273,6 +359,7 @@ class TracksDatabase:
                 return v[0]
             return _("Unknown")
 
+    @cached("tracks.artist_ids")
     def get_artist_ids(self, track_id):
         """
             Get artist ids
@@ -336,6 +423,21 @@ class TracksDatabase:
                 mtimes.update((row,))
             return mtimes
 
+    def get_mtimes_for_uri(self, uri):
+        """
+            Get mtime for track at uri or tracks under directory at uri
+            @param uri as str
+            @return dict of {uri as string: mtime as int}
+        """
+        prefix = uri.rstrip("/") + "/"
+        with SqlCursor(Lp().db) as sql:
+            # A range on uri, LIKE can't use index
+            # "0" is the character after "/"
+            result = sql.execute("SELECT uri, mtime FROM tracks\
+                                  WHERE uri=? OR (uri>=? AND uri<?)",
+                                 (uri, prefix, prefix[:-1] + "0"))
+            return dict(result)
+
     def get_uris(self, exclude=[]):
         """
             Get all tracks uri
@@ -456,13 +558,9 @@ class TracksDatabase:
             @return avarage popularity as int
         """
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT AVG(popularity)\
-                                  FROM (SELECT popularity\
-                                        FROM tracks\
-                                        ORDER BY POPULARITY DESC LIMIT 100)")
-            v = result.fetchone()
-            if v and v[0] > 5:
-                return v[0]
+            avg = self.__stats.get_avg(sql)
+            if avg > 5:
+                return avg
             return 5
 
     def set_more_popular(self, track_id):
@@ -471,12 +569,14 @@ class TracksDatabase:
             @param track id as int
             @raise sqlite3.OperationalError on db update
         """
+        Lp().cache.remove("tracks.popularity", track_id)
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT popularity from tracks WHERE rowid=?",
                                  (track_id,))
             pop = result.fetchone()
             if pop:
                 current = pop[0]
+                self.__stats.update(sql, current, current + 1)
             else:
                 current = 0
             current += 1
@@ -526,8 +626,8 @@ class TracksDatabase:
             @return int
         """
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT rowid FROM tracks\
-                                  WHERE persistent=?", (track_id,))
+            result = sql.execute("SELECT persistent FROM tracks\
+                                  WHERE rowid=?", (track_id,))
             v = result.fetchone()
             if v is not None:
                 return v[0]
@@ -563,8 +663,14 @@ class TracksDatabase:
             @param popularity as int
             @warning: commit needed
         """
+        Lp().cache.remove("tracks.popularity", track_id)
         with SqlCursor(Lp().db) as sql:
             try:
+                result = sql.execute("SELECT popularity FROM tracks\
+                                      WHERE rowid=?", (track_id,))
+                v = result.fetchone()
+                if v is not None:
+                    self.__stats.update(sql, v[0], popularity)
                 sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
                             (popularity, track_id))
                 if commit:
@@ -572,6 +678,7 @@ class TracksDatabase:
             except:  # Database is locked
                 pass
 
+    @cached("tracks.popularity")
     def get_popularity(self, track_id):
         """ème a déjà été remonté en début de semaine et semble ancien.
 Nous traitons le problème dès que possible (salle très occupée).
@@ -643,15 +750,19 @@ Nous traitons le problème dès que possible (salle très occupée).
 
     def search(self, searched):
         """
-            Search for tracks looking like searched
+            Search for tracks with words starting like searched
             @param searched as string
             return: list of [id as int, name as string]
         """
+        query = fts_query(searched)
+        if not query:
+            return []
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT tracks.rowid, tracks.name\
-                                  FROM tracks\
-                                  WHERE noaccents(name) LIKE ? LIMIT 25",
-                                 ("%" + noaccents(searched) + "%",))
+                                  FROM tracks_fts, tracks\
+                                  WHERE tracks_fts MATCH ?\
+                                  AND tracks.rowid=tracks_fts.rowid\
+                                  ORDER BY rank LIMIT 25", (query,))
             return list(result)
 
     def search_track(self, artist, title):
@@ -681,9 +792,16 @@ Nous traitons le problème dès que possible (salle très occupée).
             @param track id as int
         """
         with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT popularity FROM tracks\
+                                  WHERE rowid=?", (track_id,))
+            v = result.fetchone()
+            if v is not None:
+                self.__stats.update(sql, v[0], None)
             sql.execute("DELETE FROM track_genres\
                          WHERE track_id=?", (track_id,))
             sql.execute("DELETE FROM track_artists\
                          WHERE track_id=?", (track_id,))
             sql.execute("DELETE FROM tracks\
                          WHERE rowid=?", (track_id,))
+            sql.execute("DELETE FROM tracks_fts\
+                         WHERE rowid=?", (track_id,))
@@ -19,6 +19,8 @@ from lollypop.sqlcursor import SqlCursor
 from lollypop.utils import translate_artist_name
 from lollypop.database_history import History
 from lollypop.radios import Radios
+from lollypop.database_stats import PopularityStats
+from lollypop.database_dirs import DirsDatabase
 from lollypop.define import Lp
 
 
@@ -59,6 +61,14 @@ class DatabaseUpgrade:
             21: self.__upgrade_21,
             22: self.__upgrade_22,
             23: self.__upgrade_23,
+            24: self.__upgrade_24,
+            25: self.__upgrade_25,
+            26: self.__upgrade_26,
+            27: self.__upgrade_27,
+            28: DirsDatabase.create_dirs,
+            29: DirsDatabase.create_pending,
+            30: "CREATE INDEX IF NOT EXISTS idx_tracks_name\
+                 ON tracks(name COLLATE NOCASE)",
                          }
 
     """
@@ -521,3 +531,78 @@ class DatabaseUpgrade:
             sql.execute("DROP TABLE track_genres")
             sql.execute("ALTER TABLE track_genres2 RENAME TO track_genres")
             sql.commit()
+
+    def __upgrade_24(self):
+        """
+            Add indexes for lookups done by uri, album, artist and genre
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_tracks_uri\
+                         ON tracks(uri)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_tracks_album\
+                         ON tracks(album_id)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_albums_uri\
+                         ON albums(uri)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_albums_name\
+                         ON albums(name COLLATE NOCASE)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_artists_name\
+                         ON artists(name COLLATE NOCASE)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_genres_name\
+                         ON genres(name)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_aa_artist\
+                         ON album_artists(artist_id)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_ta_artist\
+                         ON track_artists(artist_id)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_ag_genre\
+                         ON album_genres(genre_id)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_tg_genre\
+                         ON track_genres(genre_id)")
+            sql.execute("ANALYZE")
+            sql.commit()
+        with SqlCursor(Lp().playlists) as sql:
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_pt_playlist\
+                         ON tracks(playlist_id)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_pt_uri\
+                         ON tracks(uri)")
+            sql.commit()
+
+    def __upgrade_25(self):
+        """
+            Add full text search index
+        """
+        with SqlCursor(Lp().db) as sql:
+            for table in ["albums", "artists", "tracks"]:
+                sql.execute("CREATE VIRTUAL TABLE %s_fts\
+                             USING fts5(name, tokenize=unicode61)" % table)
+                sql.execute("INSERT INTO %s_fts (rowid, name)\
+                             SELECT rowid, noaccents(name)\
+                             FROM %s" % (table, table))
+            sql.commit()
+
+    def __upgrade_26(self):
+        """
+            Add locale sort keys, Database.update_sort_keys() fills them
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("ALTER TABLE artists ADD sortkey BLOB")
+            sql.execute("ALTER TABLE albums ADD sortkey BLOB")
+            sql.execute("CREATE INDEX idx_artists_sortkey\
+                         ON artists(sortkey)")
+            sql.execute("CREATE INDEX idx_albums_sortkey\
+                         ON albums(sortkey)")
+            sql.commit()
+        Lp().settings.set_value("db-collation", GLib.Variant("s", ""))
+
+    def __upgrade_27(self):
+        """
+            Add popularity stats
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_tracks_popularity\
+                         ON tracks(popularity)")
+            sql.execute("CREATE INDEX IF NOT EXISTS idx_albums_popularity\
+                         ON albums(popularity)")
+            sql.execute(PopularityStats.create_stats)
+            PopularityStats("tracks").reset(sql)
+            PopularityStats("albums").reset(sql)
+            sql.commit()
@@ -72,6 +72,14 @@ class ArtSize:
     MAX = 4000
 
 
+class ArtSource:
+    NONE = 0             # No artwork found
+    STORE = 1            # Lollypop store, album dir is readonly
+    FAVORITE = 2         # Favorite file or named file in album dir
+    TAGS = 3             # Embedded in first track
+    FOLDER = 4           # First image in album dir
+
+
 class Shuffle:
     NONE = 0             # No shuffle
     TRACKS = 1           # Shuffle by tracks on genre
@@ -29,6 +29,8 @@ class Inotify:
         """
         self.__monitors = []
         self.__timeout = None
+        # Changed/created/deleted uris waiting for scanner
+        self.__uris = set()
 
     def add_monitor(self, uri):
         """
@@ -53,43 +55,46 @@ class Inotify:
 #######################
     def __on_dir_changed(self, monitor, changed_file, other_file, event):
         """
-            Prepare thread to handle changes
+            Collect changed uri and delay scanner update
         """
+        if event not in [Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                         Gio.FileMonitorEvent.CREATED,
+                         Gio.FileMonitorEvent.DELETED,
+                         Gio.FileMonitorEvent.MOVED_IN,
+                         Gio.FileMonitorEvent.MOVED_OUT,
+                         Gio.FileMonitorEvent.RENAMED]:
+            return
         update = False
-        # Stop collection scanner and wait
-        if Lp().scanner.is_locked():
-            Lp().scanner.stop()
-            GLib.timeout_add(self.__TIMEOUT,
-                             self.__on_dir_changed,
-                             monitor,
-                             changed_file,
-                             other_file,
-                             event)
-        # Run update delayed
-        else:
-            uri = changed_file.get_uri()
-            d = Gio.File.new_for_uri(uri)
-            if d.query_exists():
+        for f in [changed_file, other_file]:
+            if f is None:
+                continue
+            uri = f.get_uri()
+            if f.query_exists():
                 # If a directory, monitor it
-                if changed_file.query_file_type(
-                                            Gio.FileQueryInfoFlags.NONE,
-                                            None) == Gio.FileType.DIRECTORY:
+                if f.query_file_type(Gio.FileQueryInfoFlags.NONE,
+                                     None) == Gio.FileType.DIRECTORY:
                     self.add_monitor(uri)
-                # If not an audio file, exit
-                elif is_audio(changed_file):
                     update = True
+                # If not an audio file, ignore
+                elif is_audio(f):
+                    update = True
+                else:
+                    continue
             else:
                 update = True
-            if update:
-                if self.__timeout is not None:
-                    GLib.source_remove(self.__timeout)
-                    self.__timeout = None
-                self.__timeout = GLib.timeout_add(self.__TIMEOUT,
-                                                  self.__run_collection_update)
+            self.__uris.add(uri)
+        if update:
+            if self.__timeout is not None:
+                GLib.source_remove(self.__timeout)
+            self.__timeout = GLib.timeout_add(self.__TIMEOUT,
+                                              self.__run_collection_update)
 
     def __run_collection_update(self):
         """
-            Run a collection update
+            Update collection for changed uris
         """
+        # Scanner busy, retry later, keep uris
+        if not Lp().scanner.update_uris(list(self.__uris)):
+            return True
         self.__timeout = None
-        Lp().window.update_db()
+        self.__uris = set()
@@ -14,6 +14,8 @@ from gi.repository import GLib
 
 from threading import Thread, Lock
 
+from lollypop.define import Lp
+
 
 class Loader(Thread):
     """
@@ -46,6 +48,8 @@ class Loader(Thread):
             if active:
                 active.invalidate()
             Loader.active[self._view] = self
+        # Loaders only read, do not wait for collection scanner
+        Lp().cursors.set_readonly(True)
         result = self._target()
         if not self.is_invalidated():
             if self._on_finished:
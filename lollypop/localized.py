@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from locale import strcoll
+from locale import strcoll, strxfrm, setlocale, LC_COLLATE
 
 
 class LocalizedCollation(object):
@@ -24,3 +24,26 @@ class LocalizedCollation(object):
 
     def __call__(self, v1, v2):
         return strcoll(v1, v2)
+
+
+def get_sort_key(string):
+    """
+        Return a locale sort key for string
+        Sorting keys as blobs gives same order as LOCALIZED collation
+        @param string as str
+        @return bytes
+    """
+    try:
+        transformed = strxfrm(string)
+    except Exception as e:
+        print("get_sort_key():", e)
+        transformed = string.lower()
+    return b"".join([ord(c).to_bytes(4, "big") for c in transformed])
+
+
+def get_collation_locale():
+    """
+        Return current collation locale
+        @return str
+    """
+    return setlocale(LC_COLLATE)
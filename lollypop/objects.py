@@ -49,6 +49,14 @@ class Base:
             else:
                 return attr_value
 
+    def set_fields(self, fields):
+        """
+            Set fields values, lazy DB calls will not be done for them
+            @param fields as {field as str: value}
+        """
+        for (field, value) in fields.items():
+            setattr(self, "_" + field, value)
+
     def get_popularity(self):
         """
             Get popularity
@@ -128,6 +136,7 @@ class Disc:
         self.album = album
         self.number = disc_number
         self._track_ids = []
+        self._tracks = []
 
     @property
     def name(self):
@@ -164,7 +173,13 @@ class Disc:
 
             @return list of Track
         """
-        return [Track(id) for id in self.track_ids]
+        if not self._tracks and self.track_ids:
+            rows = Lp().tracks.get_rows(self.track_ids)
+            for track_id in self.track_ids:
+                track = Track(track_id)
+                track.set_fields(rows.get(track_id, {}))
+                self._tracks.append(track)
+        return self._tracks
 
 
 class Album(Base):
@@ -240,7 +255,12 @@ class Album(Base):
             @return list of Track
         """
         if not self._tracks and self.track_ids:
-            self._tracks = [Track(track_id) for track_id in self.track_ids]
+            rows = Lp().tracks.get_rows(self.track_ids)
+            self._tracks = []
+            for track_id in self.track_ids:
+                track = Track(track_id)
+                track.set_fields(rows.get(track_id, {}))
+                self._tracks.append(track)
         return self._tracks
 
     def disc_names(self, disc):
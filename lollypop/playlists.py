@@ -48,6 +48,9 @@ class Playlists(GObject.GObject):
     __create_tracks = """CREATE TABLE tracks (
                         playlist_id INT NOT NULL,
                         uri TEXT NOT NULL)"""
+    __create_tracks_playlist_idx = """CREATE INDEX idx_pt_playlist ON
+                                   tracks(playlist_id)"""
+    __create_tracks_uri_idx = """CREATE INDEX idx_pt_uri ON tracks(uri)"""
 
     def __init__(self):
         """
@@ -60,6 +63,8 @@ class Playlists(GObject.GObject):
             with SqlCursor(self) as sql:
                 sql.execute(self.__create_playlists)
                 sql.execute(self.__create_tracks)
+                sql.execute(self.__create_tracks_playlist_idx)
+                sql.execute(self.__create_tracks_uri_idx)
                 sql.commit()
         except:
             pass
@@ -15,6 +15,7 @@ from gi.repository import GObject, GLib
 import sqlite3
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.database_stats import PopularityStats
 
 
 class Radios(GObject.GObject):
@@ -40,6 +41,7 @@ class Radios(GObject.GObject):
             Init playlists manager
         """
         GObject.GObject.__init__(self)
+        self.__stats = PopularityStats("radios")
         # Create db schema
         try:
             with SqlCursor(self) as sql:
@@ -47,6 +49,18 @@ class Radios(GObject.GObject):
                 sql.commit()
         except:
             pass
+        try:
+            with SqlCursor(self) as sql:
+                sql.execute("CREATE INDEX IF NOT EXISTS idx_radios_popularity\
+                             ON radios(popularity)")
+                sql.execute(PopularityStats.create_stats)
+                result = sql.execute("SELECT rowid FROM stats\
+                                      WHERE name='radios'")
+                if result.fetchone() is None:
+                    self.__stats.reset(sql)
+                    sql.commit()
+        except Exception as e:
+            print("Radios::__init__():", e)
 
     def add(self, name, url):
         """
@@ -61,6 +75,7 @@ class Radios(GObject.GObject):
                              SET url=?\
                              WHERE name=?", (url, name))
             else:
+                self.__stats.update(sql, None, 0)
                 sql.execute("INSERT INTO radios (name, url, popularity)\
                              VALUES (?, ?, ?)",
                             (name, url, 0))
@@ -104,6 +119,11 @@ class Radios(GObject.GObject):
             @param radio name as str
         """
         with SqlCursor(self) as sql:
+            result = sql.execute("SELECT popularity FROM radios\
+                                  WHERE name=?", (name,))
+            v = result.fetchone()
+            if v is not None:
+                self.__stats.update(sql, v[0], None)
             sql.execute("DELETE FROM radios\
                         WHERE name=?",
                         (name,))
@@ -148,6 +168,7 @@ class Radios(GObject.GObject):
             pop = result.fetchone()
             if pop:
                 current = pop[0]
+                self.__stats.update(sql, current, current + 1)
             else:
                 current = 0
             current += 1
@@ -161,13 +182,9 @@ class Radios(GObject.GObject):
             @return avarage popularity as int
         """
         with SqlCursor(self) as sql:
-            result = sql.execute("SELECT AVG(popularity)\
-                                  FROM (SELECT popularity\
-                                        FROM radios\
-                                        ORDER BY POPULARITY DESC LIMIT 100)")
-            v = result.fetchone()
-            if v and v[0] is not None and v[0] > 5:
-                return v[0]
+            avg = self.__stats.get_avg(sql)
+            if avg > 5:
+                return avg
             return 5
 
     def set_popularity(self, name, popularity):
@@ -178,6 +195,11 @@ class Radios(GObject.GObject):
         """
         with SqlCursor(self) as sql:
             try:
+                result = sql.execute("SELECT popularity FROM radios\
+                                      WHERE name=?", (name,))
+                v = result.fetchone()
+                if v is not None:
+                    self.__stats.update(sql, v[0], popularity)
                 sql.execute("UPDATE radios SET\
                             popularity=? WHERE name=?",
                             (popularity, name))
@@ -493,7 +493,8 @@ class SettingsDialog:
             Lp().player.emit("current-changed")
             Lp().player.emit("prev-changed")
             Lp().player.emit("next-changed")
-            Lp().cursors = {}
+            Lp().cursors.clear()
+            Lp().cache.clear()
             track_ids = Lp().tracks.get_ids()
             self.__progress.show()
             history = History()
@@ -11,53 +11,376 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import current_thread
+from gi.repository import GLib
+
+from threading import local, Lock, current_thread
+from array import array
+from time import perf_counter
+import atexit
 
 from lollypop.define import Lp
 
 
+class SqlTracer:
+    """
+        Aggregate count, latency and threads of SQL statements
+        Time spent fetching rows after execute() is not measured
+    """
+
+    def __init__(self):
+        """
+            Init tracer
+        """
+        self.__local = local()
+        self.__lock = Lock()
+        # {statement: [calls as int, run as int,
+        #              durations as array, threads as set]}
+        self.__statements = {}
+
+    def trace(self, statement):
+        """
+            sqlite3 trace callback, count statements really run
+            @param statement as str
+        """
+        self.__local.run = getattr(self.__local, "run", 0) + 1
+
+    def start(self):
+        """
+            Start tracing a call in current thread
+        """
+        self.__local.run = 0
+        self.__local.start = perf_counter()
+
+    def stop(self, statement):
+        """
+            Stop tracing call in current thread
+            @param statement as str
+        """
+        duration = perf_counter() - self.__local.start
+        # Requests are split on many lines in sources
+        statement = " ".join(statement.split())
+        with self.__lock:
+            if statement not in self.__statements:
+                self.__statements[statement] = [0, 0, array("d"), set()]
+            item = self.__statements[statement]
+            item[0] += 1
+            item[1] += self.__local.run
+            item[2].append(duration)
+            item[3].add(current_thread().name)
+
+    def report(self, limit=50):
+        """
+            Get report for slowest statements
+            @param limit as int
+            @return str
+        """
+        lines = []
+        with self.__lock:
+            items = list(self.__statements.items())
+        items.sort(key=lambda item: sum(item[1][2]), reverse=True)
+        lines.append("%8s %8s %10s %8s  %-20s %s" % ("calls", "run",
+                                                     "total ms", "p95 ms",
+                                                     "threads", "statement"))
+        for (statement, (calls, run, durations, threads)) in items[:limit]:
+            ordered = sorted(durations)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append("%8d %8d %10.1f %8.2f  %-20s %s" % (
+                         calls, run, sum(durations) * 1000, p95 * 1000,
+                         ",".join(sorted(threads))[:20], statement[:200]))
+        return "\n".join(lines)
+
+    def print_report(self):
+        """
+            Print report on stdout
+        """
+        print("SqlTracer::report():")
+        print(self.report())
+
+
+class TracedConnection:
+    """
+        Proxy to a sqlite3 connection, time requests with a SqlTracer
+    """
+
+    def __init__(self, connection, tracer):
+        """
+            Init proxy
+            @param connection as sqlite3.Connection
+            @param tracer as SqlTracer
+        """
+        object.__setattr__(self, "_connection", connection)
+        object.__setattr__(self, "_tracer", tracer)
+        connection.set_trace_callback(tracer.trace)
+
+    def execute(self, statement, *args):
+        """
+            Execute statement
+            @param statement as str
+            @param args as sqlite3.Connection.execute() args
+            @return sqlite3.Cursor
+        """
+        self._tracer.start()
+        try:
+            return self._connection.execute(statement, *args)
+        finally:
+            self._tracer.stop(statement)
+
+    def executemany(self, statement, *args):
+        """
+            Execute statement for each parameters
+            @param statement as str
+            @param args as sqlite3.Connection.executemany() args
+            @return sqlite3.Cursor
+        """
+        self._tracer.start()
+        try:
+            return self._connection.executemany(statement, *args)
+        finally:
+            self._tracer.stop(statement)
+
+    def commit(self):
+        """
+            Commit transaction
+        """
+        self._tracer.start()
+        try:
+            self._connection.commit()
+        finally:
+            self._tracer.stop("COMMIT")
+
+    def __getattr__(self, attr):
+        return getattr(self._connection, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._connection, attr, value)
+
+
+class SqlPool:
+    """
+        Per thread pool of sqlite connections
+        Connections are kept open for thread lifetime, so collations,
+        functions and PRAGMAs are only set up once per thread
+    """
+    __PRAGMAS = ["PRAGMA temp_store=MEMORY",
+                 "PRAGMA cache_size=-8192"]
+
+    def __init__(self):
+        """
+            Init pool
+        """
+        self.__local = local()
+        self.__lock = Lock()
+        self.__generation = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__tracer = None
+        if GLib.getenv("LOLLYPOP_SQL_TRACE") is not None:
+            self.set_tracing(True)
+
+    def acquire(self, obj):
+        """
+            Get connection for obj and mark it as used
+            @param obj as Database/Playlists/Radios/History
+            @return sqlite3.Connection
+        """
+        entry = self.__get_entry(obj)
+        entry[1] += 1
+        if self.__tracer is not None:
+            return TracedConnection(entry[0], self.__tracer)
+        return entry[0]
+
+    def set_tracing(self, tracing):
+        """
+            Trace SQL statements, report is printed on exit
+            @param tracing as bool
+        """
+        if tracing and self.__tracer is None:
+            self.__tracer = SqlTracer()
+            atexit.register(self.__tracer.print_report)
+        elif not tracing and self.__tracer is not None:
+            atexit.unregister(self.__tracer.print_report)
+            self.__tracer = None
+
+    def release(self, obj):
+        """
+            Mark connection for obj as unused
+            Rollback pending transaction if nobody else uses it,
+            as closing the connection did before pooling
+            @param obj as Database/Playlists/Radios/History
+        """
+        entries = self.__get_entries()
+        name = self.__get_name(obj)
+        if name not in entries:
+            return
+        entry = entries[name]
+        entry[1] -= 1
+        if entry[1] <= 0 and not entry[2]:
+            entry[1] = 0
+            try:
+                if entry[0].in_transaction:
+                    entry[0].rollback()
+            except Exception as e:
+                print("SqlPool::release():", e)
+
+    def set_readonly(self, readonly):
+        """
+            Use read only connections in current thread when available
+            @param readonly as bool
+        """
+        self.__local.readonly = readonly
+
+    def pin(self, obj):
+        """
+            Keep connection for obj in a transaction, caller will commit
+            @param obj as Database/Playlists/Radios/History
+        """
+        self.__get_entry(obj)[2] = True
+
+    def close(self, obj):
+        """
+            Close connection for obj in current thread
+            @param obj as Database/Playlists/Radios/History
+        """
+        entries = self.__get_entries()
+        name = obj.__class__.__name__
+        # Read only and writable connections
+        for key in [name, name + ":ro"]:
+            if key in entries:
+                entries[key][0].close()
+                del entries[key]
+
+    def clear(self):
+        """
+            Drop all connections, other threads will reopen on next use
+        """
+        with self.__lock:
+            self.__generation += 1
+        entries = self.__get_entries()
+        for entry in entries.values():
+            entry[0].close()
+        entries.clear()
+
+    @property
+    def tracer(self):
+        """
+            Current tracer
+            @return SqlTracer/None
+        """
+        return self.__tracer
+
+    @property
+    def hits(self):
+        """
+            Connections reused from pool
+            @return int
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+            Connections created by pool
+            @return int
+        """
+        return self.__misses
+
+    @property
+    def count(self):
+        """
+            Connections opened in current thread
+            @return int
+        """
+        return len(self.__get_entries())
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_entries(self):
+        """
+            Get connections for current thread
+            @return {name as str: [connection, users as int,
+                                   pinned as bool]}
+        """
+        entries = getattr(self.__local, "entries", None)
+        if entries is None or\
+                getattr(self.__local, "generation", -1) != self.__generation:
+            if entries is not None:
+                for entry in entries.values():
+                    entry[0].close()
+            entries = self.__local.entries = {}
+            self.__local.generation = self.__generation
+        return entries
+
+    def __get_entry(self, obj):
+        """
+            Get pool entry for obj, create it if missing
+            @param obj as Database/Playlists/Radios/History
+            @return [connection, users as int, pinned as bool]
+        """
+        entries = self.__get_entries()
+        name = self.__get_name(obj)
+        if name in entries:
+            with self.__lock:
+                self.__hits += 1
+            return entries[name]
+        with self.__lock:
+            self.__misses += 1
+        if name.endswith(":ro"):
+            connection = obj.get_reader_cursor()
+        else:
+            connection = obj.get_cursor()
+        for pragma in self.__PRAGMAS:
+            try:
+                connection.execute(pragma)
+            except Exception as e:
+                print("SqlPool::__get_entry():", pragma, e)
+        entries[name] = [connection, 0, False]
+        return entries[name]
+
+    def __get_name(self, obj):
+        """
+            Get pool key for obj, read only connections are not shared
+            with writers
+            @param obj as Database/Playlists/Radios/History
+            @return str
+        """
+        name = obj.__class__.__name__
+        if getattr(self.__local, "readonly", False) and\
+                hasattr(obj, "get_reader_cursor"):
+            name += ":ro"
+        return name
+
+
 class SqlCursor:
     """
         Context manager to get the SQL cursor
     """
     def add(obj):
         """
-            Add cursor to thread list
-            Raise an exception if cursor already exists
+            Keep cursor opened for thread, caller will commit
         """
-        name = current_thread().getName() + obj.__class__.__name__
-        Lp().cursors[name] = obj.get_cursor()
+        Lp().cursors.pin(obj)
 
     def remove(obj):
         """
-            Remove cursor to thread list
-            Raise an exception if cursor already exists
+            Close cursor for thread
         """
-        name = current_thread().getName() + obj.__class__.__name__
-        del Lp().cursors[name]
+        Lp().cursors.close(obj)
 
     def __init__(self, obj):
         """
             Init object
         """
         self._obj = obj
-        self._creator = False
 
     def __enter__(self):
         """
             Return cursor for thread, create a new one if needed
         """
-        name = current_thread().getName() + self._obj.__class__.__name__
-        if name not in Lp().cursors:
-            self._creator = True
-            Lp().cursors[name] = self._obj.get_cursor()
-        return Lp().cursors[name]
+        return Lp().cursors.acquire(self._obj)
 
     def __exit__(self, type, value, traceback):
         """
-            If creator, close cursor and remove it
+            Release cursor, connection stays in pool
         """
-        if self._creator:
-            name = current_thread().getName() + self._obj.__class__.__name__
-            Lp().cursors[name].close()
-            del Lp().cursors[name]
+        Lp().cursors.release(self._obj)
@@ -10,14 +10,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gst, GstPbutils, GLib, Gio
+from gi.repository import Gst, GstPbutils, GLib, Gio, GObject
 
 from re import match
 
 from gettext import gettext as _
 
 from lollypop.define import Lp
-from lollypop.utils import format_artist_name, decode_all
+from lollypop.utils import format_artist_name, decode_all, nocase
+from lollypop.tagreader_header import HeaderReader
 
 
 class Discoverer:
@@ -49,6 +50,76 @@ class Discoverer:
         return info
 
 
+class HeaderInfo:
+    """
+        Discoverer info replacement built from file headers
+        Only tags and duration are available
+    """
+
+    def __init__(self, tags, duration):
+        """
+            Init info
+            @param tags as {str: [str/int]}
+            @param duration as float, seconds
+        """
+        self.__duration = int(duration * Gst.SECOND)
+        self.__tags = Gst.TagList.new_empty()
+        for (tag, values) in tags.items():
+            for value in values:
+                if tag in ["track-number", "album-disc-number"]:
+                    value = GObject.Value(GObject.TYPE_UINT, value)
+                elif tag == "datetime":
+                    value = GObject.Value(Gst.DateTime,
+                                          Gst.DateTime.new_y(value))
+                self.__tags.add_value(Gst.TagMergeMode.APPEND, tag, value)
+
+    def get_tags(self):
+        """
+            Get tags
+            @return Gst.TagList
+        """
+        return self.__tags
+
+    def get_duration(self):
+        """
+            Get duration
+            @return duration in ns as int
+        """
+        return self.__duration
+
+
+class HeaderDiscoverer(Discoverer):
+    """
+        Read tags from file headers for common formats,
+        use GStreamer discoverer for others
+        Much faster as no pipeline is built, but returned info only
+        has tags and duration, no images or streams
+    """
+
+    def __init__(self):
+        """
+            Init discoverer
+        """
+        Discoverer.__init__(self)
+        self.__reader = HeaderReader()
+
+    def get_info(self, uri):
+        """
+            Return information for file at uri
+            @param uri as str
+            @Exception GLib.Error
+            @return GstPbutils.DiscovererInfo/HeaderInfo
+        """
+        if uri.startswith("file://"):
+            try:
+                result = self.__reader.read(GLib.filename_from_uri(uri)[0])
+                if result is not None:
+                    return HeaderInfo(*result)
+            except Exception as e:
+                print("HeaderDiscoverer::get_info():", e, uri)
+        return Discoverer.get_info(self, uri)
+
+
 class TagReader(Discoverer):
     """
         Scanner tag reader
@@ -59,6 +130,68 @@ class TagReader(Discoverer):
             Init tag reader
         """
         Discoverer.__init__(self)
+        self.__batch = False
+
+    def start_batch(self):
+        """
+            Keep name to id maps and delay many rows inserts
+            until stop_batch(), caller must be the only db writer
+        """
+        # {nocase(name): [artist id, sortname]}
+        self.__artist_ids = {}
+        for (artist_id, name, sortname) in Lp().artists.get_names():
+            self.__artist_ids.setdefault(nocase(name), [artist_id, sortname])
+        # {name: genre id}
+        self.__genre_ids = {}
+        for (genre_id, name) in Lp().genres.get():
+            self.__genre_ids.setdefault(name, genre_id)
+        # {(nocase(name), artist id): album id}, {(name, None): album id}
+        # if no album artist
+        self.__album_ids = {}
+        # {album id: uri}
+        self.__album_uris = {}
+        for (album_id, name, uri,
+             no_album_artist, artist_id) in Lp().albums.get_id_rows():
+            if no_album_artist:
+                self.__album_ids.setdefault((name, None), album_id)
+            elif artist_id is not None:
+                self.__album_ids.setdefault((nocase(name), artist_id),
+                                            album_id)
+            self.__album_uris[album_id] = uri
+        self.__album_genres = set(Lp().albums.get_genre_rows())
+        self.__track_artist_rows = []
+        self.__track_genre_rows = []
+        self.__album_genre_rows = []
+        # {album id: artist ids need to be calculated}
+        self.__updated_albums = {}
+        self.__batch = True
+
+    def flush_batch(self):
+        """
+            Insert delayed rows, update albums
+            @commit needed
+        """
+        if not self.__batch:
+            return
+        Lp().tracks.add_artist_rows(self.__track_artist_rows)
+        Lp().tracks.add_genre_rows(self.__track_genre_rows)
+        Lp().albums.add_genre_rows(self.__album_genre_rows)
+        self.__track_artist_rows = []
+        self.__track_genre_rows = []
+        self.__album_genre_rows = []
+        for (album_id, calculate) in self.__updated_albums.items():
+            self.__update_album(album_id, calculate)
+        self.__updated_albums = {}
+
+    def stop_batch(self):
+        """
+            Forget maps and delayed rows, call flush_batch() before
+        """
+        self.__batch = False
+        self.__artist_ids = self.__genre_ids = None
+        self.__album_ids = self.__album_uris = self.__album_genres = None
+        self.__track_artist_rows = self.__track_genre_rows = None
+        self.__album_genre_rows = self.__updated_albums = None
 
     def get_title(self, tags, filepath):
         """
@@ -393,18 +526,11 @@ class TagReader(Discoverer):
         for artist in artists.split(";"):
             artist = artist.strip()
             if artist != "":
-                # Get artist id, add it if missing
-                artist_id = Lp().artists.get_id(artist)
                 if i >= sortlen or sortsplit[i] == "":
                     sortname = None
                 else:
                     sortname = sortsplit[i].strip()
-                if artist_id is None:
-                    if sortname is None:
-                        sortname = format_artist_name(artist)
-                    artist_id = Lp().artists.add(artist, sortname)
-                elif sortname is not None:
-                    Lp().artists.set_sortname(artist_id, sortname)
+                artist_id = self.__add_artist(artist, sortname)
                 i += 1
                 artist_ids.append(artist_id)
         return artist_ids
@@ -424,18 +550,11 @@ class TagReader(Discoverer):
         for artist in artists.split(";"):
             artist = artist.strip()
             if artist != "":
-                # Get album artist id, add it if missing
-                artist_id = Lp().artists.get_id(artist)
                 if i >= sortlen or sortsplit[i] == "":
                     sortname = None
                 else:
                     sortname = sortsplit[i].strip()
-                if artist_id is None:
-                    if sortname is None:
-                        sortname = format_artist_name(artist)
-                    artist_id = Lp().artists.add(artist, sortname)
-                elif sortname is not None:
-                    Lp().artists.set_sortname(artist_id, sortname)
+                artist_id = self.__add_artist(artist, sortname)
                 i += 1
                 artist_ids.append(artist_id)
         return artist_ids
@@ -453,9 +572,14 @@ class TagReader(Discoverer):
             genre = genre.strip()
             if genre != "":
                 # Get genre id, add genre if missing
-                genre_id = Lp().genres.get_id(genre)
+                if self.__batch:
+                    genre_id = self.__genre_ids.get(genre)
+                else:
+                    genre_id = Lp().genres.get_id(genre)
                 if genre_id is None:
                     genre_id = Lp().genres.add(genre)
+                    if self.__batch:
+                        self.__genre_ids[genre] = genre_id
                 genre_ids.append(genre_id)
         return genre_ids
 
@@ -481,14 +605,31 @@ class TagReader(Discoverer):
         else:
             parent_uri = ""
         new = False
-        album_id = Lp().albums.get_id(album_name, artist_ids)
+        if self.__batch:
+            album_id = self.__get_album_id(album_name, artist_ids)
+        else:
+            album_id = Lp().albums.get_id(album_name, artist_ids)
         if album_id is None:
             new = True
             album_id = Lp().albums.add(album_name, artist_ids, parent_uri,
                                        loved, popularity, rate, mtime)
+            if self.__batch:
+                self.__album_uris[album_id] = parent_uri
+                if artist_ids:
+                    for artist_id in artist_ids:
+                        self.__album_ids.setdefault(
+                                    (nocase(album_name), artist_id), album_id)
+                else:
+                    self.__album_ids.setdefault((album_name, None), album_id)
         # Now we have our album id, check if path doesn"t change
-        if Lp().albums.get_uri(album_id) != parent_uri:
+        if self.__batch:
+            uri = self.__album_uris.get(album_id)
+        else:
+            uri = Lp().albums.get_uri(album_id)
+        if uri != parent_uri:
             Lp().albums.set_uri(album_id, parent_uri)
+            if self.__batch:
+                self.__album_uris[album_id] = parent_uri
 
         return (album_id, new)
 
@@ -501,18 +642,18 @@ class TagReader(Discoverer):
             @param year as int
             @commit needed
         """
-        # Set artist ids based on content
-        if not artist_ids:
-            Lp().albums.set_artist_ids(
-                                    album_id,
-                                    Lp().albums.calculate_artist_ids(album_id))
+        if self.__batch:
+            for genre_id in genre_ids:
+                if (album_id, genre_id) not in self.__album_genres:
+                    self.__album_genres.add((album_id, genre_id))
+                    self.__album_genre_rows.append((album_id, genre_id))
+            # Needs tracks rows, done by flush_batch()
+            self.__updated_albums[album_id] = not artist_ids
+            return
         # Update album genres
         for genre_id in genre_ids:
             Lp().albums.add_genre(album_id, genre_id)
-
-        # Update year based on tracks
-        year = Lp().albums.get_year_from_tracks(album_id)
-        Lp().albums.set_year(album_id, year)
+        self.__update_album(album_id, not artist_ids)
 
     def update_track(self, track_id, artist_ids, genre_ids):
         """
@@ -520,12 +661,79 @@ class TagReader(Discoverer):
             @param track id as int
             @param artist ids as [int]
             @param genre ids as [int]
-            @param mtime as int
-            @param popularity as int
             @commit needed
         """
+        if self.__batch:
+            # Track is new, only drop duplicated tags
+            for artist_id in sorted(set(artist_ids), key=artist_ids.index):
+                self.__track_artist_rows.append((track_id, artist_id))
+            for genre_id in sorted(set(genre_ids), key=genre_ids.index):
+                self.__track_genre_rows.append((track_id, genre_id))
+            return
         # Set artists/genres for track
         for artist_id in artist_ids:
             Lp().tracks.add_artist(track_id, artist_id)
         for genre_id in genre_ids:
             Lp().tracks.add_genre(track_id, genre_id)
+
+#######################
+# PRIVATE             #
+#######################
+    def __add_artist(self, artist, sortname):
+        """
+            Get artist id, add artist if missing
+            @param artist as str
+            @param sortname as str/None
+            @return artist id as int
+            @commit needed
+        """
+        if self.__batch:
+            item = self.__artist_ids.get(nocase(artist))
+            artist_id = None if item is None else item[0]
+        else:
+            artist_id = Lp().artists.get_id(artist)
+        if artist_id is None:
+            if sortname is None:
+                sortname = format_artist_name(artist)
+            artist_id = Lp().artists.add(artist, sortname)
+            if self.__batch:
+                self.__artist_ids[nocase(artist)] = [artist_id, sortname]
+        elif sortname is not None:
+            if not self.__batch:
+                Lp().artists.set_sortname(artist_id, sortname)
+            elif item[1] != sortname:
+                Lp().artists.set_sortname(artist_id, sortname)
+                item[1] = sortname
+        return artist_id
+
+    def __get_album_id(self, album_name, artist_ids):
+        """
+            Get album id from maps, as AlbumsDatabase.get_id()
+            @param album name as str
+            @param artist ids as [int]
+            @return album id as int/None
+        """
+        if artist_ids:
+            name = nocase(album_name)
+            for artist_id in artist_ids:
+                album_id = self.__album_ids.get((name, artist_id))
+                if album_id is not None:
+                    return album_id
+            return None
+        return self.__album_ids.get((album_name, None))
+
+    def __update_album(self, album_id, calculate):
+        """
+            Update album artists and year based on tracks
+            @param album id as int
+            @param calculate as bool, set artists from tracks
+            @commit needed
+        """
+        # Set artist ids based on content
+        if calculate:
+            Lp().albums.set_artist_ids(
+                                    album_id,
+                                    Lp().albums.calculate_artist_ids(album_id))
+        # Update year based on tracks
+        year = Lp().albums.get_year_from_tracks(album_id)
+        Lp().albums.set_year(album_id, year)
@@ -0,0 +1,626 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from struct import unpack, error as StructError
+import os
+
+
+class HeaderReader:
+    """
+        Read tags and duration from file headers, without decoding
+        Supports FLAC, Ogg Vorbis/Opus, MP3 with ID3v2 and MP4
+        Tags use GStreamer names, unknown Vorbis comments and ID3 TXXX
+        frames are "KEY=value" extended comments, as GStreamer does
+    """
+    # Vorbis comment key: GStreamer tag
+    __VORBIS = {"TITLE": "title",
+                "ARTIST": "artist",
+                "ALBUM": "album",
+                "ALBUMARTIST": "album-artist",
+                "ALBUM ARTIST": "album-artist",
+                "GENRE": "genre",
+                "COMPOSER": "composer",
+                "PERFORMER": "performer",
+                "ARTISTSORT": "artist-sortname",
+                "ALBUMARTISTSORT": "album-artist-sortname",
+                "TRACKNUMBER": "track-number",
+                "DISCNUMBER": "album-disc-number",
+                "DATE": "datetime"}
+    # ID3v2.3/2.4 frame: GStreamer tag
+    __ID3 = {"TIT2": "title",
+             "TPE1": "artist",
+             "TPE2": "album-artist",
+             "TPE3": "performer",
+             "TALB": "album",
+             "TCON": "genre",
+             "TCOM": "composer",
+             "TSOP": "artist-sortname",
+             "TSO2": "album-artist-sortname",
+             "TRCK": "track-number",
+             "TPOS": "album-disc-number",
+             "TDRC": "datetime",
+             "TYER": "datetime"}
+    # ID3v2 frames read as extended comments, as Vorbis comments
+    __ID3_COMMENTS = {"TSST": "DISCSUBTITLE",
+                      "TDOR": "ORIGINALDATE",
+                      "TORY": "ORIGINALDATE"}
+    # MP4 atom: GStreamer tag
+    __MP4 = {b"\xa9nam": "title",
+             b"\xa9ART": "artist",
+             b"aART": "album-artist",
+             b"\xa9alb": "album",
+             b"\xa9gen": "genre",
+             b"\xa9wrt": "composer",
+             b"soar": "artist-sortname",
+             b"soaa": "album-artist-sortname",
+             b"\xa9day": "datetime",
+             b"\xa9lyr": "lyrics"}
+    # MP4 containers holding metadata
+    __MP4_CONTAINERS = [b"moov", b"udta", b"meta", b"ilst"]
+    # ID3v1 genres, used by ID3v2 "(n)" references and MP4 gnre atom
+    __GENRES = ["Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk",
+                "Grunge", "Hip-Hop", "Jazz", "Metal", "New Age", "Oldies",
+                "Other", "Pop", "R&B", "Rap", "Reggae", "Rock", "Techno",
+                "Industrial", "Alternative", "Ska", "Death Metal", "Pranks",
+                "Soundtrack", "Euro-Techno", "Ambient", "Trip-Hop", "Vocal",
+                "Jazz+Funk", "Fusion", "Trance", "Classical", "Instrumental",
+                "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+                "Alternative Rock", "Bass", "Soul", "Punk", "Space",
+                "Meditative", "Instrumental Pop", "Instrumental Rock",
+                "Ethnic", "Gothic", "Darkwave", "Techno-Industrial",
+                "Electronic", "Pop-Folk", "Eurodance", "Dream",
+                "Southern Rock", "Comedy", "Cult", "Gangsta", "Top 40",
+                "Christian Rap", "Pop/Funk", "Jungle", "Native American",
+                "Cabaret", "New Wave", "Psychedelic", "Rave", "Showtunes",
+                "Trailer", "Lo-Fi", "Tribal", "Acid Punk", "Acid Jazz",
+                "Polka", "Retro", "Musical", "Rock & Roll", "Hard Rock"]
+    # MPEG audio bitrates in kbps: {(version 1, layer): [...]}
+    __BITRATES = {(True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288,
+                              320, 352, 384, 416, 448],
+                  (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192,
+                              224, 256, 320, 384],
+                  (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160,
+                              192, 224, 256, 320],
+                  (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144,
+                               160, 176, 192, 224, 256],
+                  (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96,
+                               112, 128, 144, 160],
+                  (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96,
+                               112, 128, 144, 160]}
+    # MPEG audio sample rates: {version bits: [...]}
+    __SAMPLE_RATES = {3: [44100, 48000, 32000],
+                      2: [22050, 24000, 16000],
+                      0: [11025, 12000, 8000]}
+    # Do not read more than this to find headers
+    __MAX_HEADER = 16 * 1024 * 1024
+
+    def read(self, path):
+        """
+            Read tags and duration for file at path
+            @param path as str
+            @return ({tag as str: [value as str/int]}, duration as float)
+                    or None if format is not supported
+            @raise OSError
+        """
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            try:
+                if magic[:4] == b"fLaC":
+                    return self.__read_flac(f)
+                elif magic[:4] == b"OggS":
+                    return self.__read_ogg(f)
+                elif magic[4:8] == b"ftyp":
+                    return self.__read_mp4(f)
+                elif magic[:3] == b"ID3":
+                    # FLAC files may start with an ID3v2 tag
+                    size = self.__get_id3_size(magic[:10])
+                    f.seek(size)
+                    if f.read(4) == b"fLaC":
+                        f.seek(size)
+                        return self.__read_flac(f)
+                    f.seek(0)
+                    return self.__read_mp3(f)
+                # MPEG audio frame sync, layer bits 00 is AAC ADTS
+                elif len(magic) > 1 and magic[0] == 0xff and\
+                        magic[1] & 0xe0 == 0xe0 and magic[1] & 0x06:
+                    return self.__read_mp3(f)
+            except (ValueError, IndexError, KeyError,
+                    UnicodeError, StructError) as e:
+                # Corrupted or unusual header, let GStreamer handle it
+                print("HeaderReader::read():", e, path)
+        return None
+
+#######################
+# PRIVATE             #
+#######################
+    def __add(self, tags, tag, value):
+        """
+            Add value to tags, as GStreamer would
+            @param tags as {str: [str/int]}
+            @param tag as str
+            @param value as str
+        """
+        value = value.strip("\x00")
+        if not value:
+            return
+        if tag in ["track-number", "album-disc-number"]:
+            # "3/12" => 3
+            number = value.split("/")[0].strip()
+            if not number.isdigit():
+                return
+            tags.setdefault(tag, []).append(int(number))
+        elif tag == "datetime":
+            # "2001-02-03" => 2001
+            year = value.strip()[:4]
+            if not year.isdigit():
+                return
+            tags.setdefault(tag, []).append(int(year))
+        else:
+            tags.setdefault(tag, []).append(value)
+
+    def __add_comments(self, tags, data):
+        """
+            Add Vorbis comments to tags
+            @param tags as {str: [str/int]}
+            @param data as bytes, comment block without packet header
+        """
+        (length,) = unpack("<I", data[:4])
+        offset = 4 + length
+        (count,) = unpack("<I", data[offset:offset + 4])
+        offset += 4
+        for i in range(count):
+            (length,) = unpack("<I", data[offset:offset + 4])
+            offset += 4
+            comment = data[offset:offset + length].decode("utf-8", "replace")
+            offset += length
+            if "=" not in comment:
+                continue
+            (key, value) = comment.split("=", 1)
+            key = key.upper()
+            if key in self.__VORBIS:
+                self.__add(tags, self.__VORBIS[key], value)
+            elif key != "METADATA_BLOCK_PICTURE":
+                self.__add(tags, "extended-comment", "%s=%s" % (key, value))
+
+    def __read_flac(self, f):
+        """
+            Read FLAC metadata blocks
+            @param f as file at "fLaC"
+            @return (tags, duration)
+        """
+        tags = {}
+        duration = 0
+        f.read(4)
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                raise ValueError("truncated FLAC metadata")
+            last = header[0] & 0x80
+            block_type = header[0] & 0x7f
+            size = int.from_bytes(header[1:4], "big")
+            if block_type == 0:
+                data = f.read(size)
+                # 20 bits rate, 3 bits channels, 5 bits bps, 36 bits samples
+                value = int.from_bytes(data[10:18], "big")
+                rate = value >> 44
+                samples = value & 0xfffffffff
+                if rate:
+                    duration = samples / rate
+            elif block_type == 4:
+                self.__add_comments(tags, f.read(size))
+            else:
+                f.seek(size, os.SEEK_CUR)
+        return (tags, duration)
+
+    def __read_ogg_packets(self, f, count):
+        """
+            Read first packets of first logical stream
+            @param f as file
+            @param count as int
+            @return ([bytes], serial as int)
+        """
+        packets = []
+        packet = b""
+        serial = None
+        read = 0
+        while len(packets) < count:
+            header = f.read(27)
+            if len(header) < 27 or header[:4] != b"OggS":
+                raise ValueError("bad Ogg page")
+            (page_serial,) = unpack("<I", header[14:18])
+            segments = f.read(header[26])
+            size = sum(segments)
+            data = f.read(size)
+            read += 27 + len(segments) + size
+            if read > self.__MAX_HEADER:
+                raise ValueError("Ogg headers too large")
+            if serial is None:
+                serial = page_serial
+            elif page_serial != serial:
+                continue
+            offset = 0
+            for segment in segments:
+                packet += data[offset:offset + segment]
+                offset += segment
+                # A segment smaller than 255 ends packet
+                if segment < 255:
+                    packets.append(packet)
+                    packet = b""
+        return (packets[:count], serial)
+
+    def __get_ogg_granule(self, f, serial):
+        """
+            Get last granule position of stream
+            @param f as file
+            @param serial as int
+            @return int or None
+        """
+        size = f.seek(0, os.SEEK_END)
+        for chunk in [65536, 1048576]:
+            f.seek(max(0, size - chunk))
+            data = f.read(chunk)
+            index = data.rfind(b"OggS")
+            while index != -1:
+                if index + 18 <= len(data):
+                    (granule, page_serial) = unpack(
+                                             "<qI", data[index + 6:index + 18])
+                    if page_serial == serial and granule >= 0:
+                        return granule
+                index = data.rfind(b"OggS", 0, index)
+            if chunk >= size:
+                break
+        return None
+
+    def __read_ogg(self, f):
+        """
+            Read Ogg Vorbis/Opus headers
+            @param f as file
+            @return (tags, duration) or None
+        """
+        tags = {}
+        (packets, serial) = self.__read_ogg_packets(f, 2)
+        (ident, comments) = packets
+        if ident[:7] == b"\x01vorbis" and comments[:7] == b"\x03vorbis":
+            (rate,) = unpack("<I", ident[12:16])
+            pre_skip = 0
+            self.__add_comments(tags, comments[7:])
+        elif ident[:8] == b"OpusHead" and comments[:8] == b"OpusTags":
+            # Opus granule is always at 48kHz
+            rate = 48000
+            (pre_skip,) = unpack("<H", ident[10:12])
+            self.__add_comments(tags, comments[8:])
+        else:
+            # Ogg FLAC, Speex, ...
+            return None
+        duration = 0
+        granule = self.__get_ogg_granule(f, serial)
+        if granule is not None and rate:
+            duration = max(0, granule - pre_skip) / rate
+        return (tags, duration)
+
+    def __get_id3_size(self, header):
+        """
+            Get ID3v2 tag size, header included
+            @param header as bytes
+            @return int
+        """
+        size = self.__get_syncsafe(header[6:10]) + 10
+        # Footer
+        if header[5] & 0x10:
+            size += 10
+        return size
+
+    def __get_syncsafe(self, data):
+        """
+            Get integer from 7 bits bytes
+            @param data as bytes
+            @return int
+        """
+        value = 0
+        for byte in data:
+            value = (value << 7) | (byte & 0x7f)
+        return value
+
+    def __decode_id3_text(self, data, keep_empty=False):
+        """
+            Decode ID3v2 text frame content
+            @param data as bytes, encoding byte first
+            @param keep_empty as bool, keep empty values
+            @return [str]
+        """
+        encoding = data[0]
+        data = data[1:]
+        if encoding == 0:
+            text = data.decode("latin-1")
+        elif encoding == 1:
+            text = data[:len(data) // 2 * 2].decode("utf-16", "replace")
+        elif encoding == 2:
+            text = data[:len(data) // 2 * 2].decode("utf-16-be", "replace")
+        else:
+            text = data.decode("utf-8", "replace")
+        # ID3v2.4 separates values with NUL, each one with its own BOM
+        values = [value.lstrip("\ufeff") for value in text.split("\x00")]
+        if keep_empty:
+            return values
+        return [value for value in values if value]
+
+    def __read_id3(self, f, tags):
+        """
+            Read ID3v2 tag
+            @param f as file at "ID3"
+            @param tags as {str: [str/int]}
+            @return audio start offset as int or None if not supported
+        """
+        header = f.read(10)
+        major = header[3]
+        flags = header[5]
+        size = self.__get_id3_size(header)
+        if major not in [3, 4] or size > self.__MAX_HEADER:
+            return None
+        data = f.read(size - 10)
+        if flags & 0x80 and major == 3:
+            data = data.replace(b"\xff\x00", b"\xff")
+        offset = 0
+        # Extended header
+        if flags & 0x40:
+            if major == 4:
+                offset = self.__get_syncsafe(data[:4])
+            else:
+                offset = unpack(">I", data[:4])[0] + 4
+        while offset + 10 <= len(data):
+            frame_id = data[offset:offset + 4]
+            if frame_id[0] == 0:
+                # Padding
+                break
+            if major == 4:
+                frame_size = self.__get_syncsafe(data[offset + 4:offset + 8])
+            else:
+                (frame_size,) = unpack(">I", data[offset + 4:offset + 8])
+            frame_flags = data[offset + 9]
+            frame = data[offset + 10:offset + 10 + frame_size]
+            offset += 10 + frame_size
+            frame_id = frame_id.decode("latin-1")
+            if major == 4:
+                # Compressed or encrypted
+                if frame_flags & 0x0c:
+                    continue
+                if frame_flags & 0x02:
+                    frame = frame.replace(b"\xff\x00", b"\xff")
+                # Data length indicator
+                if frame_flags & 0x01:
+                    frame = frame[4:]
+            elif frame_flags & 0xc0:
+                continue
+            if not frame:
+                continue
+            if frame_id in self.__ID3:
+                for value in self.__decode_id3_text(frame):
+                    if frame_id == "TCON":
+                        value = self.__get_id3_genre(value)
+                    self.__add(tags, self.__ID3[frame_id], value)
+            elif frame_id in self.__ID3_COMMENTS:
+                for value in self.__decode_id3_text(frame):
+                    self.__add(tags, "extended-comment",
+                               "%s=%s" % (self.__ID3_COMMENTS[frame_id],
+                                          value))
+            elif frame_id == "TXXX":
+                # Description NUL value
+                values = self.__decode_id3_text(frame, True)
+                if len(values) > 1 and values[0]:
+                    self.__add(tags, "extended-comment",
+                               "%s=%s" % (values[0], values[1]))
+            elif frame_id == "USLT":
+                # Encoding, language, description NUL, lyrics
+                values = self.__decode_id3_text(frame[:1] + frame[4:], True)
+                if len(values) > 1:
+                    self.__add(tags, "lyrics", values[1])
+        return size
+
+    def __get_id3_genre(self, value):
+        """
+            Resolve ID3v1 genre references
+            @param value as str, "(17)", "17" or "Rock"
+            @return str
+        """
+        number = value.strip("()")
+        if value.startswith("(") and ")" in value:
+            number = value[1:value.index(")")]
+            if value[value.index(")") + 1:]:
+                return value[value.index(")") + 1:]
+        if number.isdigit() and int(number) < len(self.__GENRES):
+            return self.__GENRES[int(number)]
+        return value
+
+    def __read_mp3(self, f):
+        """
+            Read ID3v2 tag and MPEG audio duration
+            @param f as file
+            @return (tags, duration) or None
+        """
+        tags = {}
+        start = 0
+        if f.read(3) == b"ID3":
+            f.seek(0)
+            start = self.__read_id3(f, tags)
+            if start is None:
+                return None
+        f.seek(start)
+        data = f.read(65536)
+        # Find first frame
+        index = 0
+        while True:
+            index = data.find(b"\xff", index)
+            if index == -1 or index + 4 > len(data):
+                return None
+            header = unpack(">I", data[index:index + 4])[0]
+            if header & 0xffe00000 == 0xffe00000:
+                version = (header >> 19) & 3
+                layer = 4 - ((header >> 17) & 3)
+                bitrate_index = (header >> 12) & 0xf
+                rate_index = (header >> 10) & 3
+                if version != 1 and layer != 4 and\
+                        bitrate_index not in [0, 15] and rate_index != 3:
+                    rate = self.__SAMPLE_RATES[version][rate_index]
+                    bitrate = self.__BITRATES[(version == 3, layer)][
+                                                      bitrate_index] * 1000
+                    # Next frame must follow, else it is a false sync
+                    padding = (header >> 9) & 1
+                    if layer == 1:
+                        length = (12 * bitrate // rate + padding) * 4
+                    elif layer == 3 and version != 3:
+                        length = 72 * bitrate // rate + padding
+                    else:
+                        length = 144 * bitrate // rate + padding
+                    following = data[index + length:index + length + 2]
+                    if len(following) < 2:
+                        break
+                    elif following[0] == 0xff and following[1] & 0xe0 == 0xe0:
+                        break
+            index += 1
+        if layer == 1:
+            samples = 384
+        elif layer == 3 and version != 3:
+            samples = 576
+        else:
+            samples = 1152
+        # Xing/Info header for VBR files, after side information
+        mono = (header >> 6) & 3 == 3
+        if version == 3:
+            side = 17 if mono else 32
+        else:
+            side = 9 if mono else 17
+        xing = index + 4 + side
+        vbri = index + 4 + 32
+        frames = None
+        if data[xing:xing + 4] in [b"Xing", b"Info"]:
+            (flags,) = unpack(">I", data[xing + 4:xing + 8])
+            if flags & 1:
+                (frames,) = unpack(">I", data[xing + 8:xing + 12])
+        elif data[vbri:vbri + 4] == b"VBRI":
+            (frames,) = unpack(">I", data[vbri + 14:vbri + 18])
+        if frames is not None:
+            duration = frames * samples / rate
+        else:
+            end = f.seek(0, os.SEEK_END)
+            # ID3v1 tag
+            f.seek(max(0, end - 128))
+            if f.read(3) == b"TAG":
+                end -= 128
+            duration = (end - start - index) * 8 / bitrate
+        return (tags, duration)
+
+    def __get_mp4_atoms(self, f, start, end):
+        """
+            Iterate over atoms between offsets
+            @param f as file
+            @param start as int
+            @param end as int
+            @return iterator of (name as bytes, data start as int,
+                                 atom end as int)
+        """
+        offset = start
+        while offset + 8 <= end:
+            f.seek(offset)
+            (size, name) = unpack(">I4s", f.read(8))
+            header = 8
+            if size == 1:
+                (size,) = unpack(">Q", f.read(8))
+                header = 16
+            elif size == 0:
+                size = end - offset
+            if size < header:
+                raise ValueError("bad MP4 atom size")
+            yield (name, offset + header, offset + size)
+            offset += size
+
+    def __read_mp4(self, f):
+        """
+            Read MP4 movie header and iTunes metadata
+            @param f as file
+            @return (tags, duration)
+        """
+        tags = {}
+        duration = 0
+        end = f.seek(0, os.SEEK_END)
+        containers = [(None, 0, end)]
+        while containers:
+            (parent, start, stop) = containers.pop(0)
+            for (name, data_start, atom_end) in self.__get_mp4_atoms(
+                                                           f, start, stop):
+                if name in self.__MP4_CONTAINERS:
+                    # meta is a full atom in MP4, not in QuickTime
+                    if name == b"meta":
+                        f.seek(data_start)
+                        if f.read(8)[4:8] != b"hdlr":
+                            data_start += 4
+                    containers.append((name, data_start, atom_end))
+                elif name == b"mvhd":
+                    f.seek(data_start)
+                    data = f.read(32)
+                    if data[0] == 1:
+                        (timescale, length) = unpack(">IQ", data[20:32])
+                    else:
+                        (timescale, length) = unpack(">II", data[12:20])
+                    if timescale:
+                        duration = length / timescale
+                elif parent == b"ilst" and (name in self.__MP4 or name in [
+                        b"trkn", b"disk", b"gnre", b"----"]):
+                    f.seek(data_start)
+                    self.__add_mp4_item(tags, name,
+                                        f.read(atom_end - data_start))
+        return (tags, duration)
+
+    def __add_mp4_item(self, tags, name, data):
+        """
+            Add iTunes metadata item to tags
+            @param tags as {str: [str/int]}
+            @param name as bytes
+            @param data as bytes, item content
+        """
+        values = []
+        mean = ""
+        key = ""
+        offset = 0
+        while offset + 8 <= len(data):
+            (size, atom) = unpack(">I4s", data[offset:offset + 8])
+            if size < 8:
+                break
+            content = data[offset + 8:offset + size]
+            offset += size
+            if atom == b"data":
+                # Type and locale
+                values.append(content[8:])
+            elif atom == b"mean":
+                mean = content[4:].decode("utf-8", "replace")
+            elif atom == b"name":
+                key = content[4:].decode("utf-8", "replace")
+        for value in values:
+            if name in [b"trkn", b"disk"]:
+                if len(value) >= 4:
+                    tag = "track-number" if name == b"trkn"\
+                        else "album-disc-number"
+                    self.__add(tags, tag, str(unpack(">H", value[2:4])[0]))
+            elif name == b"gnre":
+                if len(value) >= 2:
+                    index = unpack(">H", value[:2])[0] - 1
+                    if 0 <= index < len(self.__GENRES):
+                        self.__add(tags, "genre", self.__GENRES[index])
+            elif name == b"----":
+                if mean == "com.apple.iTunes" and key:
+                    self.__add(tags, "extended-comment",
+                               "%s=%s" % (key.upper(),
+                                          value.decode("utf-8", "replace")))
+            else:
+                self.__add(tags, self.__MP4[name],
+                           value.decode("utf-8", "replace"))
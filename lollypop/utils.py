@@ -14,11 +14,14 @@ from gi.repository import Gio, GLib
 
 from gettext import gettext as _
 import unicodedata
+from string import ascii_uppercase, ascii_lowercase
 
 from lollypop.helper_task import TaskHelper
 from lollypop.define import Lp, Type, ENCODING
 from lollypop.objects import Track
 
+_NOCASE = str.maketrans(ascii_uppercase, ascii_lowercase)
+
 
 def decode_all(bytes):
     """
@@ -52,6 +55,28 @@ def noaccents(string):
         return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 
+def nocase(string):
+    """
+        Return string as compared by SQLite NOCASE collation
+        Only ASCII characters are folded
+        @param string as str
+        @return str
+    """
+    return string.translate(_NOCASE)
+
+
+def fts_query(string):
+    """
+        Return a full text search query matching words starting with string
+        @param string as str
+        @return str
+    """
+    words = []
+    for word in noaccents(string).split():
+        words.append('"%s"*' % word.replace('"', '""'))
+    return " ".join(words)
+
+
 def escape(str, ignore=["_", "-", " ", "."]):
     """
         Escape string
@@ -86,10 +111,12 @@ def is_gnome():
     return GLib.getenv("XDG_CURRENT_DESKTOP") in ["ubuntu:GNOME", "GNOME"]
 
 
-def is_audio(f):
+def is_audio(f, info=None):
     """
         Return True if files is audio
         @param f as Gio.File
+        @param info as Gio.FileInfo with standard::content-type,
+               queried if None
     """
     audio = ["application/ogg", "application/x-ogg", "application/x-ogm-audio",
              "audio/aac", "audio/mp4", "audio/mpeg", "audio/mpegurl",
@@ -105,8 +132,9 @@ def is_audio(f):
              "audio/x-pn-windows-acm", "application/x-matroska",
              "audio/x-matroska", "video/mp4"]
     try:
-        info = f.query_info("standard::content-type",
-                            Gio.FileQueryInfoFlags.NONE)
+        if info is None:
+            info = f.query_info("standard::content-type",
+                                Gio.FileQueryInfoFlags.NONE)
         if info is not None:
             content_type = info.get_content_type()
             if content_type in audio:
@@ -116,14 +144,17 @@ def is_audio(f):
     return False
 
 
-def is_pls(f):
+def is_pls(f, info=None):
     """
         Return True if files is a playlist
         @param f as Gio.File
+        @param info as Gio.FileInfo with standard::content-type,
+               queried if None
     """
     try:
-        info = f.query_info("standard::content-type",
-                            Gio.FileQueryInfoFlags.NONE)
+        if info is None:
+            info = f.query_info("standard::content-type",
+                                Gio.FileQueryInfoFlags.NONE)
         if info is not None:
             if info.get_content_type() in ["audio/x-mpegurl",
                                            "application/xspf+xml"]:
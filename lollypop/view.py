@@ -12,7 +12,10 @@
 
 from gi.repository import Gtk, GLib
 
+from itertools import chain
+
 from lollypop.define import Lp
+from lollypop.objects import Album
 
 
 class View(Gtk.Grid):
@@ -265,6 +268,9 @@ class LazyLoadingView(View):
     """
         Lazy loading for view
     """
+    __HYDRATE_BATCH = 50
+    # Wait for scrolling to stop before loading/cancelling covers
+    __COVERS_DELAY = 200
 
     def __init__(self, filtered=False):
         """
@@ -273,8 +279,10 @@ class LazyLoadingView(View):
         """
         View.__init__(self, filtered)
         self._lazy_queue = []  # Widgets not initialized
+        self.__hydrated = set()  # Widgets with album fields loaded
         self._scroll_value = 0
         self.__prev_scroll_value = 0
+        self.__covers_scroll_value = 0
         self._scrolled.get_vadjustment().connect("value-changed",
                                                  self._on_value_changed)
 
@@ -283,6 +291,7 @@ class LazyLoadingView(View):
             Stop loading
         """
         self._lazy_queue = []
+        self.__hydrated = set()
         View.stop(self)
 
     def append(self, widget):
@@ -310,9 +319,12 @@ class LazyLoadingView(View):
             Update scroll value and check for lazy queue
             @param adj as Gtk.Adjustment
         """
+        scroll_value = adj.get_value()
+        self.__covers_scroll_value = scroll_value
+        GLib.timeout_add(self.__COVERS_DELAY,
+                         self.__update_covers, scroll_value)
         if not self._lazy_queue:
             return False
-        scroll_value = adj.get_value()
         self.__prev_scroll_value = scroll_value
         GLib.idle_add(self.__lazy_or_not, scroll_value)
 
@@ -337,12 +349,38 @@ class LazyLoadingView(View):
         elif self._lazy_queue:
             widget = self._lazy_queue.pop(0)
         if widget is not None:
+            self.__hydrate(widget, widgets)
             widget.populate()
             if widgets:
                 GLib.timeout_add(10, self.lazy_loading, widgets, scroll_value)
             else:
                 GLib.idle_add(self.lazy_loading, widgets, scroll_value)
 
+    def __hydrate(self, widget, widgets):
+        """
+            Load album fields for widget and following widgets
+            with one query instead of one query per field
+            @param widget as Gtk.Widget
+            @param widgets as [Gtk.Widget]
+        """
+        if widget in self.__hydrated:
+            return
+        albums = []
+        for child in chain([widget], widgets, self._lazy_queue):
+            if len(albums) >= self.__HYDRATE_BATCH:
+                break
+            if child in self.__hydrated:
+                continue
+            self.__hydrated.add(child)
+            album = getattr(child, "album", None)
+            if isinstance(album, Album) and\
+                    album.id is not None and album.id >= 0:
+                albums.append(album)
+        if albums:
+            rows = Lp().albums.get_rows([album.id for album in albums])
+            for album in albums:
+                album.set_fields(rows.get(album.id, {}))
+
     def __is_visible(self, widget):
         """
             Is widget visible in scrolled
@@ -372,3 +410,19 @@ class LazyLoadingView(View):
         if self._stop or self._scroll_value != scroll_value:
             return
         GLib.idle_add(self.lazy_loading, widgets, self._scroll_value)
+
+    def __update_covers(self, scroll_value):
+        """
+            Load covers for visible widgets, cancel others
+            @param scroll value as float
+        """
+        if self._stop or self.__covers_scroll_value != scroll_value:
+            return
+        for child in self._get_children():
+            if not hasattr(child, "cancel_cover"):
+                continue
+            if self.__is_visible(child):
+                if child.needs_cover:
+                    child.set_cover()
+            else:
+                child.cancel_cover()
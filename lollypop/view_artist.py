@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk, Gdk, Pango, GLib, Gio, GdkPixbuf
+from gi.repository import Gtk, Gdk, Pango, GLib
 
 from gettext import gettext as _
 from math import pi
@@ -291,22 +291,9 @@ class ArtistView(ArtistAlbumsView):
                 artist = Lp().artists.get_name(self._artist_ids[0])
                 size = ArtSize.ARTIST_SMALL * 2 * self.__scale_factor
                 for suffix in ["lastfm", "spotify", "wikipedia"]:
-                    uri = InfoCache.get_artwork(artist, suffix, size)
-                    if uri is not None:
-                        f = Gio.File.new_for_path(uri)
-                        (status, data, tag) = f.load_contents(None)
-                        if not status:
-                            continue
-                        bytes = GLib.Bytes(data)
-                        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
-                        bytes.unref()
-                        pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(
-                                                                       stream,
-                                                                       size,
-                                                                       size,
-                                                                       True,
-                                                                       None)
-                        stream.close()
+                    pixbuf = InfoCache.get_artwork_pixbuf(artist, suffix,
+                                                          size)
+                    if pixbuf is not None:
                         surface = Gdk.cairo_surface_create_from_pixbuf(
                                             pixbuf, self.__scale_factor, None)
                         self.__artwork.set_from_surface(surface)
@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk, GLib, Gdk
+from gi.repository import Gtk, GLib, Gdk, Gio
 
 from gettext import gettext as _
 
@@ -321,9 +321,14 @@ class AlbumWidget(BaseWidget):
         self._album = Album(album_id, genre_ids)
         self._filter_ids = artist_ids
         self._art_size = art_size
+        self.__cover_loaded = False
+        self.__cover_cancellable = None
         self.connect("destroy", self.__on_destroy)
         self._scan_signal = Lp().scanner.connect("album-updated",
                                                  self._on_album_updated)
+        self.__collection_signal = Lp().scanner.connect(
+                                            "collection-updated",
+                                            self.__on_collection_updated)
 
     @property
     def album(self):
@@ -356,34 +361,41 @@ class AlbumWidget(BaseWidget):
     def set_cover(self):
         """
             Set cover for album if state changed
+            A placeholder is shown while artwork is loading
         """
         if self._cover is None:
             return
-        surface = Lp().art.get_album_artwork(
-                            self._album,
-                            self._art_size,
-                            self._cover.get_scale_factor())
-        self._cover.set_from_surface(surface)
-        if surface.get_height() > surface.get_width():
-            self._overlay_orientation = Gtk.Orientation.VERTICAL
-        else:
-            self._overlay_orientation = Gtk.Orientation.HORIZONTAL
+        if not self.__cover_loaded and self.__cover_cancellable is None:
+            self._cover.set_from_surface(Lp().art.get_album_placeholder(
+                                            self._art_size,
+                                            self._cover.get_scale_factor()))
+        self.__load_cover()
 
     def update_cover(self):
         """
             Update cover for album id id needed
+            Current cover is kept while artwork is loading
         """
         if self._cover is None:
             return
-        surface = Lp().art.get_album_artwork(
-                            self._album,
-                            self._art_size,
-                            self._cover.get_scale_factor())
-        self._cover.set_from_surface(surface)
-        if surface.get_height() > surface.get_width():
-            self._overlay_orientation = Gtk.Orientation.VERTICAL
-        else:
-            self._overlay_orientation = Gtk.Orientation.HORIZONTAL
+        self.__load_cover()
+
+    def cancel_cover(self):
+        """
+            Stop loading cover, widget not visible anymore
+        """
+        if self.__cover_cancellable is not None:
+            self.__cover_cancellable.cancel()
+            self.__cover_cancellable = None
+
+    @property
+    def needs_cover(self):
+        """
+            True if cover is neither loaded nor loading
+            @return bool
+        """
+        return self._cover is not None and not self.__cover_loaded and\
+            self.__cover_cancellable is None
 
     def update_state(self):
         """
@@ -409,10 +421,54 @@ class AlbumWidget(BaseWidget):
 #######################
 # PRIVATE             #
 #######################
+    def __load_cover(self):
+        """
+            Load cover in background
+        """
+        self.cancel_cover()
+        self.__cover_cancellable = Gio.Cancellable()
+        Lp().art.get_album_artwork_async(self._album,
+                                         self._art_size,
+                                         self._cover.get_scale_factor(),
+                                         self.__cover_cancellable,
+                                         self.__on_album_artwork,
+                                         self.__cover_cancellable)
+
+    def __on_album_artwork(self, surface, cancellable):
+        """
+            Set cover
+            @param surface as cairo.Surface
+            @param cancellable as Gio.Cancellable
+        """
+        if cancellable is self.__cover_cancellable:
+            self.__cover_cancellable = None
+        self.__cover_loaded = True
+        self._cover.set_from_surface(surface)
+        if surface.get_height() > surface.get_width():
+            self._overlay_orientation = Gtk.Orientation.VERTICAL
+        else:
+            self._overlay_orientation = Gtk.Orientation.HORIZONTAL
+
     def __on_destroy(self, widget):
         """
             Disconnect signal
             @param widget as Gtk.Widget
         """
+        self.cancel_cover()
         if self._scan_signal is not None:
             Lp().scanner.disconnect(self._scan_signal)
+        if self.__collection_signal is not None:
+            Lp().scanner.disconnect(self.__collection_signal)
+            self.__collection_signal = None
+
+    def __on_collection_updated(self, scanner, albums, artists, genres):
+        """
+            Forward changes for album
+            @param scanner as CollectionScanner
+            @param albums as {album id as int: destroy as bool}
+            @param artists as {artist id as int: add as bool}
+            @param genres as {genre id as int: add as bool}
+        """
+        if self._album.id in albums:
+            self._on_album_updated(scanner, self._album.id,
+                                   albums[self._album.id])